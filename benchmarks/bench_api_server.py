@@ -0,0 +1,169 @@
+"""Throughput benchmark of the JSON API server (utils/apiserver.py).
+
+Every endpoint is loaded with a number of concurrent clients for a while, and
+requests per second and latency percentiles are reported. The caches are warmed
+with one request per endpoint before the measurements, so the numbers are those
+of a warm shared cache.
+
+By default the server is started in this process on a free port and the clients
+share its event loop, which understates the throughput of a separate server. Use
+--url to load a server started with python -m sportlocate.utils.apiserver.
+
+With --synthetic the venue and weather caches of the cities are filled with
+generated data in a temporary cache directory, so only the categories are
+requested from LIPAS (the category endpoints are skipped without network).
+
+Usage:
+    python benchmarks/bench_api_server.py --synthetic 5000 --concurrency 1 16 64
+    python benchmarks/bench_api_server.py --cities Tampere Helsinki --duration 10
+    python benchmarks/bench_api_server.py --url http://127.0.0.1:8080
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+from pathlib import Path
+
+import aiohttp
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def seed_synthetic_cache(cities: list[str], venue_count: int):
+    """Stores generated venues and weather of the cities to the disk caches."""
+    from sportlocate.models.venue import Coordinates, SportVenue
+    from sportlocate.utils.diskcache import DiskCache
+
+    random_generator = random.Random(venue_count)
+    for city in cities:
+        venues = [
+            SportVenue(
+                coordinates=Coordinates(
+                    lon=24.94 + random_generator.uniform(-0.2, 0.2),
+                    lat=60.17 + random_generator.uniform(-0.1, 0.1),
+                ),
+                id=venue_id,
+                name=f"Venue {venue_id}",
+                city_name=city,
+                info="Lorem ipsum dolor sit amet, consectetur adipiscing elit.",
+                type_code=random_generator.choice([1110, 1120, 2120, 2510, 4404]),
+            )
+            for venue_id in range(1, venue_count + 1)
+        ]
+        DiskCache("venues").set(city.lower(), [venue.to_dict() for venue in venues])
+        DiskCache("weather").set(
+            city.lower(),
+            {
+                "latitude": 60.17,
+                "longitude": 24.94,
+                "current_weather": {"temperature": 12.0, "windspeed": 3.0, "weathercode": 1},
+            },
+        )
+
+
+def scenarios(city: str, categories: list[str]) -> dict[str, str]:
+    """Returns the measured paths by name."""
+    paths = {
+        "city search": f"/api/cities?q={city[:4].lower()}",
+        "venues": f"/api/cities/{city}/venues",
+        "counts": f"/api/cities/{city}/counts",
+        "weather": f"/api/cities/{city}/weather",
+    }
+    if categories:
+        selected = ",".join(categories[:3])
+        paths["filtered venues"] = f"/api/cities/{city}/venues?categories={selected}"
+        paths["recommendation"] = f"/api/cities/{city}/recommendation?categories={selected}"
+    return paths
+
+
+async def load(session: aiohttp.ClientSession, url: str, concurrency: int, duration: float) -> list[float]:
+    """Requests the url from concurrent clients for the duration. Returns the latencies."""
+    latencies = []
+    deadline = time.perf_counter() + duration
+
+    async def client():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            async with session.get(url) as response:
+                await response.read()
+                response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies
+
+
+def percentile(values: list[float], share: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(share * len(values)))]
+
+
+async def benchmark(base_url: str, cities: list[str], concurrencies: list[int], duration: float):
+    connector = aiohttp.TCPConnector(limit=max(concurrencies))
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async with session.get(f"{base_url}/api/categories") as response:
+            categories = [category["name"] for category in await response.json()]
+        print(f"{'endpoint':<18} {'clients':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+        for city in cities:
+            for name, path in scenarios(city, categories).items():
+                url = base_url + path
+                # Warming the caches of the endpoint
+                async with session.get(url) as response:
+                    await response.read()
+                    if response.status != 200:
+                        print(f"{name:<18} skipped: HTTP {response.status}")
+                        continue
+                for concurrency in concurrencies:
+                    latencies = await load(session, url, concurrency, duration)
+                    print(
+                        f"{name:<18} {concurrency:>7} {len(latencies) / duration:>9.0f} "
+                        f"{percentile(latencies, 0.5) * 1000:>8.2f} "
+                        f"{percentile(latencies, 0.99) * 1000:>8.2f}"
+                    )
+
+
+async def run_in_process(cities: list[str], concurrencies: list[int], duration: float, workers: int):
+    from aiohttp import web
+
+    from sportlocate.utils.apiserver import ApiServer
+
+    runner = web.AppRunner(ApiServer(workers=workers).create_app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    try:
+        await benchmark(f"http://{host}:{port}", cities, concurrencies, duration)
+    finally:
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput benchmark of the JSON API server.")
+    parser.add_argument("--url", help="Base URL of a running server (default: start one)")
+    parser.add_argument("--cities", nargs="+", default=["Tampere"], help="Cities to request")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 16, 64], help="Client counts")
+    parser.add_argument("--duration", type=float, default=3.0, help="Seconds per measurement")
+    parser.add_argument("--workers", type=int, default=16, help="Model call threads of the server")
+    parser.add_argument("--synthetic", type=int, metavar="VENUES", help="Use generated venues per city")
+    args = parser.parse_args()
+
+    if args.url:
+        asyncio.run(benchmark(args.url.rstrip("/"), args.cities, args.concurrency, args.duration))
+        return
+    directory = None
+    if args.synthetic:
+        directory = tempfile.TemporaryDirectory()
+        os.environ["SPORTLOCATE_CACHE_DIR"] = directory.name
+        seed_synthetic_cache(args.cities, args.synthetic)
+    asyncio.run(run_in_process(args.cities, args.concurrency, args.duration, args.workers))
+
+
+if __name__ == "__main__":
+    main()
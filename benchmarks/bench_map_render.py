@@ -0,0 +1,209 @@
+"""Benchmark of the map venue layers.
+
+Compares the per-venue folium.Marker map (the original rendering), VenueMarkerLayer
+and VenueCanvasLayer: Python render time, size of the map document and the venue
+data, and optionally load and frame times in QtWebEngine (needs network for the
+Leaflet scripts).
+
+Usage:
+    python benchmarks/bench_map_render.py --venues 100 1000 5000 [--browser]
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from pathlib import Path
+
+import folium
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sportlocate.controllers.map_layers import VENUE_LAYERS, embedded_venue_data  # noqa: E402
+from sportlocate.models.venue import Coordinates, SportVenue  # noqa: E402
+
+# Frames that are measured in the browser while the map is panned
+BROWSER_FRAMES = 60
+
+
+def make_venues(count: int) -> list[SportVenue]:
+    """Creates venues spread around Tampere."""
+    random_generator = random.Random(count)
+    return [
+        SportVenue(
+            coordinates=Coordinates(
+                lon=23.76 + random_generator.uniform(-0.3, 0.3),
+                lat=61.50 + random_generator.uniform(-0.15, 0.15),
+            ),
+            id=venue_id,
+            name=f"Venue {venue_id}",
+            city_name="Tampere",
+            info="Lorem ipsum dolor sit amet, consectetur adipiscing elit.",
+            type_code=1110,
+        )
+        for venue_id in range(1, count + 1)
+    ]
+
+
+def render_folium_markers(venues: list[SportVenue]) -> tuple[str, int]:
+    """Renders the map with one folium.Marker per venue like MapController did originally."""
+    folium_map = folium.Map(location=[61.5, 23.76], zoom_start=10)
+    for venue in venues:
+        tooltip_content = (
+            f"<div style='font-size: 16px'>"
+            f"<b>{venue.name}</b><br>"
+            f"Coordinates:<br>"
+            f"    lat: {venue.coordinates.lat:.2f}<br>"
+            f"    lon: {venue.coordinates.lon:.2f} <br>"
+            f"City: {venue.city_name}<br>"
+            f"Info: {venue.info}</div>"
+        )
+        folium.Marker(
+            [venue.coordinates.lat, venue.coordinates.lon],
+            tooltip=tooltip_content,
+            icon=folium.map.Icon(icon="star", color="blue"),
+        ).add_to(folium_map)
+    return folium_map.get_root().render(), 0
+
+
+def layer_renderer(layer_name: str, embedded: bool):
+    """Returns function that renders the map with the venue layer. Data is either
+    embedded to the document or served separately (only its size is counted)."""
+    layer_class, to_data = VENUE_LAYERS[layer_name]
+
+    def render(venues: list[SportVenue]) -> tuple[str, int]:
+        folium_map = folium.Map(location=[61.5, 23.76], zoom_start=10)
+        data = to_data(venues)
+        if embedded:
+            venue_data, data_bytes = embedded_venue_data(data), 0
+        else:
+            venue_data, data_bytes = 'fetch("venues.json")', len(data.encode("utf-8"))
+        layer_class(venue_data).add_to(folium_map)
+        return folium_map.get_root().render(), data_bytes
+
+    return render
+
+
+RENDERERS = {
+    "folium markers": render_folium_markers,
+    "marker layer (embedded)": layer_renderer("markers", embedded=True),
+    "marker layer (separate)": layer_renderer("markers", embedded=False),
+    "canvas layer (embedded)": layer_renderer("canvas", embedded=True),
+    "canvas layer (separate)": layer_renderer("canvas", embedded=False),
+}
+
+
+def measure_render(render, venues: list[SportVenue], repeats: int) -> tuple[float, str, int]:
+    """Returns median render time, the map html and the size of separate data."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        html, data_bytes = render(venues)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), html, data_bytes
+
+
+class BrowserProbe:
+    """Loads map documents to QWebEngineView and measures load and frame times."""
+
+    def __init__(self):
+        from PyQt5.QtWebEngineWidgets import QWebEngineView
+        from PyQt5.QtWidgets import QApplication
+
+        self._app = QApplication.instance() or QApplication(sys.argv)
+        self._view = QWebEngineView()
+        self._view.resize(1200, 800)
+        self._view.show()
+        self._directory = tempfile.TemporaryDirectory()
+
+    def measure(self, html: str, map_name: str) -> tuple[float, float, float]:
+        """Returns (load seconds, median frame ms, worst frame ms) of the document."""
+        from PyQt5.QtCore import QEventLoop, QTimer, QUrl
+
+        # Written to a file because loadHtml cannot load large documents
+        path = Path(self._directory.name) / "map.html"
+        path.write_text(html, encoding="utf-8")
+        loop = QEventLoop()
+        self._view.loadFinished.connect(loop.quit)
+        start = time.perf_counter()
+        self._view.load(QUrl.fromLocalFile(str(path)))
+        loop.exec()
+        self._view.loadFinished.disconnect(loop.quit)
+        load_time = time.perf_counter() - start
+
+        script = f"""
+            (function() {{
+                var map = window["{map_name}"];
+                var times = [];
+                var last = performance.now();
+                window.frameTimes = null;
+                function step(now) {{
+                    times.push(now - last);
+                    last = now;
+                    map.panBy([10, 0], {{animate: false}});
+                    if (times.length < {BROWSER_FRAMES}) {{
+                        requestAnimationFrame(step);
+                    }} else {{
+                        window.frameTimes = times.slice(1);
+                    }}
+                }}
+                requestAnimationFrame(step);
+            }})();
+        """
+        self._view.page().runJavaScript(script)
+        frame_times = []
+
+        def poll():
+            self._view.page().runJavaScript("window.frameTimes", on_frame_times)
+
+        def on_frame_times(result):
+            if result:
+                frame_times.extend(result)
+                loop.quit()
+            else:
+                QTimer.singleShot(100, poll)
+
+        poll()
+        QTimer.singleShot(30000, loop.quit)
+        loop.exec()
+        if not frame_times:
+            return load_time, float("nan"), float("nan")
+        return load_time, statistics.median(frame_times), max(frame_times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the map venue layers.")
+    parser.add_argument("--venues", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--repeats", type=int, default=3, help="Render repeats per case.")
+    parser.add_argument(
+        "--browser", action="store_true", help="Measure load and frame times in QtWebEngine."
+    )
+    args = parser.parse_args()
+
+    probe = BrowserProbe() if args.browser else None
+    header = f"{'venues':>7} {'renderer':<24} {'render ms':>10} {'html KB':>9} {'data KB':>8}"
+    if probe is not None:
+        header += f" {'load ms':>8} {'frame ms':>9} {'worst ms':>9}"
+    print(header)
+    for count in args.venues:
+        venues = make_venues(count)
+        for name, render in RENDERERS.items():
+            render_time, html, data_bytes = measure_render(render, venues, args.repeats)
+            line = (
+                f"{count:>7} {name:<24} {render_time * 1000:>10.1f} "
+                f"{len(html.encode('utf-8')) / 1024:>9.1f} {data_bytes / 1024:>8.1f}"
+            )
+            # Browser can only load the documents that contain their data
+            if probe is not None and "separate" not in name:
+                map_name = html.split('class="folium-map" id="', 1)[1].split('"', 1)[0]
+                load_time, frame_time, worst_frame = probe.measure(html, map_name)
+                line += f" {load_time * 1000:>8.0f} {frame_time:>9.1f} {worst_frame:>9.1f}"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
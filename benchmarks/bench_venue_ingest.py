@@ -0,0 +1,150 @@
+"""Benchmark of the LIPAS venue list ingestion.
+
+Compares decoding the whole /sports-places response before creating the venues
+(the original way) with the streaming parser of utils/jsonstream.py: records per
+second and peak Python memory (tracemalloc) while the venues are created.
+
+The payload is a venue list with the fields of SPORT_VENUE_LIST_PARAMS. A large
+city can be recorded once and reused, otherwise a synthetic payload is generated.
+
+Usage:
+    python benchmarks/bench_venue_ingest.py --record Helsinki --payload helsinki.json
+    python benchmarks/bench_venue_ingest.py --payload helsinki.json
+    python benchmarks/bench_venue_ingest.py --venues 50000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sportlocate.models.city_model import CityModel  # noqa: E402
+from sportlocate.models.venuefactory import (  # noqa: E402
+    SportVenueFactory,
+    SPORT_VENUE_API_URL,
+    SPORT_VENUE_LIST_PARAMS,
+)
+from sportlocate.utils import jsonstream  # noqa: E402
+from sportlocate.utils.services import get_service  # noqa: E402
+
+parse_venue = SportVenueFactory._parse_sport_venue_data
+
+
+def record_payload(city: str, path: Path):
+    """Downloads the venue list of the city to the file as it is received."""
+    import requests
+
+    city_code = get_service(CityModel).cities_and_city_codes[city.lower()]
+    response = requests.get(
+        f"{SPORT_VENUE_API_URL}/sports-places",
+        params={"cityCodes": city_code, **SPORT_VENUE_LIST_PARAMS},
+        stream=True,
+    )
+    response.raise_for_status()
+    with open(path, "wb") as f:
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            f.write(chunk)
+
+
+def write_synthetic_payload(count: int, path: Path):
+    """Writes a venue list that looks like a LIPAS response of a large city."""
+    random_generator = random.Random(count)
+    venues = [
+        {
+            "sportsPlaceId": venue_id,
+            "type": {
+                "name": random_generator.choice(["Football field", "Gym", "Ice hall", "Fitness trail"]),
+                "typeCode": random_generator.choice([1110, 2120, 2510, 4404]),
+            },
+            "location": {
+                "coordinates": {
+                    "wgs84": {
+                        "lon": 24.94 + random_generator.uniform(-0.2, 0.2),
+                        "lat": 60.17 + random_generator.uniform(-0.1, 0.1),
+                    }
+                },
+                "city": {"name": "Helsinki"},
+            },
+            "properties": {"infoFi": "Lorem ipsum dolor sit amet, consectetur adipiscing elit."},
+        }
+        for venue_id in range(1, count + 1)
+    ]
+    path.write_text(json.dumps(venues), encoding="utf-8")
+
+
+def ingest_whole(path: Path) -> list:
+    """Decodes the whole response and then creates the venues."""
+    with open(path, "rb") as f:
+        venue_list = json.loads(f.read())
+    return [parse_venue(item) for item in venue_list]
+
+
+def ingest_whole_fast(path: Path) -> list:
+    """Like ingest_whole but with the fastest installed decoder."""
+    with open(path, "rb") as f:
+        venue_list = jsonstream.loads(f.read())
+    return [parse_venue(item) for item in venue_list]
+
+
+def ingest_streaming(path: Path) -> list:
+    """Creates the venues while the response is parsed."""
+    with open(path, "rb") as f:
+        return [parse_venue(item) for item in jsonstream.iter_array_items(f)]
+
+
+def measure(ingest, path: Path, repeats: int) -> tuple[float, int, int]:
+    """Returns best time, peak traced memory of one run and count of created venues."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        venues = ingest(path)
+        times.append(time.perf_counter() - start)
+    del venues
+    tracemalloc.start()
+    venues = ingest(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(times), peak, len(venues)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the LIPAS venue list ingestion.")
+    parser.add_argument("--payload", type=Path, help="Recorded venue list (JSON array).")
+    parser.add_argument("--record", metavar="CITY", help="Record the venue list of the city to --payload.")
+    parser.add_argument("--venues", type=int, default=20000, help="Venue count of synthetic payload.")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per parser.")
+    args = parser.parse_args()
+
+    directory = tempfile.TemporaryDirectory()
+    if args.record:
+        if args.payload is None:
+            parser.error("--record needs --payload")
+        record_payload(args.record, args.payload)
+    path = args.payload
+    if path is None:
+        path = Path(directory.name) / "venues.json"
+        write_synthetic_payload(args.venues, path)
+
+    streaming_decoder, whole_decoder = jsonstream.decoder_names()
+    parsers = {
+        "json, whole": ingest_whole,
+        f"{whole_decoder}, whole": ingest_whole_fast,
+        f"{streaming_decoder}, streaming": ingest_streaming,
+    }
+    print(f"payload {path.name}: {path.stat().st_size / 1024 / 1024:.1f} MB")
+    print(f"{'parser':<28} {'venues':>7} {'records/s':>10} {'peak MB':>8}")
+    for name, ingest in parsers.items():
+        seconds, peak, count = measure(ingest, path, args.repeats)
+        print(f"{name:<28} {count:>7} {count / seconds:>10.0f} {peak / 1024 / 1024:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,7 +8,16 @@ setup(
     author='Pythonic',
     description='Description of your package',
     packages=find_packages(),
-    install_requires=["requests", "pandas", "dataclasses", "folium", "pyqt5", "PyQtWebEngine", "geopy", "retry"],
-    entry_points={"console_scripts": ["sportlocate=src.sportlocate.__main__:main"]},
+    install_requires=["requests", "pandas", "numpy", "dataclasses", "folium", "pyqt5", "PyQtWebEngine", "geopy", "retry"],
+    extras_require={"async": ["aiohttp"], "fastjson": ["ijson", "orjson"]},
+    entry_points={
+        "console_scripts": [
+            "sportlocate=src.sportlocate.__main__:main",
+            "sportlocate-warmup=sportlocate.utils.cachewarmer:main",
+            "sportlocate-memory=sportlocate.utils.memory:main",
+            "sportlocate-server=sportlocate.utils.apiserver:main",
+            "sportlocate-assets=sportlocate.utils.webassets:main",
+        ]
+    },
     include_package_data=True,
 )
\ No newline at end of file
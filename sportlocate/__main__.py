@@ -11,31 +11,77 @@ from controllers.mapcontroller import MapController
 from controllers.preferences_controller import PreferencesController
 from controllers.city_controller import CityController
 from controllers.weather_controller import WeatherController
+from controllers.prefetch_controller import PrefetchController
+from controllers.scheme_handler import AppSchemeHandler, TILE_URL_TEMPLATE, register_app_scheme
+from utils.apiclient import AsyncApiClient
+from utils.qtasyncio import AsyncioBridge
+from utils.mapdocuments import MapDocumentStore
+from utils.tilecache import TileCache
+from utils.watchdog import watchdog_from_environment
+# Imported from the package like in the models, so the trace records their calls
+from sportlocate.utils.scheduler import default_scheduler
+from sportlocate.utils.startuptrace import trace_from_environment
 
 
 if __name__ == "__main__":
+    # Service constructions and upstream calls are traced when SPORTLOCATE_TRACE_STARTUP is set
+    startup_trace = trace_from_environment()
     QtCore.QCoreApplication.setAttribute(QtCore.Qt.AA_ShareOpenGLContexts)
+    # Custom url scheme must be registered before the application is created
+    register_app_scheme()
     app = QGuiApplication(sys.argv)
     app.setApplicationDisplayName("Sportlocate")
     engine = QQmlApplicationEngine()
 
+    # Venues and weather are requested asynchronously when the optional aiohttp dependency
+    # is installed. Venue loads are coroutine jobs of the shared scheduler.
+    async_bridge = None
+    if AsyncApiClient.is_available():
+        async_bridge = AsyncioBridge()
+        default_scheduler().set_async_bridge(async_bridge)
+        app.aboutToQuit.connect(async_bridge.close)
+
+    # Map documents, map tiles and the map libraries are served to the map view by the application
+    tile_cache = TileCache()
+    map_documents = MapDocumentStore()
+    scheme_handler = AppSchemeHandler(tile_cache, map_documents)
+    scheme_handler.install()
+    app.aboutToQuit.connect(tile_cache.close)
+
     # Set controllers to available to qml side
     preferences = PreferencesController()
     engine.rootContext().setContextProperty("PreferencesController", preferences)
+    # Writing the pending preference changes before the program exits
+    app.aboutToQuit.connect(preferences.flush)
 
-    mapController = MapController()
+    mapController = MapController(
+        tile_url=TILE_URL_TEMPLATE, map_documents=map_documents, local_assets=True
+    )
     engine.rootContext().setContextProperty("MapController", mapController)
 
     city_controller = CityController()
     engine.rootContext().setContextProperty("CityController", city_controller)
 
-    weather_controller = WeatherController()
+    weather_controller = WeatherController(async_bridge=async_bridge)
     engine.rootContext().setContextProperty("WeatherController", weather_controller)
 
+    # Likely next cities are loaded to the caches while the application is idle
+    prefetch_controller = PrefetchController(current_city=preferences.get_city())
+    engine.rootContext().setContextProperty("PrefetchController", prefetch_controller)
+    app.aboutToQuit.connect(prefetch_controller.stop)
+    prefetch_controller.start()
+
     # Load qml to engine
     qml_file = os.fspath(Path(__file__).parent / "views" / "main.qml")
     engine.load(QUrl.fromLocalFile(qml_file))
 
     if not engine.rootObjects():
         sys.exit(-1)
+
+    # Event loop stalls are reported when SPORTLOCATE_WATCHDOG_MS is set
+    watchdog = watchdog_from_environment(app)
+    if watchdog is not None:
+        app.aboutToQuit.connect(lambda: print(watchdog.report()))
+    if startup_trace is not None:
+        app.aboutToQuit.connect(lambda: print(startup_trace.report()))
     sys.exit(app.exec())
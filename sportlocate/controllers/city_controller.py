@@ -1,6 +1,10 @@
-from PyQt5.QtCore import QObject, pyqtSignal, pyqtProperty
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtProperty, pyqtSlot
 
 from sportlocate.models.city_model import CityModel
+from sportlocate.utils.services import get_service
+
+# Maximum count of cities returned by a search
+CITY_SEARCH_LIMIT = 20
 
 
 class CityController(QObject):
@@ -11,7 +15,7 @@ class CityController(QObject):
     def __init__(self):
         """Init."""
         super().__init__()
-        self._city_model = CityModel()
+        self._city_model = get_service(CityModel)
 
     @pyqtProperty(list, notify=cities_changed)
     def cities(self):
@@ -19,3 +23,8 @@ class CityController(QObject):
         those to the view.
         """
         return self._city_model.cities
+
+    @pyqtSlot(str, result=list)
+    def search_cities(self, text: str) -> list:
+        """Returns the city objects that match the search text, best matches first."""
+        return self._city_model.search(text, CITY_SEARCH_LIMIT)
@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import json
+
+from branca.element import MacroElement
+from jinja2 import Template
+
+from sportlocate.models.venue import Venue
+
+# Decimals of the coordinates in the venue data (6 decimals is about 0.1 m)
+COORDINATE_DECIMALS = 6
+
+
+def venues_to_json(venues: list[Venue]) -> str:
+    """Returns the venue data that the map layers need as JSON array."""
+    return json.dumps(
+        [
+            {
+                "id": venue.id,
+                "name": venue.name,
+                "lat": round(venue.coordinates.lat, COORDINATE_DECIMALS),
+                "lon": round(venue.coordinates.lon, COORDINATE_DECIMALS),
+                "city_name": venue.city_name,
+                "info": venue.info,
+            }
+            for venue in venues
+        ],
+        separators=(",", ":"),
+    )
+
+
+def venues_to_geojson(venues: list[Venue]) -> str:
+    """Returns the venues as compact GeoJSON feature collection."""
+    return json.dumps(
+        {
+            "type": "FeatureCollection",
+            "features": [
+                {
+                    "type": "Feature",
+                    "geometry": {
+                        "type": "Point",
+                        "coordinates": [
+                            round(venue.coordinates.lon, COORDINATE_DECIMALS),
+                            round(venue.coordinates.lat, COORDINATE_DECIMALS),
+                        ],
+                    },
+                    "properties": {
+                        "id": venue.id,
+                        "name": venue.name,
+                        "city_name": venue.city_name,
+                        "info": venue.info,
+                    },
+                }
+                for venue in venues
+            ],
+        },
+        separators=(",", ":"),
+    )
+
+
+def embedded_venue_data(venue_json: str) -> str:
+    """Returns javascript promise of the venue data (JSON or GeoJSON) that is embedded
+    to the map document."""
+    # "</" would end the script element in the middle of the data
+    return "Promise.resolve(" + venue_json.replace("</", "<\\/") + ")"
+
+
+def fetched_venue_data(url: str) -> str:
+    """Returns javascript promise of the venue data that is fetched from the url."""
+    return f"fetch({json.dumps(url)}).then(function(response) {{ return response.json(); }})"
+
+
+class VenueMarkerLayer(MacroElement):
+    """
+    Folium element that adds a marker for every venue to the map.
+
+    Markers and their tooltips are created by the browser from venue data, so the
+    size of the map document doesn't depend on the venue count when the data is
+    fetched as a separate resource.
+    """
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+        (function() {
+            var map = {{ this._parent.get_name() }};
+            var selectedId = {{ this.selected_id }};
+            function escapeHtml(text) {
+                var element = document.createElement("div");
+                element.textContent = text;
+                return element.innerHTML;
+            }
+            {{ this.venue_data }}.then(function(venues) {
+                venues.forEach(function(venue) {
+                    var tooltip = "<div style='font-size: 16px'>"
+                        + "<b>" + escapeHtml(venue.name) + "</b><br>"
+                        + "Coordinates:<br>"
+                        + "    lat: " + venue.lat.toFixed(2) + "<br>"
+                        + "    lon: " + venue.lon.toFixed(2) + " <br>"
+                        + "City: " + escapeHtml(venue.city_name) + "<br>"
+                        + "Info: " + escapeHtml(venue.info) + "</div>";
+                    var icon = L.AwesomeMarkers.icon({
+                        icon: "star",
+                        iconColor: "white",
+                        markerColor: venue.id === selectedId ? "red" : "blue",
+                        prefix: "glyphicon"
+                    });
+                    L.marker([venue.lat, venue.lon], {icon: icon}).bindTooltip(tooltip).addTo(map);
+                });
+            });
+        })();
+        {% endmacro %}
+        """
+    )
+
+    def __init__(self, venue_data: str, selected_id: int = -1):
+        """
+        Init the layer.
+
+        Args:
+            venue_data (str): Javascript promise of the venue data, see embedded_venue_data
+                and fetched_venue_data.
+            selected_id (int, optional): Id of the venue whose marker is highlighted.
+        """
+        super().__init__()
+        self._name = "VenueMarkerLayer"
+        self.venue_data = venue_data
+        self.selected_id = int(selected_id)
+
+
+class VenueCanvasLayer(MacroElement):
+    """
+    Folium element that draws all venues from one GeoJSON payload as circles on a canvas.
+
+    Unlike VenueMarkerLayer no DOM element is created per venue, and the tooltip of a
+    venue is built only when the pointer hovers it. This keeps the page responsive
+    with thousands of venues.
+    """
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+        (function() {
+            var map = {{ this._parent.get_name() }};
+            var selectedId = {{ this.selected_id }};
+            var renderer = L.canvas({padding: 0.5});
+            function escapeHtml(text) {
+                var element = document.createElement("div");
+                element.textContent = text;
+                return element.innerHTML;
+            }
+            function tooltip(layer) {
+                var venue = layer.feature.properties;
+                var latlng = layer.getLatLng();
+                return "<div style='font-size: 16px'>"
+                    + "<b>" + escapeHtml(venue.name) + "</b><br>"
+                    + "Coordinates:<br>"
+                    + "    lat: " + latlng.lat.toFixed(2) + "<br>"
+                    + "    lon: " + latlng.lng.toFixed(2) + " <br>"
+                    + "City: " + escapeHtml(venue.city_name) + "<br>"
+                    + "Info: " + escapeHtml(venue.info) + "</div>";
+            }
+            {{ this.venue_data }}.then(function(venues) {
+                L.geoJSON(venues, {
+                    pointToLayer: function(feature, latlng) {
+                        var selected = feature.properties.id === selectedId;
+                        return L.circleMarker(latlng, {
+                            renderer: renderer,
+                            radius: selected ? 9 : 6,
+                            color: "white",
+                            weight: 1,
+                            fillColor: selected ? "#d63e2a" : "#38aadd",
+                            fillOpacity: 0.9
+                        });
+                    }
+                }).bindTooltip(tooltip).addTo(map);
+            });
+        })();
+        {% endmacro %}
+        """
+    )
+
+    def __init__(self, venue_data: str, selected_id: int = -1):
+        """
+        Init the layer.
+
+        Args:
+            venue_data (str): Javascript promise of the venue GeoJSON, see embedded_venue_data
+                and fetched_venue_data.
+            selected_id (int, optional): Id of the venue that is highlighted.
+        """
+        super().__init__()
+        self._name = "VenueCanvasLayer"
+        self.venue_data = venue_data
+        self.selected_id = int(selected_id)
+
+
+# Venue layers by name: layer class and function that creates the data of the layer
+VENUE_LAYERS = {
+    "markers": (VenueMarkerLayer, venues_to_json),
+    "canvas": (VenueCanvasLayer, venues_to_geojson),
+}
@@ -2,13 +2,88 @@ from __future__ import annotations
 
 import folium
 
-from PyQt5.QtCore import QObject, pyqtSlot, pyqtProperty, pyqtSignal, QThreadPool
+from PyQt5.QtCore import QObject, pyqtSlot, pyqtProperty, pyqtSignal
+
+from sportlocate.controllers.map_layers import (
+    VENUE_LAYERS,
+    embedded_venue_data,
+    fetched_venue_data,
+)
+from sportlocate.controllers.venue_list_model import VenueListModel
+from sportlocate.controllers.venue_proxy_model import VenueProxyModel
 
 from sportlocate.models.venue import Venue
 from sportlocate.models.venuemodel import VenueModel
 from sportlocate.models.weathermodel import WeatherModel
 from sportlocate.models.preferencesmodel import PreferencesModel
-from sportlocate.utils.qmlworker import Worker
+from sportlocate.utils.cancellation import CancellationToken
+from sportlocate.utils.mapdocuments import MapDocumentStore
+from sportlocate.utils.profiling import interaction
+from sportlocate.utils.scheduler import JobLane, default_scheduler
+from sportlocate.utils.services import get_service
+from sportlocate.utils.tilecache import TILE_ATTRIBUTION
+from sportlocate.utils.webassets import localize_assets
+
+# Above this venue count venues are drawn to a canvas instead of separate markers
+CANVAS_LAYER_THRESHOLD = 500
+
+
+def render_map(
+    venues: list[Venue],
+    center: tuple[float, float],
+    selected_id: int,
+    tile_url: str = None,
+    venue_layer: str = None,
+    map_documents: MapDocumentStore = None,
+    local_assets: bool = False,
+) -> tuple[str, str]:
+    """Renders the map document of the venues.
+
+    Doesn't touch the controller or Qt objects, so it is run in a worker thread and the GUI
+    thread only receives the finished document.
+
+    Args:
+        venues (list[Venue]): Venues that are drawn to the map. The list is not modified.
+        center (tuple[float, float]): Latitude and longitude of the map center.
+        selected_id (int): Id of the highlighted venue.
+        tile_url (str, optional): Url template of the map tiles. Defaults to OpenStreetMap.
+        venue_layer (str, optional): Name of the venue layer (see VENUE_LAYERS). Defaults to
+            markers for small and canvas for large venue counts.
+        map_documents (MapDocumentStore, optional): If given the document and the venue data
+            are stored there.
+        local_assets (bool, optional): If True the map libraries are loaded from the
+            sportlocate://assets mirror instead of CDNs (see webassets).
+
+    Returns:
+        tuple[str, str]: Map html and empty url, or empty html and url of the stored document.
+    """
+    if tile_url is None:
+        folium_map = folium.Map(location=list(center), zoom_start=10)
+    else:
+        folium_map = folium.Map(
+            location=list(center), zoom_start=10, tiles=tile_url, attr=TILE_ATTRIBUTION
+        )
+
+    # Venue data is given to the map as JSON, either as a separate resource in map
+    # documents or embedded to the map. Markers and their tooltips are created by
+    # the map script, so the size of the map document doesn't grow with the venues.
+    if venue_layer is None:
+        venue_layer = "canvas" if len(venues) > CANVAS_LAYER_THRESHOLD else "markers"
+    layer_class, to_data = VENUE_LAYERS[venue_layer]
+    venue_json = to_data(venues)
+    if map_documents is None:
+        venue_data = embedded_venue_data(venue_json)
+    else:
+        data_url = map_documents.put(venue_json.encode("utf-8"), b"application/json", ".json")
+        venue_data = fetched_venue_data(data_url)
+    layer_class(venue_data, selected_id).add_to(folium_map)
+
+    if local_assets:
+        localize_assets(folium_map)
+    map_html = folium_map.get_root().render()
+    if map_documents is None:
+        return map_html, ""
+    return "", map_documents.put(map_html.encode("utf-8"), b"text/html", ".html")
 
 
 class MapController(QObject):
@@ -25,24 +100,71 @@ class MapController(QObject):
     start_indicator = pyqtSignal(name="startIndicator")
     stop_indicator = pyqtSignal(name="stopIndicator")
 
-    def __init__(self, parent=None):
-        """Init the map controller."""
+    def __init__(
+        self,
+        parent=None,
+        scheduler=None,
+        tile_url=None,
+        map_documents: MapDocumentStore = None,
+        venue_layer: str = None,
+        local_assets: bool = False,
+    ):
+        """Init the map controller.
+
+        Args:
+            parent (QObject, optional): Parent object.
+            scheduler (JobScheduler, optional): Scheduler for the worker jobs. Defaults to
+                the shared scheduler.
+            tile_url (str, optional): Url template of the map tiles, for example the url of the
+                local tile cache. Defaults to OpenStreetMap tile server.
+            map_documents (MapDocumentStore, optional): If given the map documents and venue data
+                are stored there and loaded by url, otherwise the map is provided as html string.
+            venue_layer (str, optional): How the venues are drawn, "markers" or "canvas"
+                (see VENUE_LAYERS). Defaults to markers for small and canvas for large venue
+                counts.
+            local_assets (bool, optional): If True the map libraries are loaded from the
+                sportlocate://assets mirror that AppSchemeHandler serves, so the map works
+                without network.
+        """
         super().__init__(parent)
+        self._tile_url = tile_url
+        self._scheduler = scheduler or default_scheduler()
+        self._map_documents = map_documents
+        self._venue_layer = venue_layer
+        self._local_assets = local_assets
         self._map_html = ""
-        self._current_map = None
-        self._venue_model = VenueModel("sport")
-        self._weather_model = WeatherModel()
-        self._pref_model = PreferencesModel()
+        self._map_url = ""
+        self._venue_model = get_service(VenueModel)
+        self._weather_model = get_service(WeatherModel)
+        self._pref_model = get_service(PreferencesModel)
         self._last_lat = 0
         self._last_lon = 0
         self._painting_marker = False
+        # Every venue load gets a new generation. Only the newest load is drawn to map and
+        # the older ones are cancelled so that those stop fetching.
+        self._load_generation = 0
+        self._load_cancel_token = None
+        # Maps are rendered in worker threads. Only the newest render is shown.
+        self._render_generation = 0
+        self._render_cancel_token = None
+        # Venues shown in the VenueList
+        self._venue_list_model = VenueListModel(self)
+        # Searched, sorted and filtered view of the venue list
+        self._venue_proxy_model = VenueProxyModel(self._pref_model.category_model, self)
+        self._venue_proxy_model.setSourceModel(self._venue_list_model)
 
     @pyqtProperty(str, constant=True)
     def map_html(self) -> str:
-        """Map property for qml WebengineView."""
+        """Map property for qml WebengineView. Empty if the map is provided by url."""
         return self._map_html
 
+    @pyqtProperty(str, constant=True)
+    def map_url(self) -> str:
+        """Url of the map document for qml WebengineView. Empty if the map is provided as html."""
+        return self._map_url
+
     @pyqtSlot(name="showRecommendation")
+    @interaction("show recommendation")
     def show_recommendation(self):
         """Handles the recommendation with models and Shows the recommendation on map."""
         weather = self._weather_model.current_weather
@@ -50,39 +172,77 @@ class MapController(QObject):
         if recommendation is None:
             self.no_recommendation.emit()
         else:
-            self._draw_map([recommendation])
+            # Venue list keeps all loaded venues, only the map shows the recommendation
+            self._draw_map([recommendation], update_list=False)
 
     @pyqtSlot(name="showCurrentVenues")
+    @interaction("show current venues")
     def show_current_venues(self):
         """Handles the venue showing (based on user preferences) on the map."""
         # Starting indicator because this is heavy process (many API calls needs to be done)
         self.start_indicator.emit()
-        preferences = self._pref_model.get_preferences()
-
-        # Create a Worker instance
-        worker = Worker(
-            self._venue_model.get_filtered_venues,
-            self._pref_model.current_city,
-            preferences,
+        generation, cancel_token = self._start_new_venue_load()
+
+        # With an asyncio bridge the venues are loaded with the asynchronous requests in the
+        # bridge loop, otherwise in a worker thread. Both are keyed jobs of the interactive
+        # lane, so identical requests (same city and preferences) in flight are coalesced
+        # and a city that a prefetch is fetching is waited for, not fetched again.
+        city = self._pref_model.current_city
+        preferences_mask = self._pref_model.get_preferences_mask()
+        if self._scheduler.async_bridge is not None:
+            load_venues = self._venue_model.get_filtered_venues_by_mask_async
+        else:
+            load_venues = self._venue_model.get_filtered_venues_by_mask
+        self._scheduler.submit(
+            load_venues,
+            city,
+            preferences_mask,
+            key=("venues", city.lower(), preferences_mask),
+            lane=JobLane.INTERACTIVE,
+            on_result=lambda venues: self._on_venues_loaded(generation, venues),
+            cancel_token=cancel_token,
+            cancellable=True,
         )
 
-        # Connect result signal to map drawing
-        worker.signals.result.connect(self._draw_map)
-
-        # Start the worker in the thread pool
-        QThreadPool.globalInstance().start(worker)
-
         # Signaling to qml side that current venues are requested
         self.current_venues_requested.emit()
 
-    @pyqtProperty(list, notify=venues_changed)
-    def venues(self) -> list[object]:
-        """Providing the venues to VenueDetailBox (view where venue details are shown).
-
-        Venues must be converted to object format {"id": id, "name": name...} like so that qml side can
-        show those straight.
+    def _start_new_venue_load(self) -> tuple[int, CancellationToken]:
+        """Cancels the venue load in progress and returns generation and cancel token
+        for the new load."""
+        if self._load_cancel_token is not None:
+            self._load_cancel_token.cancel()
+        self._load_generation += 1
+        self._load_cancel_token = CancellationToken()
+        return self._load_generation, self._load_cancel_token
+
+    def _on_venues_loaded(self, generation: int, venues: list[Venue]):
+        """Draws the loaded venues unless a newer load has been started meanwhile."""
+        if generation != self._load_generation:
+            return
+        self._load_cancel_token = None
+        self._draw_map(venues)
+
+    @pyqtProperty(QObject, constant=True)
+    def venue_list_model(self) -> VenueListModel:
+        """List model of the venues for VenueList. Rows are updated in place when the venues change
+        so the venues are not copied to qml side as a whole."""
+        return self._venue_list_model
+
+    @pyqtProperty(QObject, constant=True)
+    def venue_proxy_model(self) -> VenueProxyModel:
+        """Search, sort and category facet filter of the venue list model for VenueList."""
+        return self._venue_proxy_model
+
+    @pyqtProperty("QVariantMap", notify=venue_selected)
+    def selected_venue(self) -> dict:
+        """Providing the selected venue to VenueDetailBox (view where venue details are shown).
+
+        Venue must be converted to object format {"id": id, "name": name...} like so that qml side can
+        show it straight. Empty object is returned if no venue is selected.
         """
-        return [venue.to_dict() for venue in self._venue_model.current_venues]
+        venue = self._venue_list_model.venue_by_id(self._venue_model.selected_venue)
+        return {} if venue is None else venue.to_dict()
 
     @pyqtProperty(int, notify=venue_selected)
     def selected_venue_id(self) -> int:
@@ -91,6 +251,7 @@ class MapController(QObject):
         return self._venue_model.selected_venue
 
     @pyqtSlot(int)
+    @interaction("select venue")
     def set_selected_venue_id(self, venue_id: int):
         """Stores the user selected venue id to venue model and also paints the selected
         venue marker to the map.
@@ -107,11 +268,15 @@ class MapController(QObject):
         # Draw map
         self._draw_map(self._venue_model.current_venues)
 
-    def _draw_map(self, venues: list[Venue]):
+    def _draw_map(self, venues: list[Venue], update_list: bool = True):
         """Draws the map with updated information.
 
+        The venue list is updated right away and the map document is rendered in a worker
+        thread, see _on_map_rendered.
+
         Args:
             venues (list[Venue]): List of venues that needs to be drawn to map.
+            update_list (bool, optional): If False the venue list keeps its venues.
         """
         # Calculating map center coordinates based on venues that needs to be drawn to map.
 
@@ -131,53 +296,47 @@ class MapController(QObject):
                 venues
             )
 
-        # Creating map
-        self._current_map = folium.Map(
-            location=[self._last_lat, self._last_lon], zoom_start=10
+        # Rendering in a worker thread. Render of the previous draw is not needed anymore.
+        if self._render_cancel_token is not None:
+            self._render_cancel_token.cancel()
+        self._render_generation += 1
+        generation = self._render_generation
+        self._render_cancel_token = self._scheduler.submit(
+            render_map,
+            list(venues),
+            (self._last_lat, self._last_lon),
+            self._venue_model.selected_venue,
+            self._tile_url,
+            self._venue_layer,
+            self._map_documents,
+            self._local_assets,
+            lane=JobLane.INTERACTIVE,
+            on_result=lambda result: self._on_map_rendered(generation, result),
+            on_error=lambda error: self._on_map_render_failed(generation, error),
         )
 
-        # Adding markers to map
-        for venue in venues:
-            self._draw_marker_to_map(venue)
-
-        # Rendering the map when all markers are drawn.
-        self._map_html = self._current_map.get_root().render()
-
-        # Signaling to qml that map venues are changed
-        self.map_updated.emit()
         # this needs to be prevented so that list view position is not reset when painting marker.
-        if not self._painting_marker:
+        if update_list and not self._painting_marker:
+            # Distances of the venues are measured from the map center
+            self._venue_proxy_model.set_reference_point(self._last_lat, self._last_lon)
+            self._venue_list_model.set_venues(venues)
             self.venues_changed.emit()
         self._painting_marker = False
 
+    def _on_map_rendered(self, generation: int, result: tuple[str, str]):
+        """Shows the rendered map unless a newer map is being rendered."""
+        if generation != self._render_generation:
+            return
+        self._render_cancel_token = None
+        self._map_html, self._map_url = result
+        # Signaling to qml that map venues are changed
+        self.map_updated.emit()
         # Signaling to loader that software is ready.
         self.stop_indicator.emit()
 
-    def _draw_marker_to_map(self, venue: Venue):
-        """Helper that draws venue marker to map.
-        Args:
-            venue (Venue): Venue that marker is asked to draw to map.
-        """
-        # Tooltip font size
-        font_size = "16px"
-
-        # Writing the tooltip content with html
-        tooltip_content = (
-            f"<div style='font-size: {font_size}'>"
-            f"<b>{venue.name}</b><br>"
-            f"Coordinates:<br>"
-            f"    lat: {venue.coordinates.lat:.2f}<br>"
-            f"    lon: {venue.coordinates.lon:.2f} <br>"
-            f"City: {venue.city_name}<br>"
-            f"Info: {venue.info}</div>"
-        )
-
-        marker_color = "blue"
-        if self._venue_model.selected_venue == venue.id:
-            marker_color = "red"
-
-        folium.Marker(
-            [venue.coordinates.lat, venue.coordinates.lon],
-            tooltip=tooltip_content,
-            icon=folium.map.Icon(icon="star", color=marker_color),
-        ).add_to(self._current_map)
+    def _on_map_render_failed(self, generation: int, error: tuple):
+        if generation != self._render_generation:
+            return
+        self._render_cancel_token = None
+        print(f"Drawing the map failed: {error[1]}")
+        self.stop_indicator.emit()
@@ -1,46 +1,103 @@
 from __future__ import annotations
 
-from PyQt5.QtCore import QObject, pyqtSlot
+from PyQt5.QtCore import QObject, pyqtProperty, pyqtSignal, pyqtSlot
 
 from sportlocate.models.preferencesmodel import PreferencesModel
+from sportlocate.models.venuecounts import get_venue_count_index
+from sportlocate.utils.profiling import interaction
+from sportlocate.utils.services import get_service
 
 
 class PreferencesController(QObject):
     """Handles preferences view preferences. Fetch preferences from preferences model
     and updates those to preferences view."""
 
+    # Signal to qml side when the current city changes, also by switching the profile
+    city_changed = pyqtSignal(name="cityChanged")
+
     def __init__(self):
         """Init."""
         super().__init__()
-        self._preferences_model = PreferencesModel()
+        self._preferences_model = get_service(PreferencesModel)
+        self._venue_counts = get_venue_count_index()
 
     @pyqtSlot(name="getPreferences", result=list)
     def get_preferences(self) -> list[dict]:
-        """Current preferences can be fetch with this method from qml."""
+        """Current preferences can be fetch with this method from qml. Count is the venue
+        count of the category in the current city, or -1 if the city hasn't been loaded."""
         categories = self._preferences_model.all_categories
-        preferences = self._preferences_model.get_preferences()
+        category_counts = self._venue_counts.category_counts(
+            self._preferences_model.current_city, self._preferences_model.category_model
+        )
         dict_list = []
         for category in categories:
-            if category not in preferences:
-                obj_dict = {"name": category.name, "value": False}
-            else:
-                obj_dict = {"name": category.name, "value": True}
-
+            obj_dict = {
+                "name": category.name,
+                "value": self._preferences_model.is_category_enabled(category.name),
+                "count": -1 if category_counts is None else category_counts[category.name],
+            }
             dict_list.append(obj_dict)
 
         return dict_list
 
     @pyqtSlot(str, bool, name="setPreference")
+    @interaction("toggle preference")
     def set_preference(self, name: str, value: bool):
         """Updates/sets the preferences when user clicks checkboxes on qml side."""
         self._preferences_model.set_preferences(name, value)
 
     @pyqtSlot(str)
+    @interaction("choose city")
     def set_city(self, name: str):
         """Stores/sets the current city to model."""
+        changed = name != self._preferences_model.current_city
         self._preferences_model.current_city = name
+        if changed:
+            self.city_changed.emit()
 
     @pyqtSlot(result=str)
     def get_city(self) -> str:
         """Method that can be used to fetch current city to qml side."""
         return self._preferences_model.current_city
+
+    @pyqtProperty(str, notify=city_changed)
+    def city(self) -> str:
+        """Current city for qml bindings, updated also when the profile is switched."""
+        return self._preferences_model.current_city
+
+    @pyqtSlot(name="getCityVenueCounts", result="QVariantMap")
+    def get_city_venue_counts(self) -> dict:
+        """Returns counts of the venues in the preferred categories for the cities that
+        have been loaded, city name -> count."""
+        preferences_model = self._preferences_model
+        type_codes = preferences_model.category_model.type_codes_for_mask(
+            preferences_model.get_preferences_mask()
+        )
+        return {
+            city.capitalize(): count
+            for city, count in self._venue_counts.city_counts(type_codes).items()
+        }
+
+    @pyqtSlot()
+    def flush(self):
+        """Writes pending preference changes to disk."""
+        self._preferences_model.flush()
+
+    @pyqtSlot(result=list)
+    def get_profiles(self) -> list[str]:
+        """Returns names of the stored preference profiles to qml side."""
+        return self._preferences_model.profile_names
+
+    @pyqtSlot(result=str)
+    def get_profile(self) -> str:
+        """Returns name of the preference profile in use."""
+        return self._preferences_model.profile
+
+    @pyqtSlot(str)
+    @interaction("switch profile")
+    def set_profile(self, name: str):
+        """Changes the preference profile in use. The city of the profile becomes current."""
+        previous_city = self._preferences_model.current_city
+        self._preferences_model.switch_profile(name)
+        if self._preferences_model.current_city != previous_city:
+            self.city_changed.emit()
@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+from typing import Callable
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal, pyqtSlot
+
+from sportlocate.controllers.venue_proxy_model import distance_km
+from sportlocate.models.venuemodel import VenueModel
+from sportlocate.models.weathermodel import WeatherModel
+from sportlocate.utils.cancellation import CancellationToken
+from sportlocate.utils.diskcache import DiskCache
+from sportlocate.utils.profiling import add_interaction_listener, remove_interaction_listener
+from sportlocate.utils.ratelimiter import RateLimiter
+from sportlocate.utils.scheduler import JobLane, default_scheduler
+from sportlocate.utils.services import get_service
+
+# Recently chosen cities that are remembered between the runs
+MAX_RECENT_CITIES = 8
+# Neighbouring municipalities closer than this are prefetched (kilometers)
+NEIGHBOUR_RADIUS_KM = 60.0
+MAX_NEIGHBOURS = 4
+# Cities that need requests may be prefetched at most this often, the upstream budget
+PREFETCH_CITIES_PER_MINUTE = 6
+PREFETCH_BURST = 3
+# Time without interactions before prefetching starts (milliseconds)
+IDLE_DELAY_MS = 2000
+# Delays after a city hint, between the prefetched cities and when the budget is used
+HINT_DELAY_MS = 300
+PREFETCH_INTERVAL_MS = 500
+BUDGET_RETRY_MS = 5000
+
+RECENT_CITIES_KEY = "recent_cities"
+
+
+class CityPredictor:
+    """
+    Predicts the cities that the user is likely to choose next.
+
+    The city under the cursor in the city list comes first, then the recently
+    chosen cities, most recent first, and last the neighbouring municipalities of
+    the current city nearest first. Neighbours are found from the city locations
+    that are already known, so predicting never needs requests.
+    """
+
+    def __init__(self, city_locations: Callable[[], dict[str, tuple]], history_cache: DiskCache = None):
+        """
+        Init the predictor.
+
+        Args:
+            city_locations (Callable): Returns the known city locations, city -> (lat, lon).
+            history_cache (DiskCache, optional): Cache where the recent cities are stored.
+        """
+        self._city_locations = city_locations
+        self._history_cache = history_cache or DiskCache("prefetch")
+        self._recent_cities: list[str] = self._history_cache.get(RECENT_CITIES_KEY, [])
+        self._hinted_city = None
+
+    @property
+    def recent_cities(self) -> list[str]:
+        """Recently chosen cities, most recent first."""
+        return list(self._recent_cities)
+
+    def record(self, city: str):
+        """Records that the user chose the city."""
+        city = city.lower()
+        self._recent_cities = [city] + [recent for recent in self._recent_cities if recent != city]
+        del self._recent_cities[MAX_RECENT_CITIES:]
+        self._history_cache.set(RECENT_CITIES_KEY, self._recent_cities)
+        if self._hinted_city == city:
+            self._hinted_city = None
+
+    def hint(self, city: str):
+        """Tells that the user is pointing the city, for example in the city list."""
+        self._hinted_city = city.lower()
+
+    def candidates(self, current_city: str) -> list[str]:
+        """Returns the cities likely chosen after the current city, most likely first."""
+        current_city = current_city.lower()
+        cities = [self._hinted_city] if self._hinted_city else []
+        cities.extend(self._recent_cities)
+        cities.extend(self._neighbours(current_city))
+        # Keeping the first (most likely) occurrence of every city
+        return [city for city in dict.fromkeys(cities) if city != current_city]
+
+    def _neighbours(self, city: str) -> list[str]:
+        locations = self._city_locations()
+        origin = locations.get(city)
+        if origin is None:
+            return []
+        distances = {
+            other: distance_km(*origin, *location)
+            for other, location in locations.items()
+            if other != city
+        }
+        nearest = sorted(distances, key=distances.__getitem__)[:MAX_NEIGHBOURS]
+        return [other for other in nearest if distances[other] <= NEIGHBOUR_RADIUS_KM]
+
+
+class PrefetchController(QObject):
+    """
+    Warms the venue and weather caches of the cities that the user is likely to
+    choose next (see CityPredictor) while the application is idle.
+
+    Cities are prefetched one at a time in the prefetch lane of the scheduler
+    after IDLE_DELAY_MS without interactions. Cities that are not cached cost one
+    token of the request budget, so prefetching never makes more than
+    PREFETCH_CITIES_PER_MINUTE cities worth of upstream requests. When the user
+    starts an interaction the prefetch in progress is cancelled immediately and
+    prefetching continues after the next idle delay.
+    """
+
+    prefetched = pyqtSignal(str, name="prefetched")
+
+    def __init__(
+        self,
+        venue_factory=None,
+        weather_model: WeatherModel = None,
+        scheduler=None,
+        current_city: str = "",
+        budget: RateLimiter = None,
+        idle_delay_ms: int = IDLE_DELAY_MS,
+        parent=None,
+    ):
+        """
+        Init the controller.
+
+        Args:
+            venue_factory (VenueFactory, optional): Factory whose cache is warmed.
+            weather_model (WeatherModel, optional): Model whose cache is warmed.
+            scheduler (JobScheduler, optional): Scheduler for the jobs. Defaults to the
+                shared scheduler.
+            current_city (str, optional): City that is shown to the user.
+            budget (RateLimiter, optional): Budget of the cities that need requests.
+            idle_delay_ms (int, optional): Time without interactions before prefetching.
+            parent (QObject, optional): Parent object.
+        """
+        super().__init__(parent)
+        self._venue_factory = venue_factory or get_service(VenueModel).venue_factory
+        self._weather_model = weather_model or get_service(WeatherModel)
+        self._scheduler = scheduler or default_scheduler()
+        self._budget = budget or RateLimiter(PREFETCH_CITIES_PER_MINUTE / 60, PREFETCH_BURST)
+        self._idle_delay_ms = idle_delay_ms
+        self._predictor = CityPredictor(self._weather_model.cached_city_locations)
+        self._current_city = current_city
+        # Cities prefetched or found cached in this run
+        self._done: set[str] = set()
+        self._cancel_token: CancellationToken | None = None
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._prefetch_next)
+        add_interaction_listener(self._on_interaction)
+
+    def start(self):
+        """Starts prefetching after the idle delay."""
+        self._timer.start(self._idle_delay_ms)
+
+    def stop(self):
+        """Stops prefetching and cancels the prefetch in progress."""
+        remove_interaction_listener(self._on_interaction)
+        self._timer.stop()
+        self._cancel()
+
+    @pyqtSlot(str)
+    def record_city(self, name: str):
+        """Records the city chosen by the user. Its neighbours are prefetched next."""
+        self._current_city = name
+        self._predictor.record(name)
+        self._timer.start(self._idle_delay_ms)
+
+    @pyqtSlot(str)
+    def hint_city(self, name: str):
+        """Prefetches the city under the cursor first, for example in the city list."""
+        self._predictor.hint(name)
+        if self._cancel_token is None:
+            self._timer.start(min(HINT_DELAY_MS, self._idle_delay_ms))
+
+    def _on_interaction(self, name: str):
+        """Gives the way to the interactive work."""
+        self._cancel()
+        self._timer.start(self._idle_delay_ms)
+
+    def _cancel(self):
+        if self._cancel_token is not None:
+            self._cancel_token.cancel()
+            self._cancel_token = None
+
+    def _prefetch_next(self):
+        """Starts prefetch of the most likely city that is not cached yet."""
+        if self._cancel_token is not None:
+            return
+        interactive = self._scheduler.stats()[JobLane.INTERACTIVE]
+        if interactive.queued or interactive.running:
+            self._timer.start(self._idle_delay_ms)
+            return
+        for city in self._predictor.candidates(self._current_city):
+            if city in self._done:
+                continue
+            if self._is_cached(city):
+                self._done.add(city)
+                continue
+            if not self._budget.try_acquire():
+                self._timer.start(BUDGET_RETRY_MS)
+                return
+            self._cancel_token = self._scheduler.submit(
+                self._prefetch_city,
+                city,
+                key=("prefetch", city),
+                lane=JobLane.PREFETCH,
+                on_result=lambda _, city=city: self._on_prefetched(city),
+                on_error=lambda error, city=city: self._on_prefetch_failed(city, error),
+                cancellable=True,
+            )
+            return
+
+    def _is_cached(self, city: str) -> bool:
+        return self._venue_factory.is_city_cached(city) and self._weather_model.is_weather_cached(city)
+
+    def _prefetch_city(self, city: str, cancel_token: CancellationToken):
+        """Loads the venues and weather of the city to the caches. Runs in worker thread."""
+        if not self._venue_factory.is_city_cached(city):
+            self._venue_factory.create_venues(city, cancel_token)
+        cancel_token.raise_if_cancelled()
+        if not self._weather_model.is_weather_cached(city):
+            self._weather_model.prefetch_weather(city.capitalize())
+
+    def _on_prefetched(self, city: str):
+        self._cancel_token = None
+        self._done.add(city)
+        self.prefetched.emit(city)
+        self._timer.start(PREFETCH_INTERVAL_MS)
+
+    def _on_prefetch_failed(self, city: str, error: tuple):
+        self._cancel_token = None
+        # Failed city is not tried again in this run
+        self._done.add(city)
+        print(f"Prefetching {city.capitalize()} failed: {error[1]}")
+        self._timer.start(PREFETCH_INTERVAL_MS)
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import re
+
+from PyQt5.QtCore import QBuffer, QIODevice
+from PyQt5.QtWebEngine import QQuickWebEngineProfile
+from PyQt5.QtWebEngineCore import (
+    QWebEngineUrlRequestJob,
+    QWebEngineUrlScheme,
+    QWebEngineUrlSchemeHandler,
+)
+
+from sportlocate.utils.cancellation import CancellationToken
+from sportlocate.utils.mapdocuments import MapDocumentStore
+from sportlocate.utils.scheduler import JobLane, JobScheduler, default_scheduler
+from sportlocate.utils.tilecache import TileCache, tile_mime_type
+from sportlocate.utils.webassets import AssetStore
+
+# Scheme of the resources that the application serves to the map view
+APP_SCHEME = b"sportlocate"
+
+# Leaflet tile layer url of the tile cache
+TILE_URL_TEMPLATE = "sportlocate://tiles/{z}/{x}/{y}.png"
+
+_TILE_PATH = re.compile(r"^/(\d+)/(\d+)/(\d+)\.png$")
+
+
+def register_app_scheme():
+    """Registers the application url scheme. Must be called before the application is created."""
+    scheme = QWebEngineUrlScheme(APP_SCHEME)
+    scheme.setSyntax(QWebEngineUrlScheme.Syntax.Host)
+    scheme.setFlags(
+        QWebEngineUrlScheme.Flag.SecureScheme
+        | QWebEngineUrlScheme.Flag.LocalAccessAllowed
+        | QWebEngineUrlScheme.Flag.CorsEnabled
+    )
+    QWebEngineUrlScheme.registerScheme(scheme)
+
+
+class AppSchemeHandler(QWebEngineUrlSchemeHandler):
+    """
+    Serves the sportlocate:// urls to the WebEngineView of the map.
+
+    sportlocate://tiles/{z}/{x}/{y}.png returns a map tile from the TileCache. Tiles
+    that are available locally are returned immediately, others are downloaded in
+    the tile lane of the scheduler, which has its own threads, so that visible tiles
+    neither wait behind city prefetches nor hold back venue loads.
+
+    sportlocate://map/{name} returns a map document or its data from MapDocumentStore.
+
+    sportlocate://assets/{host}/{path} returns a file of the map libraries from
+    AssetStore. Files that are not bundled or cached are downloaded in the
+    interactive lane, because the map cannot be shown before they are loaded.
+    """
+
+    def __init__(
+        self,
+        tile_cache: TileCache,
+        map_documents: MapDocumentStore,
+        scheduler: JobScheduler = None,
+        assets: AssetStore = None,
+        parent=None,
+    ):
+        """
+        Init the handler.
+
+        Args:
+            tile_cache (TileCache): Cache of the map tiles.
+            map_documents (MapDocumentStore): Generated map documents.
+            scheduler (JobScheduler, optional): Scheduler for the tile downloads. Defaults to
+                the shared scheduler.
+            assets (AssetStore, optional): Files of the map libraries.
+            parent (QObject, optional): Parent object.
+        """
+        super().__init__(parent)
+        self._tile_cache = tile_cache
+        self._map_documents = map_documents
+        self._scheduler = scheduler or default_scheduler()
+        self._assets = assets or AssetStore()
+
+    def install(self):
+        """Installs the handler to the default profile used by qml WebEngineViews."""
+        QQuickWebEngineProfile.defaultProfile().installUrlSchemeHandler(APP_SCHEME, self)
+
+    def requestStarted(self, job: QWebEngineUrlRequestJob):
+        """Handles the request of a sportlocate:// url."""
+        url = job.requestUrl()
+        if url.host() == "tiles":
+            self._handle_tile(job, url.path())
+        elif url.host() == "map":
+            self._handle_map_document(job, url.path().lstrip("/"))
+        elif url.host() == "assets":
+            self._handle_asset(job, url.path())
+        else:
+            job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound)
+
+    def _handle_tile(self, job: QWebEngineUrlRequestJob, path: str):
+        match = _TILE_PATH.match(path)
+        if match is None:
+            job.fail(QWebEngineUrlRequestJob.Error.UrlInvalid)
+            return
+        z, x, y = (int(value) for value in match.groups())
+        data = self._tile_cache.get_cached(z, x, y)
+        if data is not None:
+            self._reply(job, tile_mime_type(data), data)
+            return
+
+        # Job is deleted if the page is closed before the tile is ready
+        cancel_token = CancellationToken()
+        job.destroyed.connect(cancel_token.cancel)
+        self._scheduler.submit(
+            self._tile_cache.get,
+            z,
+            x,
+            y,
+            key=("tile", z, x, y),
+            lane=JobLane.TILES,
+            on_result=lambda tile: self._reply(job, tile_mime_type(tile), tile),
+            on_error=lambda error: job.fail(QWebEngineUrlRequestJob.Error.RequestFailed),
+            cancel_token=cancel_token,
+        )
+
+    def _handle_asset(self, job: QWebEngineUrlRequestJob, path: str):
+        try:
+            asset = self._assets.get_cached(path)
+        except ValueError:
+            job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound)
+            return
+        if asset is not None:
+            self._reply(job, *asset)
+            return
+
+        cancel_token = CancellationToken()
+        job.destroyed.connect(cancel_token.cancel)
+        self._scheduler.submit(
+            self._assets.get,
+            path,
+            key=("asset", path),
+            lane=JobLane.INTERACTIVE,
+            on_result=lambda asset: self._reply(job, *asset),
+            on_error=lambda error: job.fail(QWebEngineUrlRequestJob.Error.RequestFailed),
+            cancel_token=cancel_token,
+        )
+
+    def _handle_map_document(self, job: QWebEngineUrlRequestJob, name: str):
+        document = self._map_documents.get(name)
+        if document is None:
+            job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound)
+        else:
+            self._reply(job, *document)
+
+    @staticmethod
+    def _reply(job: QWebEngineUrlRequestJob, mime_type: bytes, data: bytes):
+        # Buffer is owned by the job so it is alive as long as the job reads it
+        buffer = QBuffer(job)
+        buffer.setData(data)
+        buffer.open(QIODevice.ReadOnly)
+        job.reply(mime_type, buffer)
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+from difflib import SequenceMatcher
+
+from PyQt5.QtCore import (
+    QAbstractListModel,
+    QModelIndex,
+    Qt,
+    pyqtProperty,
+    pyqtSignal,
+    pyqtSlot,
+)
+
+from sportlocate.models.venue import Venue
+
+
+class VenueListModel(QAbstractListModel):
+    """List model that provides venues to qml ListView.
+
+    Venue fields are read lazily with roles when the view asks for them, so the
+    venues are never copied as a whole to qml side. When the venues are changed
+    only the rows that really changed are removed, inserted or updated, so the
+    view can keep its position and delegates.
+    """
+
+    IdRole = Qt.UserRole + 1
+    NameRole = Qt.UserRole + 2
+    TypeCodeRole = Qt.UserRole + 3
+    CityNameRole = Qt.UserRole + 4
+    InfoRole = Qt.UserRole + 5
+    LatRole = Qt.UserRole + 6
+    LonRole = Qt.UserRole + 7
+
+    # Role -> (role name in qml, function that reads the value from venue)
+    _roles = {
+        IdRole: (b"id", lambda venue: venue.id),
+        NameRole: (b"name", lambda venue: venue.name),
+        TypeCodeRole: (b"type_code", lambda venue: getattr(venue, "type_code", -1)),
+        CityNameRole: (b"city_name", lambda venue: venue.city_name),
+        InfoRole: (b"info", lambda venue: venue.info),
+        LatRole: (b"lat", lambda venue: venue.coordinates.lat),
+        LonRole: (b"lon", lambda venue: venue.coordinates.lon),
+    }
+
+    count_changed = pyqtSignal(name="countChanged")
+    # Emitted once after set_venues has signaled all of its row changes
+    venues_changed = pyqtSignal(name="venuesChanged")
+
+    def __init__(self, parent=None):
+        """Init the model."""
+        super().__init__(parent)
+        self._venues: list[Venue] = []
+        self._row_by_id = None
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        """Count of venues in the model."""
+        return 0 if parent.isValid() else len(self._venues)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        """Returns the role value of the venue in the index row."""
+        if not index.isValid() or not 0 <= index.row() < len(self._venues):
+            return None
+        venue = self._venues[index.row()]
+        if role == Qt.DisplayRole:
+            return venue.name
+        if role in self._roles:
+            return self._roles[role][1](venue)
+        return None
+
+    def roleNames(self) -> dict:
+        """Role names that can be used in qml delegates."""
+        return {role: name for role, (name, _) in self._roles.items()}
+
+    @pyqtProperty(int, notify=count_changed)
+    def count(self) -> int:
+        """Count of venues (for qml side)."""
+        return len(self._venues)
+
+    @property
+    def venues(self) -> list[Venue]:
+        """Venues in the model."""
+        return self._venues
+
+    def venue_by_id(self, venue_id: int) -> Venue | None:
+        """Returns the venue with the id or None if the venue is not in the model."""
+        row = self.row_of(venue_id)
+        return None if row < 0 else self._venues[row]
+
+    @pyqtSlot(int, result=int)
+    def row_of(self, venue_id: int) -> int:
+        """Returns row of the venue with the id or -1 if the venue is not in the model."""
+        if self._row_by_id is None:
+            self._row_by_id = {venue.id: row for row, venue in enumerate(self._venues)}
+        return self._row_by_id.get(venue_id, -1)
+
+    def set_venues(self, venues: list[Venue]):
+        """
+        Updates the model to contain the given venues.
+
+        Differences between the old and the new venues are computed by venue id and
+        only the changed rows are signaled to the views.
+
+        Args:
+            venues (list[Venue]): New venues of the model.
+        """
+        old_count = len(self._venues)
+        if not self._venues or not venues:
+            # Nothing to keep, resetting is cheaper than computing differences
+            self.beginResetModel()
+            self._venues = list(venues)
+            self._row_by_id = None
+            self.endResetModel()
+        else:
+            self._apply_differences(venues)
+        if len(self._venues) != old_count:
+            self.count_changed.emit()
+        self.venues_changed.emit()
+
+    def _apply_differences(self, venues: list[Venue]):
+        matcher = SequenceMatcher(
+            None,
+            [venue.id for venue in self._venues],
+            [venue.id for venue in venues],
+            autojunk=False,
+        )
+        # Handling the changes from the end so that the earlier row numbers stay valid
+        for tag, old_start, old_end, new_start, new_end in reversed(matcher.get_opcodes()):
+            if tag == "equal":
+                self._update_rows(old_start, venues[new_start:new_end])
+                continue
+            if tag in ("delete", "replace"):
+                self.beginRemoveRows(QModelIndex(), old_start, old_end - 1)
+                del self._venues[old_start:old_end]
+                self._row_by_id = None
+                self.endRemoveRows()
+            if tag in ("insert", "replace"):
+                self.beginInsertRows(
+                    QModelIndex(), old_start, old_start + new_end - new_start - 1
+                )
+                self._venues[old_start:old_start] = venues[new_start:new_end]
+                self._row_by_id = None
+                self.endInsertRows()
+
+    def _update_rows(self, first_row: int, venues: list[Venue]):
+        """Replaces the venues starting from first_row and signals the changed rows."""
+        for offset, venue in enumerate(venues):
+            row = first_row + offset
+            if self._venues[row] != venue:
+                self._venues[row] = venue
+                index = self.index(row)
+                self.dataChanged.emit(index, index)
@@ -0,0 +1,454 @@
+from __future__ import annotations
+
+import math
+
+from collections import Counter
+
+from PyQt5.QtCore import (
+    QAbstractProxyModel,
+    QModelIndex,
+    pyqtProperty,
+    pyqtSignal,
+    pyqtSlot,
+)
+
+from sportlocate.controllers.venue_list_model import VenueListModel
+from sportlocate.models.sportvenuecategorymodel import SportVenueCategoryModel
+from sportlocate.utils.searchindex import SearchIndex
+
+# Sort keys that can be used from qml side. Empty key keeps the load order.
+SORT_KEYS = ("", "name", "distance", "type")
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great circle distance between two coordinates in kilometers."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class VenueProxyModel(QAbstractProxyModel):
+    """Search, sort and category facet filtering over VenueListModel.
+
+    Names, info texts, type codes and sort orders of the source venues are indexed
+    in Python when the source changes. The search ignores diacritics and case and
+    matches word prefixes, or similar words when no word starts with the search
+    text (see SearchIndex). Changing the search text, sort key or facets
+    only walks the precomputed order once, so the results are updated well within
+    a frame even for thousands of venues. The view sees only the matching rows, the
+    venues are never copied to qml side.
+
+    Rows that the source inserts, removes or changes are inserted to, removed from
+    or updated in their sorted place of the view, so the view keeps its position
+    and delegates. The index is built again once after the source has applied all
+    changes of set_venues. Until then inserted and changed venues are added to the
+    search index, which is keyed by venue id, and the rows are looked up in the
+    matches of the whole index. Only source resets and changes of the search, sort
+    key or facets reset the view.
+    """
+
+    search_text_changed = pyqtSignal(name="searchTextChanged")
+    sort_key_changed = pyqtSignal(name="sortKeyChanged")
+    facets_changed = pyqtSignal(name="facetsChanged")
+    count_changed = pyqtSignal(name="countChanged")
+
+    def __init__(self, category_model: SportVenueCategoryModel, parent=None):
+        """
+        Init the proxy model.
+
+        Args:
+            category_model (SportVenueCategoryModel): Categories used in the facets.
+            parent (QObject, optional): Parent object.
+        """
+        super().__init__(parent)
+        self._category_model = category_model
+        self._search_text = ""
+        self._sort_key = ""
+        self._facet_mask = 0
+        self._facets = []
+        self._reference_point = None
+        # Indexes of the source rows
+        self._ids: list = []
+        self._names: list[str] = []
+        self._search_index = SearchIndex()
+        # Venue ids that match the search text, None when not computed
+        self._matching_ids = None
+        self._type_codes: list[int] = []
+        self._orders: dict[str, list[int]] = {}
+        # Set when the source rows have changed after the index was built
+        self._index_dirty = False
+        # Source rows that are visible, in visible order
+        self._rows: list[int] = []
+        self._proxy_row_by_source_row = None
+        # Count of the rows when countChanged was last emitted
+        self._count = 0
+
+    def setSourceModel(self, source_model: VenueListModel):
+        """Sets the venue list model that is filtered."""
+        self.beginResetModel()
+        old_source = self.sourceModel()
+        if old_source is not None:
+            for signal, slot in self._source_connections(old_source):
+                signal.disconnect(slot)
+        super().setSourceModel(source_model)
+        for signal, slot in self._source_connections(source_model):
+            signal.connect(slot)
+        self._rebuild_index()
+        self._update_rows()
+        self.endResetModel()
+
+    # QAbstractProxyModel interface
+
+    def index(self, row: int, column: int = 0, parent=QModelIndex()) -> QModelIndex:
+        if parent.isValid() or column != 0 or not 0 <= row < len(self._rows):
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index=None):
+        # Without arguments this is QObject.parent()
+        if index is None:
+            return super().parent()
+        return QModelIndex()
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else 1
+
+    def mapToSource(self, proxy_index: QModelIndex) -> QModelIndex:
+        if not proxy_index.isValid() or not 0 <= proxy_index.row() < len(self._rows):
+            return QModelIndex()
+        return self.sourceModel().index(self._rows[proxy_index.row()])
+
+    def mapFromSource(self, source_index: QModelIndex) -> QModelIndex:
+        if not source_index.isValid():
+            return QModelIndex()
+        proxy_row = self._proxy_row(source_index.row())
+        return QModelIndex() if proxy_row is None else self.createIndex(proxy_row, 0)
+
+    def roleNames(self) -> dict:
+        source_model = self.sourceModel()
+        return {} if source_model is None else source_model.roleNames()
+
+    # Properties for qml side
+
+    @pyqtProperty(str, notify=search_text_changed)
+    def search_text(self) -> str:
+        """Text that venue names or info texts must match."""
+        return self._search_text
+
+    @search_text.setter
+    def search_text(self, text: str):
+        if text == self._search_text:
+            return
+        self._search_text = text
+        self._matching_ids = None
+        self.search_text_changed.emit()
+        self._refilter()
+
+    @pyqtProperty(str, notify=sort_key_changed)
+    def sort_key(self) -> str:
+        """Sort key of the venues: "" (load order), "name", "distance" or "type"."""
+        return self._sort_key
+
+    @sort_key.setter
+    def sort_key(self, key: str):
+        if key == self._sort_key:
+            return
+        if key not in SORT_KEYS:
+            raise ValueError(f"Unsupported sort key: {key}")
+        self._sort_key = key
+        self.sort_key_changed.emit()
+        self._refilter()
+
+    @pyqtProperty(list, notify=facets_changed)
+    def facets(self) -> list[dict]:
+        """Categories of the venues that match the search as objects
+        {"name": name, "count": venue count, "selected": bool}."""
+        return self._facets
+
+    @pyqtProperty(int, notify=count_changed)
+    def count(self) -> int:
+        """Count of venues that are shown."""
+        return len(self._rows)
+
+    @pyqtSlot(str)
+    def toggle_facet(self, name: str):
+        """Adds or removes the category from the facet filter. If no facets are selected
+        venues of all categories are shown."""
+        self._facet_mask ^= self._category_model.category_bit(name)
+        self._refilter()
+
+    @pyqtSlot()
+    def clear_facets(self):
+        """Shows the venues of all categories."""
+        self._facet_mask = 0
+        self._refilter()
+
+    def set_reference_point(self, lat: float, lon: float):
+        """Sets the point from where the distances are measured."""
+        if self._reference_point == (lat, lon):
+            return
+        self._reference_point = (lat, lon)
+        self._orders.pop("distance", None)
+        if self._sort_key == "distance":
+            self._refilter()
+
+    # Source changes
+
+    def _source_connections(self, source_model: VenueListModel) -> list[tuple]:
+        """Returns the source signals and the slots that handle them."""
+        return [
+            (source_model.modelReset, self._on_source_reset),
+            (source_model.rowsAboutToBeRemoved, self._on_source_rows_about_to_be_removed),
+            (source_model.rowsRemoved, self._on_source_rows_removed),
+            (source_model.rowsInserted, self._on_source_rows_inserted),
+            (source_model.dataChanged, self._on_source_data_changed),
+            (source_model.venues_changed, self._on_source_venues_changed),
+        ]
+
+    def _on_source_reset(self):
+        self._rebuild_index()
+        self._refilter()
+
+    def _on_source_rows_about_to_be_removed(self, parent: QModelIndex, first: int, last: int):
+        # Visible rows are removed while the source rows still exist
+        proxy_rows = (self._proxy_row(row) for row in range(first, last + 1))
+        self._remove_proxy_rows([proxy_row for proxy_row in proxy_rows if proxy_row is not None])
+
+    def _on_source_rows_removed(self, parent: QModelIndex, first: int, last: int):
+        count = last - first + 1
+        del self._ids[first:last + 1]
+        del self._names[first:last + 1]
+        del self._type_codes[first:last + 1]
+        self._rows = [row - count if row > last else row for row in self._rows]
+        self._proxy_row_by_source_row = None
+        self._index_dirty = True
+
+    def _on_source_rows_inserted(self, parent: QModelIndex, first: int, last: int):
+        count = last - first + 1
+        venues = self.sourceModel().venues[first:last + 1]
+        self._ids[first:first] = [venue.id for venue in venues]
+        self._names[first:first] = [venue.name.casefold() for venue in venues]
+        self._type_codes[first:first] = [getattr(venue, "type_code", -1) for venue in venues]
+        self._rows = [row + count if row >= first else row for row in self._rows]
+        self._proxy_row_by_source_row = None
+        self._index_venues(venues)
+        self._index_dirty = True
+        self._insert_source_rows(range(first, last + 1))
+
+    def _on_source_data_changed(self, top_left: QModelIndex, bottom_right: QModelIndex, roles=None):
+        venues = self.sourceModel().venues
+        rows = range(top_left.row(), bottom_right.row() + 1)
+        # Old words of a renamed venue stay in the index until it is built again
+        self._index_venues([venues[row] for row in rows])
+        self._index_dirty = True
+        for row in rows:
+            self._ids[row] = venues[row].id
+            self._names[row] = venues[row].name.casefold()
+            self._type_codes[row] = getattr(venues[row], "type_code", -1)
+            proxy_row = self._proxy_row(row)
+            if proxy_row is not None and self._accepts(row) and self._is_in_order(proxy_row):
+                index = self.index(proxy_row)
+                self.dataChanged.emit(index, index)
+                continue
+            # Venue that was renamed or changed its type moves, appears or disappears
+            if proxy_row is not None:
+                self._remove_proxy_rows([proxy_row])
+            self._insert_source_rows([row])
+
+    def _on_source_venues_changed(self):
+        """Builds the index once after the source has applied all changes."""
+        if not self._index_dirty:
+            return
+        self._rebuild_index()
+        rows, matching_rows = self._filter()
+        if rows != self._rows:
+            # Words of the removed and renamed venues were in the index while the
+            # rows were matched, so similar word matches can differ from the new index
+            self.beginResetModel()
+            self._rows = rows
+            self._proxy_row_by_source_row = None
+            self.endResetModel()
+        self._update_facets(matching_rows)
+        self._update_count()
+
+    def _proxy_row(self, source_row: int) -> int | None:
+        """Returns the visible row of the source row or None if it is not visible."""
+        if self._proxy_row_by_source_row is None:
+            self._proxy_row_by_source_row = {
+                source_row: proxy_row for proxy_row, source_row in enumerate(self._rows)
+            }
+        return self._proxy_row_by_source_row.get(source_row)
+
+    def _remove_proxy_rows(self, proxy_rows: list[int]):
+        """Removes the visible rows, contiguous rows together starting from the last."""
+        proxy_rows = sorted(proxy_rows)
+        while proxy_rows:
+            first = last = proxy_rows.pop()
+            while proxy_rows and proxy_rows[-1] == first - 1:
+                first = proxy_rows.pop()
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self._rows[first:last + 1]
+            self._proxy_row_by_source_row = None
+            self.endRemoveRows()
+
+    def _insert_source_rows(self, source_rows):
+        """Inserts the accepted source rows to their places in the visible order. Rows
+        that go to the same place are inserted together, starting from the last place."""
+        new_rows = sorted((row for row in source_rows if self._accepts(row)), key=self._sort_value)
+        positions = [self._insert_position(row) for row in new_rows]
+        end = len(new_rows)
+        while end:
+            start = end - 1
+            while start and positions[start - 1] == positions[end - 1]:
+                start -= 1
+            position = positions[start]
+            self.beginInsertRows(QModelIndex(), position, position + end - start - 1)
+            self._rows[position:position] = new_rows[start:end]
+            self._proxy_row_by_source_row = None
+            self.endInsertRows()
+            end = start
+
+    def _accepts(self, row: int) -> bool:
+        """Returns True if the source row matches the facets and the search text."""
+        if self._facet_mask and (
+            self._type_codes[row] not in self._category_model.type_codes_for_mask(self._facet_mask)
+        ):
+            return False
+        return not self._search_text.strip() or self._ids[row] in self._get_matching_ids()
+
+    def _sort_value(self, row: int) -> tuple:
+        """Returns the value of the source row in the visible order. Ties are in source
+        order as in the precomputed orders."""
+        if self._sort_key == "name":
+            return (self._names[row], row)
+        if self._sort_key == "type":
+            return (self._type_codes[row], self._names[row], row)
+        if self._sort_key == "distance":
+            lat, lon = self._reference_point or (0.0, 0.0)
+            coordinates = self.sourceModel().venues[row].coordinates
+            return (distance_km(lat, lon, coordinates.lat, coordinates.lon), row)
+        return (row,)
+
+    def _insert_position(self, row: int) -> int:
+        """Returns the visible row where the source row is inserted (binary search)."""
+        value = self._sort_value(row)
+        low, high = 0, len(self._rows)
+        while low < high:
+            middle = (low + high) // 2
+            if self._sort_value(self._rows[middle]) < value:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _is_in_order(self, proxy_row: int) -> bool:
+        """Returns True if the visible row is still between its neighbours in the order."""
+        value = self._sort_value(self._rows[proxy_row])
+        if proxy_row > 0 and not self._sort_value(self._rows[proxy_row - 1]) < value:
+            return False
+        return proxy_row + 1 == len(self._rows) or value < self._sort_value(self._rows[proxy_row + 1])
+
+    # Indexing and filtering
+
+    def _rebuild_index(self):
+        venues = self.sourceModel().venues
+        self._ids = [venue.id for venue in venues]
+        self._names = [venue.name.casefold() for venue in venues]
+        self._type_codes = [getattr(venue, "type_code", -1) for venue in venues]
+        self._search_index = SearchIndex()
+        self._index_venues(venues)
+        rows = range(len(venues))
+        self._orders = {
+            "": list(rows),
+            "name": sorted(rows, key=self._names.__getitem__),
+            "type": sorted(rows, key=lambda row: (self._type_codes[row], self._names[row])),
+        }
+        self._index_dirty = False
+
+    def _index_venues(self, venues):
+        """Adds the venues to the search index."""
+        for venue in venues:
+            self._search_index.add(venue.id, venue.name, venue.info)
+        self._matching_ids = None
+
+    def _get_matching_ids(self) -> set:
+        """Returns the ids of the venues that match the search text. The search index
+        is searched once per search text and index change."""
+        if self._matching_ids is None:
+            self._matching_ids = self._search_index.matches(self._search_text)
+        return self._matching_ids
+
+    def _get_order(self, key: str) -> list[int]:
+        order = self._orders.get(key)
+        if order is None:
+            # Distance order depends on the reference point so it is computed when needed
+            lat, lon = self._reference_point or (0.0, 0.0)
+            venues = self.sourceModel().venues
+            distances = [
+                distance_km(lat, lon, venue.coordinates.lat, venue.coordinates.lon)
+                for venue in venues
+            ]
+            order = sorted(range(len(venues)), key=distances.__getitem__)
+            self._orders[key] = order
+        return order
+
+    def _refilter(self):
+        self.beginResetModel()
+        self._update_rows()
+        self.endResetModel()
+
+    def _update_rows(self):
+        if self._index_dirty:
+            self._rebuild_index()
+        self._rows, matching_rows = self._filter()
+        self._proxy_row_by_source_row = None
+        self._update_facets(matching_rows)
+        self._update_count()
+
+    def _filter(self) -> tuple[list[int], list[int]]:
+        """Returns the visible rows, and the rows that match the search from which the
+        facet counts are computed."""
+        if self._search_text.strip():
+            matches = self._get_matching_ids()
+            ids = self._ids
+            matching_rows = [row for row in self._get_order(self._sort_key) if ids[row] in matches]
+        else:
+            matching_rows = self._get_order(self._sort_key)
+
+        if self._facet_mask:
+            type_codes = self._category_model.type_codes_for_mask(self._facet_mask)
+            rows = [row for row in matching_rows if self._type_codes[row] in type_codes]
+        else:
+            rows = list(matching_rows)
+        return rows, matching_rows
+
+    def _update_count(self):
+        if len(self._rows) != self._count:
+            self._count = len(self._rows)
+            self.count_changed.emit()
+
+    def _update_facets(self, matching_rows: list[int]):
+        type_code_counts = Counter(self._type_codes[row] for row in matching_rows)
+        category_counts = Counter()
+        for type_code, count in type_code_counts.items():
+            mask = self._category_model.mask_for_type_code(type_code)
+            for category in self._category_model.categories_for_mask(mask):
+                category_counts[category.name] += count
+        facets = []
+        for category in self._category_model.sport_venue_categories:
+            selected = bool(self._facet_mask & self._category_model.category_bit(category.name))
+            if category_counts[category.name] or selected:
+                facets.append(
+                    {"name": category.name, "count": category_counts[category.name], "selected": selected}
+                )
+        if facets != self._facets:
+            self._facets = facets
+            self.facets_changed.emit()
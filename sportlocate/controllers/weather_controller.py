@@ -1,8 +1,10 @@
 from __future__ import annotations
 
-from PyQt5.QtCore import QObject, pyqtProperty, pyqtSignal, pyqtSlot, QThreadPool
+from PyQt5.QtCore import QObject, pyqtProperty, pyqtSignal, pyqtSlot
 
-from sportlocate.utils.qmlworker import Worker
+from sportlocate.utils.profiling import interaction
+from sportlocate.utils.scheduler import JobLane, default_scheduler
+from sportlocate.utils.services import get_service
 from sportlocate.models.weathermodel import WeatherModel, WeatherData
 
 
@@ -16,10 +18,19 @@ class WeatherController(QObject):
     warning_info_changed = pyqtSignal(name="warningInfoChanged")
     start_indicator = pyqtSignal(name="startIndicator")
 
-    def __init__(self):
-        """Init."""
+    def __init__(self, async_bridge=None, scheduler=None):
+        """Init.
+
+        Args:
+            async_bridge (AsyncioBridge, optional): If given weather is fetched with asynchronous
+                requests in Qt event loop instead of worker threads.
+            scheduler (JobScheduler, optional): Scheduler for the worker jobs. Defaults to
+                the shared scheduler.
+        """
         super().__init__()
-        self._weather_model = WeatherModel()
+        self._async_bridge = async_bridge
+        self._scheduler = scheduler or default_scheduler()
+        self._weather_model = get_service(WeatherModel)
         self._temperature = ""
         self._windspeed = ""
         self._weathercondition = ""
@@ -46,6 +57,7 @@ class WeatherController(QObject):
         return self._warning_info
 
     @pyqtSlot(str)
+    @interaction("show weather")
     def get_and_display_weather(self, city_name: str):
         """
         Fetch weather information for the specified city and update properties.
@@ -54,9 +66,19 @@ class WeatherController(QObject):
             city_name (str): The name of the city for which weather information is fetched.
         """
         self.start_indicator.emit()
-        worker = Worker(self._weather_model.get_weather_info, city_name)
-        worker.signals.result.connect(self.update_weather)
-        QThreadPool.globalInstance().start(worker)
+        if self._async_bridge is not None:
+            self._async_bridge.run(
+                self._weather_model.get_weather_info_async(city_name),
+                on_result=self.update_weather,
+            )
+        else:
+            self._scheduler.submit(
+                self._weather_model.get_weather_info,
+                city_name,
+                key=("weather", city_name.lower()),
+                lane=JobLane.INTERACTIVE,
+                on_result=self.update_weather,
+            )
 
     @pyqtSlot(object)
     def update_weather(self, weather_data: WeatherData):
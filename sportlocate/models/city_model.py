@@ -2,32 +2,22 @@ from __future__ import annotations
 import pandas as pd
 from pathlib import Path
 
+from sportlocate.utils.searchindex import SearchIndex
+
 
 class CityModel:
-    """CityModel singleton that stores city and city code information and
+    """CityModel that stores city and city code information and
     serves that for SportVenue factory and also to UI side.
 
     Reads city/citycode information from .csv file. In the future that
     can be read for example using requests.
     """
 
-    _instance = None
-
-    def __new__(cls, *args, **kwargs):
-        """Create and return a new instance of CityModel.
-
-        This method ensures that only a single instance of CityModel is created.
-        If an instance already exists, it is returned; otherwise, a new instance is created.
-        """
-        if not cls._instance:
-            cls._instance = super(CityModel, cls).__new__(cls)
-            cls._instance.__init__()
-        return cls._instance
-
     def __init__(self):
         """Init the model."""
         self._cities = []
         self._cities_and_city_codes = {}
+        self._search_index = None
         self._load_cities()
 
     @property
@@ -45,6 +35,22 @@ class CityModel:
         """
         return self._cities_and_city_codes
 
+    def search(self, text: str, limit: int = None) -> list[object]:
+        """
+        Returns the city objects whose name matches the search text, best matches
+        first. Diacritics and case are ignored, so "aane" finds Äänekoski.
+
+        Args:
+            text (str): Search text.
+            limit (int, optional): Maximum count of the returned cities.
+
+        Returns:
+            list[object]: City objects {name: "", code: ""}.
+        """
+        if self._search_index is None:
+            self._search_index = SearchIndex(enumerate(city["name"] for city in self._cities))
+        return [self._cities[i] for i in self._search_index.search(text, limit)]
+
     def _load_cities(self):
         """Load cities information from csv-file. The file is from https://www.stat.fi/en/luokitukset/kunta/."""
         self._cities_and_city_codes = self.read_cities_and_city_codes()
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import sys
+import threading
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable
+
+from sportlocate.models.venue import Venue
+
+# Default memory budget of the cached city venues (bytes)
+DEFAULT_BUDGET_BYTES = 64 * 1024 * 1024
+
+# Memory used by a venue list and its dict entry besides the venues
+CITY_OVERHEAD_BYTES = 256
+
+
+def estimate_venue_size(venue: Venue) -> int:
+    """Returns approximate memory usage of the venue object in bytes.
+
+    Counts the venue and coordinates objects, their attribute dicts and the
+    attribute values. Strings shared with other objects are counted for every venue,
+    so the estimate errs on the high side.
+    """
+    size = sys.getsizeof(venue) + sys.getsizeof(vars(venue))
+    for value in vars(venue).values():
+        if hasattr(value, "__dict__"):
+            size += sys.getsizeof(value) + sys.getsizeof(vars(value))
+            size += sum(sys.getsizeof(item) for item in vars(value).values())
+        else:
+            size += sys.getsizeof(value)
+    return size
+
+
+@dataclass
+class CityCacheStats:
+    """Metrics of the city venue cache."""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    evicted_venues: int = 0
+    resident_cities: int = 0
+    resident_venues: int = 0
+    resident_bytes: int = 0
+    budget_bytes: int = 0
+
+
+class CityVenueCache:
+    """
+    Memory bounded LRU cache of city venue lists.
+
+    Memory usage of every stored city is estimated when it is stored. When the
+    estimated size of all cities exceeds the budget the least recently used cities
+    are evicted until the cache fits the budget again. Pinned cities (for example
+    the city that is shown in the map) are never evicted. The newest city is kept
+    even if it alone exceeds the budget.
+    """
+
+    def __init__(
+        self,
+        budget_bytes: int = DEFAULT_BUDGET_BYTES,
+        on_evict: Callable[[str], None] = None,
+    ):
+        """
+        Init the cache.
+
+        Args:
+            budget_bytes (int, optional): Memory budget of the cached venues.
+            on_evict (Callable[[str], None], optional): Called with the city name when a city
+                is evicted.
+        """
+        self._budget_bytes = budget_bytes
+        self._on_evict = on_evict
+        # City -> (venues, estimated size), least recently used first
+        self._cities: OrderedDict[str, tuple[list[Venue], int]] = OrderedDict()
+        self._pinned = set()
+        self._stats = CityCacheStats(budget_bytes=budget_bytes)
+        self._lock = threading.Lock()
+
+    def __contains__(self, city: str) -> bool:
+        with self._lock:
+            return city in self._cities
+
+    def get(self, city: str) -> list[Venue] | None:
+        """Returns the city venues and marks the city recently used, or None if not cached."""
+        with self._lock:
+            entry = self._cities.get(city)
+            if entry is None:
+                self._stats.misses += 1
+                return None
+            self._cities.move_to_end(city)
+            self._stats.hits += 1
+            return entry[0]
+
+    def put(self, city: str, venues: list[Venue]):
+        """Stores the city venues, replacing old venues of the city."""
+        self._store(city, venues, replace=True)
+
+    def setdefault(self, city: str, venues: list[Venue]) -> list[Venue]:
+        """Stores the city venues if the city is not cached and returns the cached venues."""
+        return self._store(city, venues, replace=False)
+
+    def pin(self, city: str):
+        """Prevents the city from being evicted."""
+        with self._lock:
+            self._pinned.add(city)
+
+    def unpin(self, city: str):
+        """Allows the city to be evicted again."""
+        with self._lock:
+            self._pinned.discard(city)
+            evicted = self._evict_over_budget()
+        self._notify_evicted(evicted)
+
+    def items(self) -> list[tuple[str, list[Venue]]]:
+        """Returns the cached cities and their venues, least recently used first. Doesn't
+        change the recency of the cities."""
+        with self._lock:
+            return [(city, entry[0]) for city, entry in self._cities.items()]
+
+    def stats(self) -> CityCacheStats:
+        """Returns copy of the cache metrics."""
+        with self._lock:
+            return CityCacheStats(**vars(self._stats))
+
+    def _store(self, city: str, venues: list[Venue], replace: bool) -> list[Venue]:
+        size = CITY_OVERHEAD_BYTES + sum(estimate_venue_size(venue) for venue in venues)
+        with self._lock:
+            old_entry = self._cities.get(city)
+            if old_entry is not None and not replace:
+                self._cities.move_to_end(city)
+                return old_entry[0]
+            if old_entry is not None:
+                self._remove(city)
+            self._cities[city] = (venues, size)
+            self._stats.resident_cities += 1
+            self._stats.resident_venues += len(venues)
+            self._stats.resident_bytes += size
+            evicted = self._evict_over_budget()
+        self._notify_evicted(evicted)
+        return venues
+
+    def _evict_over_budget(self) -> list[str]:
+        """Evicts least recently used unpinned cities. Must be called with the lock held."""
+        evicted = []
+        newest_city = next(reversed(self._cities), None)
+        for city in list(self._cities):
+            if self._stats.resident_bytes <= self._budget_bytes:
+                break
+            if city in self._pinned or city == newest_city:
+                continue
+            venue_count = len(self._cities[city][0])
+            self._remove(city)
+            self._stats.evictions += 1
+            self._stats.evicted_venues += venue_count
+            evicted.append(city)
+        return evicted
+
+    def _remove(self, city: str):
+        venues, size = self._cities.pop(city)
+        self._stats.resident_cities -= 1
+        self._stats.resident_venues -= len(venues)
+        self._stats.resident_bytes -= size
+
+    def _notify_evicted(self, cities: list[str]):
+        if self._on_evict is not None:
+            for city in cities:
+                self._on_evict(city)
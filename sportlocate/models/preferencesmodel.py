@@ -1,44 +1,38 @@
 from __future__ import annotations
 
-import json
-
+from sportlocate.models.preferencesstore import default_store
 from sportlocate.models.sportvenuecategorymodel import SportVenueCategoryModel
 from sportlocate.models.venuecategory import VenueCategory
+from sportlocate.utils.services import get_service
 
 # Default city
 DEFAULT_CITY = "Tampere"
 
 
 class PreferencesModel:
-    """Preferences model is singleton class that handles and stores user given preferences like
+    """Preferences model handles and stores user given preferences like
     last city that user has search and venue categories that user has chosen not to be shown on map.
 
-    Stores only minimal amount of data (only those categories that user have checked out) to JSON file.
+    Stores only minimal amount of data (only those categories that user have checked out) to JSON file
+    in the user config directory. Preferences can be stored to several named profiles.
 
-    Write to disc is done everytime when user changes preferences so that those are always correct
-    if something happens for example program crashes.
+    Write to disc is done after every change so that those are always correct if something happens
+    for example program crashes. Writes are batched and done in background thread by PreferencesStore
+    so that rapid changes don't block the GUI thread.
     """
 
-    _instance = None
-
-    def __new__(cls, *args, **kwargs):
-        """Create and return a new instance of PreferenceModel.
-
-        This method ensures that only a single instance of PreferencesModel is created.
-        If an instance already exists, it is returned; otherwise, a new instance is created.
-        """
-        if not cls._instance:
-            cls._instance = super(PreferencesModel, cls).__new__(cls)
-            cls._instance.__init__()
-        return cls._instance
-
     def __init__(self):
         """Init preferences model.
         1. Gets the all sport venue categories from SportVenueCategoryModel
         2. Reading user preferences from a disc.
         """
-        self._all_categories = SportVenueCategoryModel().sport_venue_categories
+        self._category_model = get_service(SportVenueCategoryModel)
+        self._all_categories = self._category_model.sport_venue_categories
+        self._store = default_store()
+        self._profile = self._store.active_profile
         self._overrides = dict()
+        # Categories user wants to see as bit mask, kept in sync with the overrides
+        self._preferences_mask = self._category_model.all_categories_mask
         self._city = DEFAULT_CITY
         self.read_from_disk()
 
@@ -47,6 +41,11 @@ class PreferencesModel:
         """Returns all categories so that those can be shown in preferences view."""
         return self._all_categories
 
+    @property
+    def category_model(self) -> SportVenueCategoryModel:
+        """Category model the preferences are based on."""
+        return self._category_model
+
     @property
     def current_city(self) -> str:
         """Current city that is stored in user preferences."""
@@ -58,13 +57,33 @@ class PreferencesModel:
         self._city = city
         self.write_to_disk()
 
+    @property
+    def profile(self) -> str:
+        """Name of the preferences profile in use."""
+        return self._profile
+
+    @property
+    def profile_names(self) -> list[str]:
+        """Names of the stored preferences profiles."""
+        return self._store.profile_names
+
+    def switch_profile(self, name: str):
+        """Changes the preferences profile in use. New profile starts with default settings."""
+        self._profile = name
+        self.read_from_disk()
+        self.write_to_disk()
+
     def get_preferences(self) -> list[VenueCategory]:
         """Getter for current venue categories that user wants to show in the map."""
-        current_categories = []
-        for category in self._all_categories:
-            if category.name not in self._overrides:
-                current_categories.append(category)
-        return current_categories
+        return self._category_model.categories_for_mask(self._preferences_mask)
+
+    def get_preferences_mask(self) -> int:
+        """Getter for current venue categories as a bit mask (see SportVenueCategoryModel)."""
+        return self._preferences_mask
+
+    def is_category_enabled(self, name: str) -> bool:
+        """Returns True if user wants to see the venues of the category in the map."""
+        return bool(self._preferences_mask & self._category_model.category_bit(name))
 
     def set_preferences(self, name: str, value: bool):
         """Setting and saving user preferences (which type of venues user want to be shown in map)."""
@@ -76,40 +95,40 @@ class PreferencesModel:
             if name in self._overrides:
                 del self._overrides[name]
 
+        self._update_preferences_mask()
         self.write_to_disk()
 
     def write_to_disk(self):
-        """Writes user preferences to disc."""
+        """Writes user preferences to disc. Write is done in background after short delay."""
         # Ensuring that the city cannot be never nothing
         if self._city == "":
             self._city = DEFAULT_CITY
         serialized_data = {"overrides": self._overrides, "city": self._city}
-        with open("preferences.json", "w") as f:
-            json.dump(serialized_data, f)
+        self._store.save(self._profile, serialized_data)
+
+    def flush(self):
+        """Writes pending preference changes to disc immediately."""
+        self._store.flush()
 
     def read_from_disk(self):
-        """Reads user preferences to disc."""
-        try:
-            with open("preferences.json", "r") as f:
-                deserialized_data = json.load(f)
-                self._overrides = deserialized_data.get("overrides", {})
-                self._city = deserialized_data.get("city", {})
-                # If city doesn't exist in preferences.json using default city.
-                if self._city == "":
-                    self._city = DEFAULT_CITY
-
-        except FileNotFoundError:
-            # If preferences.json file not found writes that to user disc with default settings.
-            self.write_to_disk()
-            print(
-                "preferences.json not found, making that file and using default settings."
-            )
-
-        except json.JSONDecodeError:
-            # If decode error resets the preferences and write those to disc.
+        """Reads user preferences of the current profile from disc."""
+        deserialized_data = self._store.load(self._profile)
+        if deserialized_data is None:
+            # If profile is not found using default settings.
             self._overrides = {}
             self._city = DEFAULT_CITY
-            self.write_to_disk()
-            print(
-                "Error decoding preferences.json, resetting preferences.json and using default settings."
-            )
+        else:
+            self._overrides = deserialized_data.get("overrides", {})
+            self._city = deserialized_data.get("city", DEFAULT_CITY)
+            # If city doesn't exist in preferences using default city.
+            if self._city == "":
+                self._city = DEFAULT_CITY
+        self._update_preferences_mask()
+
+    def _update_preferences_mask(self):
+        """Computes the preferences mask from the overrides."""
+        mask = self._category_model.all_categories_mask
+        for category in self._all_categories:
+            if category.name in self._overrides:
+                mask &= ~self._category_model.category_bit(category.name)
+        self._preferences_mask = mask
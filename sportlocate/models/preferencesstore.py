@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import atexit
+import copy
+import json
+import threading
+
+from pathlib import Path
+
+from sportlocate.utils.diskcache import atomic_write_json
+from sportlocate.utils.paths import config_dir
+from sportlocate.utils.services import get_service, register_service
+
+DEFAULT_PROFILE = "default"
+
+# Changes done within this time (seconds) are written to disk together
+WRITE_DELAY = 0.5
+
+# Older versions stored the preferences to the working directory
+LEGACY_PREFERENCES_FILE = Path("preferences.json")
+
+
+class PreferencesStore:
+    """
+    Stores named preference profiles to the user config directory.
+
+    Changes are kept in memory and written to disk after WRITE_DELAY seconds
+    in a background thread, so a burst of changes (for example toggling many
+    categories) causes only one write. The file is replaced atomically with
+    temp file and rename, so a crash never leaves a half written file behind.
+    """
+
+    def __init__(self, write_delay: float = WRITE_DELAY):
+        """
+        Init the store.
+
+        Args:
+            write_delay (float, optional): Seconds to wait for more changes before writing.
+        """
+        self._write_delay = write_delay
+        self._document = None
+        self._timer = None
+        self._lock = threading.Lock()
+        # Keeps the writes in order if a new write is started while previous is running
+        self._write_lock = threading.Lock()
+        self.write_count = 0
+
+    @property
+    def path(self) -> Path:
+        """Path of the preferences file."""
+        return config_dir() / "preferences.json"
+
+    @property
+    def active_profile(self) -> str:
+        """Name of the profile that was used last time."""
+        with self._lock:
+            return self._get_document()["active_profile"]
+
+    @property
+    def profile_names(self) -> list[str]:
+        """Names of the stored profiles."""
+        with self._lock:
+            return sorted(self._get_document()["profiles"])
+
+    def load(self, profile: str) -> dict | None:
+        """Returns copy of the profile data or None if the profile doesn't exist."""
+        with self._lock:
+            return copy.deepcopy(self._get_document()["profiles"].get(profile))
+
+    def save(self, profile: str, data: dict):
+        """
+        Saves the profile data and makes it the active profile. The data is written
+        to disk after the write delay.
+
+        Args:
+            profile (str): Name of the profile.
+            data (dict): JSON serializable profile data.
+        """
+        with self._lock:
+            document = self._get_document()
+            document["profiles"][profile] = copy.deepcopy(data)
+            document["active_profile"] = profile
+            if self._timer is None:
+                self._timer = threading.Timer(self._write_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Writes pending changes to disk immediately."""
+        with self._write_lock:
+            with self._lock:
+                if self._timer is None:
+                    return
+                self._timer.cancel()
+                self._timer = None
+                document = copy.deepcopy(self._document)
+            atomic_write_json(self.path, document)
+            self.write_count += 1
+
+    def _get_document(self) -> dict:
+        """Returns the in-memory preferences document, reading it from disk first time."""
+        if self._document is None:
+            self._document = self._read_document()
+            # Profile in use is listed already before its settings are changed first time
+            self._document["profiles"].setdefault(self._document["active_profile"], {})
+        return self._document
+
+    def _read_document(self) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                document = json.load(f)
+            if "profiles" in document:
+                document.setdefault("active_profile", DEFAULT_PROFILE)
+                return document
+        except FileNotFoundError:
+            # Taking the preferences of older versions in use as default profile
+            legacy_profile = self._read_legacy_profile()
+            if legacy_profile is not None:
+                return {
+                    "active_profile": DEFAULT_PROFILE,
+                    "profiles": {DEFAULT_PROFILE: legacy_profile},
+                }
+        except json.JSONDecodeError:
+            print(f"Error decoding {self.path}, using default settings.")
+        return {"active_profile": DEFAULT_PROFILE, "profiles": {}}
+
+    @staticmethod
+    def _read_legacy_profile() -> dict | None:
+        try:
+            with open(LEGACY_PREFERENCES_FILE, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+
+def _create_default_store() -> PreferencesStore:
+    store = PreferencesStore()
+    atexit.register(store.flush)
+    return store
+
+
+register_service(PreferencesStore, _create_default_store)
+
+
+def default_store() -> PreferencesStore:
+    """Returns the preferences store shared by the application. Pending changes are
+    written when the program exits."""
+    return get_service(PreferencesStore)
@@ -15,14 +15,11 @@ class SportVenueCategoryModel:
     When model is created it fetches the category data from LIPAS API.
 
     Outdoor and indoor categories are used in sport venue recommendation and
-    in general categories are used in sport venue filtering based on user input."""
+    in general categories are used in sport venue filtering based on user input.
 
-    _instance = None
-
-    def __new__(cls, *args, **kwargs):
-        if not cls._instance:
-            cls._instance = super(SportVenueCategoryModel, cls).__new__(cls)
-        return cls._instance
+    Every category has a stable bit position (categories ordered by category code),
+    so a set of categories can be presented as one integer mask. Type codes of a
+    mask are computed once and cached as frozen sets."""
 
     def __init__(self):
         """Constructor for SortVenueCategoryModel"""
@@ -31,8 +28,13 @@ class SportVenueCategoryModel:
         self._sport_venue_categories = []
         self._indoor_categories = []
         self._outdoor_categories = []
+        # Category name -> category bit, and type code sets of the masks
+        self._category_bits = {}
+        self._mask_type_codes = {}
+        self._type_code_masks = {}
         # Fetch types to model when instance is created
         self._parse_sport_venue_categories()
+        self._assign_category_bits()
 
     @property
     def indoor_categories(self) -> list[SportVenueCategory]:
@@ -49,6 +51,64 @@ class SportVenueCategoryModel:
         """Getter for all categories."""
         return self._sport_venue_categories
 
+    @property
+    def all_categories_mask(self) -> int:
+        """Mask that contains all categories."""
+        return (1 << len(self._category_bits)) - 1
+
+    def category_bit(self, name: str) -> int:
+        """Returns the bit of the category with the given name."""
+        return self._category_bits[name]
+
+    def mask_for(self, categories: list[SportVenueCategory]) -> int:
+        """Returns mask of the categories."""
+        mask = 0
+        for category in categories:
+            mask |= self._category_bits[category.name]
+        return mask
+
+    def categories_for_mask(self, mask: int) -> list[SportVenueCategory]:
+        """Returns the categories in the mask in same order as sport_venue_categories."""
+        return [
+            category
+            for category in self._sport_venue_categories
+            if mask & self._category_bits[category.name]
+        ]
+
+    def mask_for_type_code(self, type_code: int) -> int:
+        """Returns mask of the categories that contain the sport venue type."""
+        return self._type_code_masks.get(type_code, 0)
+
+    def type_codes_for_mask(self, mask: int) -> frozenset[int]:
+        """Returns sport venue type codes of the categories in the mask."""
+        type_codes = self._mask_type_codes.get(mask)
+        if type_codes is None:
+            type_codes = frozenset(
+                type_code
+                for category in self.categories_for_mask(mask)
+                for type_code in category.sport_venue_types
+            )
+            self._mask_type_codes[mask] = type_codes
+        return type_codes
+
+    def _assign_category_bits(self):
+        """Gives every category a bit. Bits are assigned in category code order so that
+        those don't depend on the order of the API response."""
+        ordered_categories = sorted(
+            self._sport_venue_categories, key=lambda category: category.category_code
+        )
+        self._category_bits = {
+            category.name: 1 << position
+            for position, category in enumerate(ordered_categories)
+        }
+        self._mask_type_codes = {}
+        self._type_code_masks = {}
+        for category in ordered_categories:
+            for type_code in category.sport_venue_types:
+                self._type_code_masks[type_code] = (
+                    self._type_code_masks.get(type_code, 0) | self._category_bits[category.name]
+                )
+
     def _parse_sport_venue_categories(self):
         """Parses API data to model datastructures."""
         try:
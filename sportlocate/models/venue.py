@@ -33,6 +33,13 @@ class Venue(ABC):
     def to_dict(self):
         return asdict(self)
 
+    @classmethod
+    def from_dict(cls, data: dict):
+        """Creates venue from a dict that is made with to_dict."""
+        data = dict(data)
+        coordinates = Coordinates(**data.pop("coordinates"))
+        return cls(coordinates=coordinates, **data)
+
 
 @dataclass
 class SportVenue(Venue):
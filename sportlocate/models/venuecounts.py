@@ -0,0 +1,170 @@
+"""
+venuecounts.py
+
+Venue counts per city and sport venue type, stored next to the venue cache.
+
+The counts are updated whenever the venues of a city are fetched, synced or
+read from the disk cache, so the cache warm-up job builds them for every city.
+With the counts the preference view and the city picker can show how many
+venues a category or a city has without loading the venues, and filters that
+cannot match any venue of a city are answered without a network request.
+
+Every city is stored to its own small file, so the application and the warm-up
+job (another process) can update counts at the same time without overwriting
+the cities of each other. Only the files that have changed since they were
+read are read again.
+"""
+from __future__ import annotations
+
+import threading
+
+from time import time
+from typing import Iterable
+
+from sportlocate.models.venue import SportVenue
+from sportlocate.utils.diskcache import DiskCache
+from sportlocate.utils.services import get_service
+
+# Counts older than this are not used, same as the time to live of the cached venues (seconds)
+VENUE_COUNTS_TTL = 7 * 24 * 60 * 60
+
+
+class VenueCountIndex:
+    """
+    Counts of the venues per (city, sport venue type code).
+
+    Usage:
+        counts = get_venue_count_index()
+        counts.update("tampere", venues)
+        counts.count("tampere", type_codes)  # None if the city hasn't been counted
+    """
+
+    def __init__(self, cache: DiskCache = None, ttl: float = VENUE_COUNTS_TTL):
+        """
+        Init the index.
+
+        Args:
+            cache (DiskCache, optional): Cache where the counts are stored.
+            ttl (float, optional): Age in seconds after which counts of a city are not used.
+        """
+        self._cache = cache or DiskCache("venue_counts")
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        # City -> (counted at, type code -> venue count), and modification times of the
+        # files they were read from
+        self._cities: dict[str, tuple[float, dict[int, int]]] = {}
+        self._file_versions: dict[str, int] = {}
+        self._loaded_version = None
+
+    def update(self, city: str, venues: Iterable[SportVenue]):
+        """Counts the venues of the city by type and stores the counts."""
+        type_code_counts = {}
+        for venue in venues:
+            type_code = getattr(venue, "type_code", -1)
+            type_code_counts[type_code] = type_code_counts.get(type_code, 0) + 1
+        city = city.lower()
+        counted_at = time()
+        with self._lock:
+            # Written atomically to the file of the city, other cities are not touched
+            self._cache.set(city, [counted_at, {str(code): count for code, count in type_code_counts.items()}])
+            self._cities[city] = (counted_at, type_code_counts)
+            self._file_versions[city] = self._cache.modified_at(city)
+
+    def has_city(self, city: str) -> bool:
+        """Returns True if the venues of the city have been counted."""
+        return self.type_code_counts(city) is not None
+
+    def type_code_counts(self, city: str) -> dict[int, int] | None:
+        """Returns venue counts of the city by type code, or None if the city hasn't been
+        counted or the counts are too old."""
+        with self._lock:
+            self._load()
+            entry = self._cities.get(city.lower())
+        if entry is None or time() - entry[0] > self._ttl:
+            return None
+        return entry[1]
+
+    def count(self, city: str, type_codes: Iterable[int] = None) -> int | None:
+        """
+        Returns count of the venues of the city.
+
+        Args:
+            city (str): The name of the city.
+            type_codes (Iterable[int], optional): Only venues of these types are counted.
+                Defaults to all venues.
+
+        Returns:
+            int | None: Venue count, or None if the city hasn't been counted.
+        """
+        counts = self.type_code_counts(city)
+        if counts is None:
+            return None
+        if type_codes is None:
+            return sum(counts.values())
+        return sum(counts.get(type_code, 0) for type_code in type_codes)
+
+    def category_counts(self, city: str, category_model) -> dict[str, int] | None:
+        """Returns venue counts of the city by category name, or None if the city hasn't
+        been counted. A venue whose type belongs to several categories is counted in each."""
+        counts = self.type_code_counts(city)
+        if counts is None:
+            return None
+        category_counts = {category.name: 0 for category in category_model.sport_venue_categories}
+        for type_code, count in counts.items():
+            mask = category_model.mask_for_type_code(type_code)
+            for category in category_model.categories_for_mask(mask):
+                category_counts[category.name] += count
+        return category_counts
+
+    def city_counts(self, type_codes: Iterable[int] = None) -> dict[str, int]:
+        """Returns venue counts of all counted cities, optionally only of the given types."""
+        if type_codes is not None:
+            type_codes = frozenset(type_codes)
+        with self._lock:
+            self._load()
+            cities = list(self._cities)
+        city_counts = {}
+        for city in cities:
+            count = self.count(city, type_codes)
+            if count is not None:
+                city_counts[city] = count
+        return city_counts
+
+    def _version(self):
+        """Returns version of the cache directory, which changes when a file is written."""
+        directory = self._cache.directory
+        try:
+            return (directory, directory.stat().st_mtime_ns)
+        except FileNotFoundError:
+            return (directory, None)
+
+    def _load(self):
+        """Reads the counts of the cities whose files have changed. Must be called with the
+        lock held."""
+        version = self._version()
+        if version == self._loaded_version:
+            return
+        if self._loaded_version is None or version[0] != self._loaded_version[0]:
+            # Another cache directory, for example in tests
+            self._cities = {}
+            self._file_versions = {}
+        cities = set(self._cache.keys())
+        for city in set(self._cities) - cities:
+            del self._cities[city]
+            self._file_versions.pop(city, None)
+        for city in cities:
+            file_version = self._cache.modified_at(city)
+            if file_version == self._file_versions.get(city):
+                continue
+            stored = self._cache.get(city)
+            if stored is None:
+                continue
+            counted_at, counts = stored
+            self._cities[city] = (counted_at, {int(code): count for code, count in counts.items()})
+            self._file_versions[city] = file_version
+        self._loaded_version = version
+
+
+def get_venue_count_index() -> VenueCountIndex:
+    """Returns the venue count index shared by the application."""
+    return get_service(VenueCountIndex)
@@ -1,13 +1,24 @@
 from __future__ import annotations
 
+import asyncio
 import random
+import sys
+import threading
 
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
 from typing import Dict, Any
 from abc import ABC, abstractmethod
 
 from sportlocate.models.city_model import CityModel
-from sportlocate.utils.apiclient import ApiClient
+from sportlocate.models.citycache import CityCacheStats, CityVenueCache, DEFAULT_BUDGET_BYTES
+from sportlocate.utils.apiclient import ApiClient, AsyncApiClient
+from sportlocate.utils.cancellation import CancellationToken, OperationCancelled
+from sportlocate.utils.diskcache import DiskCache
+from sportlocate.utils.ratelimiter import configure_host
+from sportlocate.utils.services import get_service
 from sportlocate.models.venue import Venue, SportVenue, Coordinates
+from sportlocate.models.venuecounts import VenueCountIndex, get_venue_count_index
 from sportlocate.models.weathermodel import WeatherData, ClearSky, PartlyCloudy
 from sportlocate.models.sportvenuecategorymodel import SportVenueCategoryModel
 from sportlocate.models.venuecategory import VenueCategory, SportVenueCategory
@@ -16,6 +27,51 @@ from sportlocate.models.venuecategory import VenueCategory, SportVenueCategory
 SPORT_VENUE_API_URL = "http://lipas.cc.jyu.fi/api"
 # add other urls here...
 
+# LIPAS has no published limits. Concurrency adapts to its responses up to the maximum.
+configure_host(SPORT_VENUE_API_URL, rate=20.0, burst=10, max_concurrency=16)
+
+# How long fetched city venues are kept in the disk cache (seconds)
+VENUE_CACHE_TTL = 7 * 24 * 60 * 60
+
+# Waiting for the fetch of a city in another thread is checked for cancellation this often (seconds)
+FETCH_LOCK_WAIT_STEP = 0.1
+
+# Timestamp format of LIPAS modifiedAfter and since parameters (UTC)
+LIPAS_TIME_FORMAT = "%Y-%m-%d %H:%M:%S.000"
+
+# Venue fields requested in the venue lists so that the venues can be created from the
+# list without requesting every venue separately
+SPORT_VENUE_LIST_PARAMS = {
+    "lang": "en",
+    "fields": (
+        "type.name",
+        "type.typeCode",
+        "location.coordinates.wgs84",
+        "location.city.name",
+        "properties.infoFi",
+    ),
+}
+
+
+@dataclass
+class VenueSyncResult:
+    """Changes of one city venue sync (venue ids)."""
+
+    city: str
+    added: list[int] = field(default_factory=list)
+    changed: list[int] = field(default_factory=list)
+    removed: list[int] = field(default_factory=list)
+    # True if all venues were downloaded because there was no earlier sync
+    full: bool = False
+
+    def report(self) -> str:
+        """Returns summary of the sync as a printable string."""
+        kind = "full sync" if self.full else "delta sync"
+        return (
+            f"{self.city.capitalize()} {kind}: {len(self.added)} added, "
+            f"{len(self.changed)} changed, {len(self.removed)} removed"
+        )
+
 
 class VenueFactory(ABC):
     """
@@ -44,12 +100,15 @@ class VenueFactory(ABC):
         raise NotImplementedError
 
     @abstractmethod
-    def create_venues(self, city: str) -> list[Venue]:
+    def create_venues(
+        self, city: str, cancel_token: CancellationToken = None
+    ) -> list[Venue]:
         """
         Creates a list of venues in a specified city.
 
         Args:
             city (str): The name of the city for which to fetch venues.
+            cancel_token (CancellationToken, optional): Token to cancel the fetching.
 
         Returns:
             list[Venue]: A list of venues in the specified city.
@@ -58,7 +117,10 @@ class VenueFactory(ABC):
 
     @abstractmethod
     def create_filtered_venues(
-        self, city: str, categories: list[VenueCategory]
+        self,
+        city: str,
+        categories: list[VenueCategory],
+        cancel_token: CancellationToken = None,
     ) -> list[Venue]:
         """
         Creates a list of venues filtered by categories in a specified city.
@@ -66,6 +128,7 @@ class VenueFactory(ABC):
         Args:
             city (str): The name of the city for which to fetch venues.
             categories (list[VenueCategory]): A list of accepted venue categories.
+            cancel_token (CancellationToken, optional): Token to cancel the fetching.
 
         Returns:
             list[Venue]: A list of venues in the specified city that match the accepted categories.
@@ -88,6 +151,15 @@ class VenueFactory(ABC):
         """
         raise NotImplementedError
 
+    def pin_current_city(self, city: str):
+        """
+        Tells the factory which city is shown to the user, so that its venues are kept
+        in memory. Factories that don't cache venues in memory can ignore this.
+
+        Args:
+            city (str): The name of the current city.
+        """
+
 
 class SportVenueFactory(VenueFactory):
     """
@@ -95,66 +167,312 @@ class SportVenueFactory(VenueFactory):
     venue data from Lipas API.
     """
 
-    def __init__(self):
-        """Initialize a new instance of SportVenueFactory."""
+    def __init__(self, city_cache_budget: int = DEFAULT_BUDGET_BYTES):
+        """Initialize a new instance of SportVenueFactory.
+
+        Args:
+            city_cache_budget (int, optional): Memory budget (bytes) of the fetched city venues
+                that are kept in memory.
+        """
         self._api_client = ApiClient(SPORT_VENUE_API_URL)
-        # Factory stores fetched sportvenues to dict so that new api calls are not
+        # Created when the asynchronous methods are used first time
+        self._async_api_client = None
+        # Factory stores fetched sportvenues to memory so that new api calls are not
         # nesseccary if user wants to see already fetched sportvenue information.
-        self._sport_venues = {}
-        self._cities = CityModel().cities_and_city_codes
-        self._category_model = SportVenueCategoryModel()
+        # Least recently used cities are dropped when the memory budget is exceeded.
+        self._sport_venues = CityVenueCache(
+            city_cache_budget, on_evict=self._forget_filtered_venues
+        )
+        self._current_city = None
+        # Venues are fetched from several worker threads. The lock protects the filter memo
+        # and the per city locks make sure that one city is fetched only once at a time.
+        self._lock = threading.Lock()
+        self._city_fetch_locks = {}
+        # Memoized filter results, (city, category mask) -> (city venues, filtered venues)
+        self._filtered_venues = {}
+        # Venues are also stored to disk so that those survive restarts and can be
+        # warmed beforehand (see utils/cachewarmer.py).
+        self._disk_cache = DiskCache("venues", ttl=VENUE_CACHE_TTL)
+        # Times of the last full fetch or sync of the cities for delta sync
+        self._sync_times = DiskCache("venue_sync")
+        # Venue counts per city and type, so that filters without matches need no fetch
+        self._venue_counts = get_venue_count_index()
+        self._cities = get_service(CityModel).cities_and_city_codes
+        self._category_model = get_service(SportVenueCategoryModel)
 
     def create_venue_categories(self) -> list[SportVenueCategory]:
         """Fetch a list of sport venue categories from Lipas API."""
         return self._category_model.sport_venue_categories
 
-    def create_venues(self, city: str) -> list[SportVenue]:
+    def create_venues(
+        self, city: str, cancel_token: CancellationToken = None
+    ) -> list[SportVenue]:
         """
         Fetch and return sport venues for a specific city.
 
         This method retrieves sport venue data for the specified city from the Lipas API.
-        It first checks if the sport venues for the city are already cached, and if so,
-        it returns the cached data. If not, it makes an API request to fetch the data,
-        processes it, caches it, and returns the sport venues.
+        It first checks if the sport venues for the city are already cached in memory or
+        on disk, and if so, it returns the cached data. If not, it makes an API request to
+        fetch the data, processes it, caches it, and returns the sport venues.
 
         Parameters:
             city (str): The name of the city.
+            cancel_token (CancellationToken, optional): Token that is checked between the
+                API requests. Cancelled fetch is stopped and nothing is cached.
 
         Returns:
             list: A list of SportVenue objects representing the sport venues for the city.
                   Returns an empty list if no sport venues are found.
 
         Raises:
+            OperationCancelled: If the cancel token is cancelled during the fetch.
             Exception: If an unexpected error occurs during the API request.
 
         """
         city = city.lower()
-        if city in self._sport_venues:
-            return self._sport_venues[city]
-        else:
-            try:
-                sport_venue_list = self._api_client.get(
-                    f"/sports-places?cityCodes={self._cities[city]}"
-                )
-                city_sport_venues = []
+        cached_venues = self._get_cached_venues(city)
+        if cached_venues is not None:
+            return cached_venues
+
+        fetch_lock = self._get_city_fetch_lock(city)
+        # Waiting in short steps so that cancelled fetch doesn't wait another thread's fetch
+        while not fetch_lock.acquire(timeout=FETCH_LOCK_WAIT_STEP):
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+        try:
+            # Another thread may have fetched the city while this one was waiting
+            cached_venues = self._get_cached_venues(city)
+            if cached_venues is not None:
+                return cached_venues
+            fetch_started = datetime.now(timezone.utc)
+            city_sport_venues = self._fetch_city_venues(city, cancel_token)
+            self._cache_venues(city, city_sport_venues)
+            self._sync_times.set(city, fetch_started.strftime(LIPAS_TIME_FORMAT))
+            return city_sport_venues
+        finally:
+            fetch_lock.release()
+
+    def sync_venues(
+        self, city: str, cancel_token: CancellationToken = None
+    ) -> VenueSyncResult:
+        """
+        Brings the cached venues of the city up to date.
 
-                for item in sport_venue_list:
-                    sport_venue_data = self._api_client.get(
-                        f"/sports-places/{item['sportsPlaceId']}?lang=en"
-                    )
-                    sport_venue = self._parse_sport_venue_data(sport_venue_data)
-                    city_sport_venues.append(sport_venue)
+        Only the venues that have been modified or deleted in LIPAS since the previous
+        sync (or full fetch) of the city are requested, and the changes are merged to
+        the cached venues. If the city has not been fetched before all its venues are
+        fetched.
 
-                self._sport_venues.update({city: city_sport_venues})
-                return city_sport_venues
+        Parameters:
+            city (str): The name of the city.
+            cancel_token (CancellationToken, optional): Token that is checked between the
+                API requests. Cancelled sync doesn't change the cached venues.
 
-            except Exception as e:
-                raise (
-                    f"An unexpected error occurred when trying to get city sports places: {e}"
+        Returns:
+            VenueSyncResult: Ids of the added, changed and removed venues.
+
+        Raises:
+            OperationCancelled: If the cancel token is cancelled during the sync.
+            Exception: If an unexpected error occurs during the API requests.
+        """
+        city = city.lower()
+        fetch_lock = self._get_city_fetch_lock(city)
+        while not fetch_lock.acquire(timeout=FETCH_LOCK_WAIT_STEP):
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+        try:
+            # Changes made during the sync are requested again in the next sync
+            sync_started = datetime.now(timezone.utc)
+            last_sync = self._sync_times.get(city)
+            cached_venues = self._get_cached_venues(city)
+            if last_sync is None or cached_venues is None:
+                city_sport_venues = self._fetch_city_venues(city, cancel_token)
+                self._cache_venues(city, city_sport_venues)
+                result = VenueSyncResult(
+                    city, added=[venue.id for venue in city_sport_venues], full=True
                 )
+            else:
+                result = self._sync_changes(city, cached_venues, last_sync, cancel_token)
+            self._sync_times.set(city, sync_started.strftime(LIPAS_TIME_FORMAT))
+            return result
+        finally:
+            fetch_lock.release()
+
+    def _sync_changes(
+        self,
+        city: str,
+        cached_venues: list[SportVenue],
+        last_sync: str,
+        cancel_token: CancellationToken = None,
+    ) -> VenueSyncResult:
+        """Requests the venues modified and deleted since last_sync and merges those
+        to the cached venues of the city."""
+        result = VenueSyncResult(city)
+        try:
+            modified_venue_list = self._api_client.iter_items(
+                "/sports-places",
+                params={
+                    "cityCodes": self._cities[city],
+                    "modifiedAfter": last_sync,
+                    **SPORT_VENUE_LIST_PARAMS,
+                },
+            )
+            venues_by_id = {venue.id: venue for venue in cached_venues}
+            for item in modified_venue_list:
+                if cancel_token is not None:
+                    cancel_token.raise_if_cancelled()
+                sport_venue = self._venue_from_list_item(item)
+                old_venue = venues_by_id.get(sport_venue.id)
+                if old_venue is None:
+                    result.added.append(sport_venue.id)
+                elif old_venue != sport_venue:
+                    result.changed.append(sport_venue.id)
+                venues_by_id[sport_venue.id] = sport_venue
+            deleted_venue_list = self._api_client.iter_items(
+                "/deleted-sports-places", params={"since": last_sync}
+            )
+            # Deleted venues are not listed by city, so only ids of this city are handled
+            for item in deleted_venue_list:
+                venue_id = int(item["sportsPlaceId"])
+                if venues_by_id.pop(venue_id, None) is not None:
+                    result.removed.append(venue_id)
+        except OperationCancelled:
+            raise
+        except Exception as e:
+            raise Exception(
+                f"An unexpected error occurred when trying to sync city sports places: {e}"
+            ) from e
+
+        if result.added or result.changed or result.removed:
+            self._cache_venues(city, list(venues_by_id.values()))
+        else:
+            # Refreshing the disk cache entry and counts so that synced venues don't expire
+            self._disk_cache.set(city, [venue.to_dict() for venue in cached_venues])
+            self._venue_counts.update(city, cached_venues)
+        return result
+
+    def _fetch_city_venues(
+        self, city: str, cancel_token: CancellationToken = None
+    ) -> list[SportVenue]:
+        """
+        Fetches all venues of the city from LIPAS API.
+
+        The venue list is parsed while it is received and venues are created from the
+        list items one at a time, so the decoded list is never in memory as a whole.
+        """
+        try:
+            sport_venue_list = self._api_client.iter_items(
+                f"/sports-places?cityCodes={self._cities[city]}", params=SPORT_VENUE_LIST_PARAMS
+            )
+            city_sport_venues = []
+
+            for item in sport_venue_list:
+                if cancel_token is not None:
+                    cancel_token.raise_if_cancelled()
+                city_sport_venues.append(self._venue_from_list_item(item))
+            return city_sport_venues
+
+        except OperationCancelled:
+            raise
+        except Exception as e:
+            raise Exception(
+                f"An unexpected error occurred when trying to get city sports places: {e}"
+            ) from e
+
+    async def create_venues_async(
+        self, city: str, cancel_token: CancellationToken = None
+    ) -> list[SportVenue]:
+        """
+        Asynchronous variant of create_venues.
+
+        The venue list is streamed like in create_venues, and the details of the list
+        items that don't contain the venue data are requested concurrently with
+        AsyncApiClient. The city is fetched only once at a time also when worker threads
+        (for example a prefetch) fetch it with create_venues. The disk cache is read and
+        written in the default executor, so the event loop is not blocked by it.
+
+        Parameters:
+            city (str): The name of the city.
+            cancel_token (CancellationToken, optional): Token that is checked between the
+                API requests. Cancelled fetch is stopped and nothing is cached.
+
+        Returns:
+            list: A list of SportVenue objects representing the sport venues for the city.
+
+        Raises:
+            OperationCancelled: If the cancel token is cancelled during the fetch.
+        """
+        city = city.lower()
+        loop = asyncio.get_running_loop()
+        cached_venues = await loop.run_in_executor(None, self._get_cached_venues, city)
+        if cached_venues is not None:
+            return cached_venues
+
+        fetch_lock = self._get_city_fetch_lock(city)
+        # Lock shared with the worker threads is polled so that the event loop is not blocked
+        while not fetch_lock.acquire(blocking=False):
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            await asyncio.sleep(FETCH_LOCK_WAIT_STEP)
+        try:
+            cached_venues = await loop.run_in_executor(None, self._get_cached_venues, city)
+            if cached_venues is not None:
+                return cached_venues
+            fetch_started = datetime.now(timezone.utc)
+            city_sport_venues = await self._fetch_city_venues_async(city, cancel_token)
+            await loop.run_in_executor(None, self._cache_venues, city, city_sport_venues)
+            self._sync_times.set(city, fetch_started.strftime(LIPAS_TIME_FORMAT))
+            return city_sport_venues
+        finally:
+            fetch_lock.release()
+
+    async def _fetch_city_venues_async(
+        self, city: str, cancel_token: CancellationToken = None
+    ) -> list[SportVenue]:
+        """Asynchronous variant of _fetch_city_venues."""
+        if self._async_api_client is None:
+            self._async_api_client = AsyncApiClient(SPORT_VENUE_API_URL)
+        # Venues in list order, the items without venue data are requested concurrently
+        city_sport_venues = []
+        detail_requests = {}
+        try:
+            sport_venue_list = self._async_api_client.iter_items(
+                f"/sports-places?cityCodes={self._cities[city]}", params=SPORT_VENUE_LIST_PARAMS
+            )
+            async for item in sport_venue_list:
+                if cancel_token is not None:
+                    cancel_token.raise_if_cancelled()
+                if self._has_venue_data(item):
+                    city_sport_venues.append(self._parse_sport_venue_data(item))
+                else:
+                    detail_requests[len(city_sport_venues)] = asyncio.ensure_future(
+                        self._async_api_client.get(f"/sports-places/{item['sportsPlaceId']}?lang=en")
+                    )
+                    city_sport_venues.append(None)
+            if detail_requests:
+                details = await asyncio.gather(*detail_requests.values())
+                for index, sport_venue_data in zip(detail_requests, details):
+                    city_sport_venues[index] = self._parse_sport_venue_data(sport_venue_data)
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            return city_sport_venues
+
+        except OperationCancelled:
+            raise
+        except Exception as e:
+            raise Exception(
+                f"An unexpected error occurred when trying to get city sports places: {e}"
+            ) from e
+        finally:
+            # Detail requests are not left running if the fetch failed or was cancelled
+            for request in detail_requests.values():
+                request.cancel()
 
     def create_filtered_venues(
-        self, city: str, venue_categories: list[SportVenueCategory]
+        self,
+        city: str,
+        venue_categories: list[SportVenueCategory],
+        cancel_token: CancellationToken = None,
     ) -> list[SportVenue]:
         """
         Get filtered sport venues for a specific city based on venue categories.
@@ -163,24 +481,139 @@ class SportVenueFactory(VenueFactory):
             city (str): The name of the city.
             venue_categories (list[SportVenueCategory]): A list of SportVenueCategory instances
                 specifying allowed sport venue types.
+            cancel_token (CancellationToken, optional): Token to cancel the fetching.
 
         Returns:
             list[SportVenue]: A list of SportVenue instances representing the filtered sport venues.
         """
         # Fetch city all sport venues
-        city_sport_venues = self.create_venues(city)
+        mask = self._category_model.mask_for(venue_categories)
+        return self.create_filtered_venues_by_mask(city, mask, cancel_token)
+
+    def create_filtered_venues_by_mask(
+        self, city: str, mask: int, cancel_token: CancellationToken = None
+    ) -> list[SportVenue]:
+        """
+        Get filtered sport venues for a specific city based on category mask.
 
-        # Takes all allowed (based on filters) sport venue type codes to set
-        sport_venue_type_codes = set()
-        for venue_category in venue_categories:
-            sport_venue_type_codes.update(venue_category.sport_venue_types)
+        Parameters:
+            city (str): The name of the city.
+            mask (int): Mask of the allowed categories (see SportVenueCategoryModel).
+            cancel_token (CancellationToken, optional): Token to cancel the fetching.
+
+        Returns:
+            list[SportVenue]: A list of SportVenue instances representing the filtered sport venues.
+        """
+        if self._has_no_venues(city, mask):
+            return []
+        city_sport_venues = self.create_venues(city, cancel_token)
+        return self._filter_venues(city.lower(), city_sport_venues, mask)
+
+    async def create_filtered_venues_by_mask_async(
+        self, city: str, mask: int, cancel_token: CancellationToken = None
+    ) -> list[SportVenue]:
+        """Asynchronous variant of create_filtered_venues_by_mask."""
+        if self._has_no_venues(city, mask):
+            return []
+        city_sport_venues = await self.create_venues_async(city, cancel_token)
+        return self._filter_venues(city.lower(), city_sport_venues, mask)
+
+    def pin_current_city(self, city: str):
+        """Keeps the venues of the city (the city shown to the user) in memory until another
+        city becomes current."""
+        city = city.lower()
+        if city == self._current_city:
+            return
+        previous_city, self._current_city = self._current_city, city
+        self._sport_venues.pin(city)
+        if previous_city is not None:
+            self._sport_venues.unpin(previous_city)
+
+    def city_cache_stats(self) -> CityCacheStats:
+        """Returns evictions and resident size of the in-memory city venue cache."""
+        return self._sport_venues.stats()
+
+    def cached_cities(self) -> list[tuple[str, list[SportVenue]]]:
+        """Returns the cities in the in-memory cache and their venues."""
+        return self._sport_venues.items()
+
+    def is_city_cached(self, city: str) -> bool:
+        """Returns True if the venues of the city can be created without requests."""
+        city = city.lower()
+        return city in self._sport_venues or city in self._disk_cache
+
+    @property
+    def venue_counts(self) -> VenueCountIndex:
+        """Venue counts per city and type of the fetched cities."""
+        return self._venue_counts
+
+    def _has_no_venues(self, city: str, mask: int) -> bool:
+        """Returns True if the counts show that the city has no venues in the categories
+        of the mask. Cities without counts may have venues."""
+        count = self._venue_counts.count(city, self._category_model.type_codes_for_mask(mask))
+        return count == 0
+
+    def _get_cached_venues(self, city: str) -> list[SportVenue] | None:
+        """Returns city venues from memory or disk cache or None if city is not cached."""
+        city_sport_venues = self._sport_venues.get(city)
+        if city_sport_venues is not None:
+            return city_sport_venues
+        cached_venues = self._disk_cache.get(city)
+        if cached_venues is None:
+            return None
+        city_sport_venues = [SportVenue.from_dict(venue) for venue in cached_venues]
+        if not self._venue_counts.has_city(city):
+            # Venues cached before the counts were stored
+            self._venue_counts.update(city, city_sport_venues)
+        # Keeping the list that possibly another thread stored first
+        return self._sport_venues.setdefault(city, city_sport_venues)
+
+    def _get_city_fetch_lock(self, city: str) -> threading.Lock:
+        with self._lock:
+            return self._city_fetch_locks.setdefault(city, threading.Lock())
+
+    def _cache_venues(self, city: str, city_sport_venues: list[SportVenue]):
+        """Stores fetched city venues to memory and disk cache."""
+        self._sport_venues.put(city, city_sport_venues)
+        # Dropping filter results of the old venue list
+        self._forget_filtered_venues(city)
+        self._disk_cache.set(city, [venue.to_dict() for venue in city_sport_venues])
+        self._venue_counts.update(city, city_sport_venues)
+
+    def _forget_filtered_venues(self, city: str):
+        """Drops the memoized filter results of the city."""
+        with self._lock:
+            for memo_key in [key for key in self._filtered_venues if key[0] == city]:
+                del self._filtered_venues[memo_key]
+
+    def _filter_venues(
+        self, city: str, city_sport_venues: list[SportVenue], mask: int
+    ) -> list[SportVenue]:
+        """
+        Returns venues which type belongs to some of the categories in the mask.
+
+        Results are memoized per (city, mask). Memoized result is used only if it was
+        made from the same venue list, so refetched city venues are filtered again.
+        The returned list is shared and must not be modified.
+        """
+        memo_key = (city, mask)
+        with self._lock:
+            memoized = self._filtered_venues.get(memo_key)
+        if memoized is not None and memoized[0] is city_sport_venues:
+            return memoized[1]
+
+        # Type codes of the categories are precomputed in category model
+        sport_venue_type_codes = self._category_model.type_codes_for_mask(mask)
 
         # Collecting filtered sport venues and keeping in track
         # that those are now current sport venues that are showed in map.
-        filtered_sport_venues = []
-        for sport_venue in city_sport_venues:
-            if sport_venue.type_code in sport_venue_type_codes:
-                filtered_sport_venues.append(sport_venue)
+        filtered_sport_venues = [
+            sport_venue
+            for sport_venue in city_sport_venues
+            if sport_venue.type_code in sport_venue_type_codes
+        ]
+        with self._lock:
+            self._filtered_venues[memo_key] = (city_sport_venues, filtered_sport_venues)
         return filtered_sport_venues
 
     def create_recommendation(
@@ -221,6 +654,18 @@ class SportVenueFactory(VenueFactory):
             recommendation = random.choice(allowed_sport_venues)
             return recommendation
 
+    def _venue_from_list_item(self, item: Dict[str, Any]) -> SportVenue:
+        """Creates venue from venue list item, requesting the venue data if the item
+        doesn't contain it."""
+        if not self._has_venue_data(item):
+            item = self._api_client.get(f"/sports-places/{item['sportsPlaceId']}?lang=en")
+        return self._parse_sport_venue_data(item)
+
+    @staticmethod
+    def _has_venue_data(item: Dict[str, Any]) -> bool:
+        """Returns True if the venue list item contains the fields of SPORT_VENUE_LIST_PARAMS."""
+        return "type" in item and "location" in item
+
     @staticmethod
     def _parse_sport_venue_data(sport_venue_data: Dict[str, Any]) -> SportVenue:
         """
@@ -242,11 +687,12 @@ class SportVenueFactory(VenueFactory):
         name = sport_venue_data["type"]["name"]
         if len(name.split(" ")) > 5:
             name = " ".join(name.split(" ")[0:5])
+        # Names and cities repeat across venues, interned strings are stored only once
         return SportVenue(
             id=int(sport_venue_data["sportsPlaceId"]),
-            name=name,
+            name=sys.intern(name),
             type_code=int(sport_venue_data["type"]["typeCode"]),
             coordinates=coordinates,
-            city_name=sport_venue_data["location"]["city"]["name"],
+            city_name=sys.intern(sport_venue_data["location"]["city"]["name"]),
             info=properties.get("infoFi", ""),
         )
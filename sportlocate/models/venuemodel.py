@@ -4,39 +4,19 @@ from sportlocate.models.venue import Venue
 from sportlocate.models.venuefactory import SportVenueFactory
 from sportlocate.models.venuecategory import VenueCategory
 from sportlocate.models.weathermodel import WeatherData
+from sportlocate.utils.cancellation import CancellationToken
 
 
 class VenueModel:
-    """Venue model singleton class to handle venues in the map. Uses venue factories
+    """Venue model class to handle venues in the map. Uses venue factories
     to create venues."""
 
-    _instance = None
-
-    def __new__(cls, *args, **kwargs):
-        """
-        Create and return a new instance of VenueModel.
-
-        Parameters:
-            cls (type): The class type.
-            *args: Variable-length argument list.
-            **kwargs: Arbitrary keyword arguments.
-
-        Returns:
-            VenueModel: The singleton instance of VenueModel.
-
-        This method ensures that only a single instance of VenueModel is created.
-        If an instance already exists, it is returned; otherwise, a new instance is created.
-        """
-        if not cls._instance:
-            cls._instance = super(VenueModel, cls).__new__(cls)
-        return cls._instance
-
-    def __init__(self, venue_type):
+    def __init__(self, venue_type="sport"):
         """
         Initialize a VenueModel instance.
 
         Args:
-            venue_type (str): The type of venue for which to manage factories.
+            venue_type (str, optional): The type of venue for which to manage factories.
 
         Raises:
             ValueError: If the provided venue_type is not supported.
@@ -58,6 +38,11 @@ class VenueModel:
         self._current_recommendation = None
         self._selected_venue_id = -1
 
+    @property
+    def venue_factory(self):
+        """Factory that creates the venues of the venue type."""
+        return self._venue_factory
+
     def get_venue_categories(self) -> list[VenueCategory]:
         """
         Get a list of venue categories specific to the managed venue type.
@@ -68,7 +53,10 @@ class VenueModel:
         return self._venue_factory.create_venue_categories()
 
     def get_filtered_venues(
-        self, city: str, accepted_categories: list[VenueCategory]
+        self,
+        city: str,
+        accepted_categories: list[VenueCategory],
+        cancel_token: CancellationToken = None,
     ) -> list[Venue]:
         """
         Get a list of venues in a city filtered by accepted categories.
@@ -76,13 +64,69 @@ class VenueModel:
         Args:
             city (str): The name of the city for which to fetch venues.
             accepted_categories (list[VenueCategory]): A list of accepted venue categories.
+            cancel_token (CancellationToken, optional): Token to cancel the fetching. Cancelled
+                fetch raises OperationCancelled and doesn't change the current venues.
+
+        Returns:
+            list[Venue]: A list of venues in the specified city that match the accepted categories.
+        """
+        venues = self._venue_factory.create_filtered_venues(
+            city, accepted_categories, cancel_token
+        )
+        # Superseded fetch must not replace the venues of the newer one
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        # Venues of the shown city are kept in memory
+        self._venue_factory.pin_current_city(city)
+        self._current_venues = venues
+        return self._current_venues
+
+    def get_filtered_venues_by_mask(
+        self, city: str, mask: int, cancel_token: CancellationToken = None
+    ) -> list[Venue]:
+        """
+        Get a list of venues in a city filtered by category mask. Results are memoized
+        so repeated calls with the same city and mask are cheap.
+
+        Args:
+            city (str): The name of the city for which to fetch venues.
+            mask (int): Mask of the accepted categories (see SportVenueCategoryModel).
+            cancel_token (CancellationToken, optional): Token to cancel the fetching.
+
+        Returns:
+            list[Venue]: A list of venues in the specified city that match the accepted categories.
+        """
+        venues = self._venue_factory.create_filtered_venues_by_mask(
+            city, mask, cancel_token
+        )
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        self._venue_factory.pin_current_city(city)
+        self._current_venues = venues
+        return self._current_venues
+
+    async def get_filtered_venues_by_mask_async(
+        self, city: str, mask: int, cancel_token: CancellationToken = None
+    ) -> list[Venue]:
+        """
+        Asynchronous variant of get_filtered_venues_by_mask that is awaited in the asyncio
+        loop, so the detail requests of the venues are made concurrently.
+
+        Args:
+            city (str): The name of the city for which to fetch venues.
+            mask (int): Mask of the accepted categories (see SportVenueCategoryModel).
+            cancel_token (CancellationToken, optional): Token to cancel the fetching.
 
         Returns:
             list[Venue]: A list of venues in the specified city that match the accepted categories.
         """
-        self._current_venues = self._venue_factory.create_filtered_venues(
-            city, accepted_categories
+        venues = await self._venue_factory.create_filtered_venues_by_mask_async(
+            city, mask, cancel_token
         )
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        self._venue_factory.pin_current_city(city)
+        self._current_venues = venues
         return self._current_venues
 
     def get_recommendation(self, weather: WeatherData) -> Venue:
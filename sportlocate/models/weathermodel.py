@@ -12,18 +12,43 @@ Classes:
 - SnowWeather: Subclass of WeatherData for snowy weather conditions.
 - ThunderstormWeather: Subclass of WeatherData for thunderstorm weather conditions.
 - WeatherFactory: Factory class for creating specific weather instances based on data.
-- WeatherDescriptions: Class providing weather condition descriptions based on codes.
-- weatherService: Service class for retrieving weather information.
+- HourlyForecast: Hourly forecast arrays of a location classified to weather classes.
+- ForecastSlot: One forecast hour and its weather.
+- WeatherModel: Model for retrieving weather information.
 """
+from __future__ import annotations
+
+import asyncio
 import ssl
 import geopy.geocoders
 import certifi
+import numpy as np
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
 from geopy.geocoders import Nominatim
 from abc import ABCMeta, abstractmethod
 
-from sportlocate.utils.apiclient import ApiClient
+from sportlocate.utils.apiclient import ApiClient, AsyncApiClient
+from sportlocate.utils.diskcache import DiskCache
+from sportlocate.utils.ratelimiter import configure_host, get_host_limiter
 
 WEATHER_API_URL = "https://api.open-meteo.com"
+GEOCODING_API_URL = "https://nominatim.openstreetmap.org"
+
+# Open-meteo free API allows about 600 requests per minute
+configure_host(WEATHER_API_URL, rate=10.0, burst=5, max_concurrency=8)
+# Nominatim usage policy allows at most one request per second
+configure_host(GEOCODING_API_URL, rate=1.0, initial_concurrency=1, max_concurrency=1)
+
+# How long fetched weather is kept in the cache (seconds)
+WEATHER_CACHE_TTL = 30 * 60
+# Hourly forecast is requested with the current weather but it stays usable longer
+FORECAST_CACHE_TTL = 3 * 60 * 60
+FORECAST_DAYS = 2
+HOURLY_VARIABLES = "temperature_2m,windspeed_10m,weathercode"
+
+# Outdoor slots are scored by closeness to this temperature (celsius) and by wind
+COMFORTABLE_TEMPERATURE = 18.0
 
 
 class WeatherData(metaclass=ABCMeta):
@@ -96,6 +121,43 @@ class ThunderstormWeather(WeatherData):
         return "Thunderstorm alert. Stay indoors and away from windows."
 
 
+# WMO weather codes of the weather classes
+WEATHER_CONDITION_CODES = {
+    ClearSky: (0,),
+    PartlyCloudy: (1, 2, 3),
+    FoggyWeather: (45, 48),
+    RainWeather: (51, 53, 55, 56, 57, 61, 63, 65, 66, 67, 80, 81, 82),
+    SnowWeather: (71, 73, 75, 77, 85, 86),
+    ThunderstormWeather: (95, 96, 99),
+}
+
+# Weather classes by index. Index 0 is for unknown codes.
+WEATHER_CLASSES = (None, *WEATHER_CONDITION_CODES)
+
+# Weather classes where outdoor sports are recommended
+OUTDOOR_WEATHER_CLASSES = (ClearSky, PartlyCloudy)
+
+
+def _build_weather_class_table() -> np.ndarray:
+    """Builds lookup table from weather code (0-99) to index of WEATHER_CLASSES."""
+    table = np.zeros(100, dtype=np.int8)
+    for class_index, weather_class in enumerate(WEATHER_CLASSES[1:], start=1):
+        table[list(WEATHER_CONDITION_CODES[weather_class])] = class_index
+    return table
+
+
+WEATHER_CLASS_TABLE = _build_weather_class_table()
+
+
+def classify_weather_codes(weathercodes) -> np.ndarray:
+    """Returns WEATHER_CLASSES indexes of the weather codes. Unknown codes get index 0."""
+    codes = np.asarray(weathercodes, dtype=np.int16)
+    classes = np.zeros(codes.shape, dtype=np.int8)
+    valid = (codes >= 0) & (codes < len(WEATHER_CLASS_TABLE))
+    classes[valid] = WEATHER_CLASS_TABLE[codes[valid]]
+    return classes
+
+
 class WeatherFactory:
     """Weather data factory."""
 
@@ -116,77 +178,133 @@ class WeatherFactory:
         windspeed = data["current_weather"]["windspeed"]
         weathercode = data["current_weather"]["weathercode"]
 
-        condition_categories = {
-            (0,): "ClearSky",
-            (1, 2, 3): "PartlyCloudy",
-            (45, 48): "FoggyWeather",
-            (51, 53, 55, 56, 57, 61, 63, 65, 66, 67, 80, 81, 82): "RainWeather",
-            (71, 73, 75, 77, 85, 86): "SnowWeather",
-            (95, 96, 99): "ThunderstormWeather",
-            # Add more conditions as needed
-        }
-        # Check if weathercode falls within a range
-        weather_category = next(
-            (
-                category
-                for codes, category in condition_categories.items()
-                if weathercode in codes
-            ),
-            "WeatherData",
-        )
-        if weather_category == "ClearSky":
-            return ClearSky(latitude, longitude, temperature, windspeed, weathercode)
-        elif weather_category == "PartlyCloudy":
-            return PartlyCloudy(
-                latitude, longitude, temperature, windspeed, weathercode
-            )
-        elif weather_category == "FoggyWeather":
-            return FoggyWeather(
-                latitude, longitude, temperature, windspeed, weathercode
-            )
-        elif weather_category == "RainWeather":
-            return RainWeather(latitude, longitude, temperature, windspeed, weathercode)
-        elif weather_category == "ThunderstormWeather":
-            return ThunderstormWeather(
-                latitude, longitude, temperature, windspeed, weathercode
-            )
+        weather_class = WEATHER_CLASSES[classify_weather_codes(weathercode).item()]
+        if weather_class is None:
+            return None
+        return weather_class(latitude, longitude, temperature, windspeed, weathercode)
 
 
-class WeatherModel:
+@dataclass
+class ForecastSlot:
+    """One forecast hour. Time is local time of the location."""
+
+    time: datetime
+    weather: WeatherData
+
+    @property
+    def outdoor(self) -> bool:
+        """True if the weather suits outdoor sports."""
+        return isinstance(self.weather, OUTDOOR_WEATHER_CLASSES)
+
+
+class HourlyForecast:
     """
-    Weather Model class for retrieving weather information.
+    Hourly forecast of a location as numpy arrays.
 
-    Methods:
-        get_weather_info(self, city_name: str): Get weather information for a given city.
-        get_lat_long(city_name): Get latitude and longitude for a given city.
+    Weather codes of all hours are classified to weather classes in one vectorized
+    lookup when the forecast is created, so time slot queries don't need loops over
+    the hours or new requests.
     """
 
-    _instance = None
+    def __init__(self, data: dict):
+        """
+        Init the forecast from open-meteo forecast response.
+
+        Args:
+            data (dict): Response that contains "hourly" arrays and "utc_offset_seconds".
+        """
+        hourly = data["hourly"]
+        self.latitude = data["latitude"]
+        self.longitude = data["longitude"]
+        self.utc_offset = timedelta(seconds=data.get("utc_offset_seconds", 0))
+        self.times = np.array(hourly["time"], dtype="datetime64[m]")
+        self.temperatures = np.array(hourly["temperature_2m"], dtype=np.float64)
+        self.windspeeds = np.array(hourly["windspeed_10m"], dtype=np.float64)
+        self.weathercodes = np.array(hourly["weathercode"], dtype=np.int16)
+        self.weather_classes = classify_weather_codes(self.weathercodes)
+        outdoor_indexes = [WEATHER_CLASSES.index(cls) for cls in OUTDOOR_WEATHER_CLASSES]
+        self.outdoor = np.isin(self.weather_classes, outdoor_indexes)
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def slot(self, index: int) -> ForecastSlot:
+        """Returns the forecast hour at index."""
+        weather_class = WEATHER_CLASSES[self.weather_classes[index]]
+        weather = None
+        if weather_class is not None:
+            weather = weather_class(
+                self.latitude,
+                self.longitude,
+                float(self.temperatures[index]),
+                float(self.windspeeds[index]),
+                int(self.weathercodes[index]),
+            )
+        return ForecastSlot(self.times[index].astype(datetime), weather)
 
-    def __new__(cls, *args, **kwargs):
+    def best_slot(self, hours: int, outdoor: bool, now: datetime = None) -> ForecastSlot | None:
         """
-        Create and return a new instance of WeatherModel.
+        Returns the best hour for outdoor or indoor sports in the next hours.
 
-        Parameters:
-            cls (type): The class type.
-            *args: Variable-length argument list.
-            **kwargs: Arbitrary keyword arguments.
+        Outdoor hours must have outdoor weather and the hour with the most comfortable
+        temperature and the least wind is chosen. Indoor sports can be done in any
+        weather, so the first hour with bad outdoor weather is chosen to leave the good
+        hours for outdoor sports, or the first hour if all hours are good.
 
-        Returns:
-            WeatherModel: The singleton instance of WeatherModel.
+        Args:
+            hours (int): How many hours ahead are considered.
+            outdoor (bool): True for outdoor and False for indoor slot.
+            now (datetime, optional): Current time (timezone aware). Defaults to now.
 
-        This method ensures that only a single instance of WeatherModel is created.
-        If an instance already exists, it is returned; otherwise, a new instance is created.
+        Returns:
+            ForecastSlot | None: The best hour or None if there is no suitable hour.
         """
-        if not cls._instance:
-            cls._instance = super(WeatherModel, cls).__new__(cls)
-        return cls._instance
+        if now is None:
+            now = datetime.now(timezone.utc)
+        # Forecast times are local times of the location, the hour that is going on counts
+        local_now = (now.astimezone(timezone.utc) + self.utc_offset).replace(tzinfo=None)
+        start = np.datetime64(local_now.replace(minute=0, second=0, microsecond=0), "m")
+        in_window = (self.times >= start) & (self.times < start + np.timedelta64(hours, "h"))
+
+        if outdoor:
+            candidates = in_window & self.outdoor
+            if not candidates.any():
+                return None
+            scores = -np.abs(self.temperatures - COMFORTABLE_TEMPERATURE) - 0.5 * self.windspeeds
+            return self.slot(int(np.argmax(np.where(candidates, scores, -np.inf))))
+
+        candidates = in_window & ~self.outdoor
+        if not candidates.any():
+            candidates = in_window
+        if not candidates.any():
+            return None
+        return self.slot(int(np.argmax(candidates)))
+
+
+class WeatherModel:
+    """
+    Weather Model class for retrieving weather information.
+
+    Methods:
+        get_weather_info(self, city_name: str): Get weather information for a given city.
+        get_lat_long(city_name): Get latitude and longitude for a given city.
+
+    City locations are cached permanently and raw weather data for WEATHER_CACHE_TTL
+    seconds so that repeated requests for the same city don't need API calls.
+    """
 
     def __init__(self):
         """Init."""
         self._api_client = ApiClient(WEATHER_API_URL)
+        # Created when the asynchronous methods are used first time
+        self._async_api_client = None
         self._weather_factory = WeatherFactory()
         self._current_weather = None
+        self._location_cache = DiskCache("locations")
+        self._weather_cache = DiskCache("weather", ttl=WEATHER_CACHE_TTL)
+        self._forecast_cache = DiskCache("forecast", ttl=FORECAST_CACHE_TTL)
+        # City -> parsed HourlyForecast of the forecast in the disk cache
+        self._hourly_forecasts = {}
 
     @property
     def current_weather(self) -> WeatherData:
@@ -203,17 +321,153 @@ class WeatherModel:
         Returns:
             WeatherData: An instance of WeatherData representing the current weather conditions.
         """
-        latitude, longitude = self.get_lat_long(city_name)
-        params = {
+        raw_weather_data = self._get_raw_weather(city_name)
+        weather_data = self._weather_factory.create_weather_data(raw_weather_data)
+        self._current_weather = weather_data
+        return self._current_weather
+
+    def prefetch_weather(self, city_name: str):
+        """Loads the weather and forecast of the city to the cache without changing the
+        current weather."""
+        self._get_raw_weather(city_name)
+
+    def is_weather_cached(self, city_name: str) -> bool:
+        """Returns True if the weather of the city can be served without requests."""
+        return city_name.lower() in self._weather_cache
+
+    def cached_city_locations(self) -> dict[str, tuple]:
+        """Returns the locations of the cities that have been located, city -> (lat, lon)."""
+        locations = {}
+        for city_key in self._location_cache.keys():
+            location = self._location_cache.get(city_key)
+            if location is not None:
+                locations[city_key] = tuple(location)
+        return locations
+
+    def _get_raw_weather(self, city_name: str) -> dict:
+        """Returns the weather API response of the city from the cache or the API."""
+        city_key = city_name.lower()
+        raw_weather_data = self._weather_cache.get(city_key)
+        if raw_weather_data is None:
+            latitude, longitude = self.get_city_location(city_name)
+            raw_weather_data = self._api_client.get(
+                "/v1/forecast", params=self._forecast_params(latitude, longitude)
+            )
+            self._store_forecast(city_key, raw_weather_data)
+        return raw_weather_data
+
+    async def get_weather_info_async(self, city_name: str) -> WeatherData:
+        """
+        Asynchronous variant of get_weather_info that can be awaited in asyncio loop.
+
+        Parameters:
+            city_name (str): Name of the city.
+
+        Returns:
+            WeatherData: An instance of WeatherData representing the current weather conditions.
+        """
+        city_key = city_name.lower()
+        raw_weather_data = self._weather_cache.get(city_key)
+        if raw_weather_data is None:
+            # Geocoding library is blocking so it is run in executor thread
+            latitude, longitude = await asyncio.get_running_loop().run_in_executor(
+                None, self.get_city_location, city_name
+            )
+            if self._async_api_client is None:
+                self._async_api_client = AsyncApiClient(WEATHER_API_URL)
+            raw_weather_data = await self._async_api_client.get(
+                "/v1/forecast", params=self._forecast_params(latitude, longitude)
+            )
+            self._store_forecast(city_key, raw_weather_data)
+        weather_data = self._weather_factory.create_weather_data(raw_weather_data)
+        self._current_weather = weather_data
+        return self._current_weather
+
+    def get_hourly_forecast(self, city_name: str) -> HourlyForecast:
+        """
+        Get hourly forecast of a city. The forecast is requested together with the current
+        weather, so usually it is already cached and no request is made.
+
+        Parameters:
+            city_name (str): Name of the city.
+
+        Returns:
+            HourlyForecast: Hourly forecast of the next FORECAST_DAYS days.
+        """
+        city_key = city_name.lower()
+        # Parsed forecast is reused as long as the cache entry it was parsed from is valid
+        stored_at = self._forecast_cache.stored_at(city_key)
+        cached = self._hourly_forecasts.get(city_key)
+        if cached is not None and cached[0] == stored_at and city_key in self._forecast_cache:
+            return cached[1]
+        raw_forecast = self._forecast_cache.get(city_key)
+        if raw_forecast is None:
+            latitude, longitude = self.get_city_location(city_name)
+            raw_forecast = self._api_client.get(
+                "/v1/forecast", params=self._forecast_params(latitude, longitude)
+            )
+            self._store_forecast(city_key, raw_forecast)
+        forecast = HourlyForecast(raw_forecast)
+        self._hourly_forecasts[city_key] = (self._forecast_cache.stored_at(city_key), forecast)
+        return forecast
+
+    def cached_forecasts(self) -> dict[str, HourlyForecast]:
+        """Returns the parsed hourly forecasts that are kept in memory by city."""
+        return {city: forecast for city, (_, forecast) in self._hourly_forecasts.items()}
+
+    def best_time_slot(
+        self, city_name: str, hours: int, outdoor: bool = True, now: datetime = None
+    ) -> ForecastSlot | None:
+        """
+        Get the best hour for outdoor or indoor sports in the city in the next hours.
+
+        Parameters:
+            city_name (str): Name of the city.
+            hours (int): How many hours ahead are considered.
+            outdoor (bool, optional): True for outdoor and False for indoor sports.
+            now (datetime, optional): Current time (timezone aware). Defaults to now.
+
+        Returns:
+            ForecastSlot | None: The best hour or None if there is no suitable hour.
+        """
+        return self.get_hourly_forecast(city_name).best_slot(hours, outdoor, now)
+
+    @staticmethod
+    def _forecast_params(latitude: float, longitude: float) -> dict:
+        """Returns parameters that request the current weather and the hourly forecast."""
+        return {
             "latitude": latitude,
             "longitude": longitude,
             "current_weather": "true",
+            "hourly": HOURLY_VARIABLES,
+            "forecast_days": FORECAST_DAYS,
             "timezone": "auto",
         }
-        raw_weather_data = self._api_client.get("/v1/forecast", params=params)
-        weather_data = self._weather_factory.create_weather_data(raw_weather_data)
-        self._current_weather = weather_data
-        return self._current_weather
+
+    def _store_forecast(self, city_key: str, raw_weather_data: dict):
+        """Stores the response to the weather cache and its hourly part to the forecast cache."""
+        self._weather_cache.set(city_key, raw_weather_data)
+        if "hourly" in raw_weather_data:
+            self._forecast_cache.set(city_key, raw_weather_data)
+
+    def get_city_location(self, city_name: str):
+        """
+        Get latitude and longitude for a given city using the location cache.
+
+        Parameters:
+            city_name (str): Name of the city.
+
+        Returns:
+            tuple: A tuple containing latitude and longitude or None if location is not found.
+        """
+        city_key = city_name.lower()
+        location = self._location_cache.get(city_key)
+        if location is None:
+            location = self.get_lat_long(city_name)
+            if location is None:
+                return None
+            self._location_cache.set(city_key, list(location))
+        return tuple(location)
 
     @staticmethod
     def get_lat_long(city_name: str):
@@ -232,7 +486,10 @@ class WeatherModel:
 
         geopy.geocoders.options.default_ssl_context = ctx
         geolocator = Nominatim(user_agent="software_project")
-        location = geolocator.geocode(city_name)
+        # Geocoding errors are raised from geopy, so a request without an exception is a success
+        with get_host_limiter(GEOCODING_API_URL).request() as request:
+            location = geolocator.geocode(city_name)
+            request.record(200)
 
         if location:
             return location.latitude, location.longitude
@@ -1,6 +1,45 @@
+import asyncio
+import threading
+import weakref
+
+from typing import Any, AsyncIterator, Iterator
+
 import requests
 from retry import retry
 
+from sportlocate.utils.jsonstream import aiter_array_items, iter_array_items, loads
+from sportlocate.utils.ratelimiter import get_host_limiter
+from sportlocate.utils.startuptrace import record_upstream_call
+
+try:
+    import aiohttp
+except ImportError:  # aiohttp is optional, install with: pip install sportlocate[async]
+    aiohttp = None
+
+# Maximum count of requests that AsyncApiClient has in flight at the same time
+DEFAULT_MAX_CONCURRENCY = 50
+# Kept alive connections per host in the connection pools of ApiClient
+POOL_CONNECTIONS_PER_HOST = 16
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+# AsyncApiClients that have a session, so that sessions can be closed before their loop
+_async_clients = weakref.WeakSet()
+
+
+def _get_session(base_url: str) -> requests.Session:
+    """Returns the session shared by the ApiClients of the base URL, so that all
+    clients and threads reuse the same kept alive connections."""
+    with _sessions_lock:
+        session = _sessions.get(base_url)
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=POOL_CONNECTIONS_PER_HOST)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[base_url] = session
+        return session
+
 
 class ApiClient:
     """
@@ -15,6 +54,7 @@ class ApiClient:
             base_url (str): The base URL for the API.
         """
         self.base_url = base_url
+        self._session = _get_session(base_url)
 
     @retry(tries=3, delay=2)  # Retry up to 3 times, waiting 2 seconds between retries
     def get(self, endpoint, params=None) -> dict:
@@ -31,6 +71,196 @@ class ApiClient:
         Raises:
             requests.HTTPError: If the request results in an HTTP error.
         """
-        response = requests.get(self.base_url + endpoint, params=params)
+        # Waiting for the shared limiter of the host, which adapts to the responses
+        record_upstream_call(self.base_url + endpoint, params)
+        with get_host_limiter(self.base_url).request() as request:
+            response = self._session.get(self.base_url + endpoint, params=params)
+            request.record(response.status_code, response.headers.get("Retry-After"))
         response.raise_for_status()  # Raises a HTTPError if the status is 4xx, 5xx
-        return response.json()
+        return loads(response.content)
+
+    def iter_items(self, endpoint, params=None) -> Iterator[Any]:
+        """
+        Send a GET request to an endpoint that returns a JSON array and yield its items
+        while the response is still being received.
+
+        Only the request is retried. An error in the middle of the response is raised
+        to the caller because some items have been yielded already.
+
+        Args:
+            endpoint (str): The endpoint to send the GET request to.
+            params (dict, optional): A dictionary of query parameters to include in the request.
+
+        Yields:
+            Any: Decoded items of the array.
+
+        Raises:
+            requests.HTTPError: If the request results in an HTTP error.
+        """
+        response = self._open_stream(endpoint, params)
+        with response:
+            # Letting urllib3 decompress gzip encoded responses
+            response.raw.decode_content = True
+            yield from iter_array_items(response.raw)
+
+    @retry(tries=3, delay=2)
+    def _open_stream(self, endpoint, params=None) -> requests.Response:
+        # Request slot is held until the headers are received, not while the items are
+        # consumed, because the consumer may make more requests to the same host
+        record_upstream_call(self.base_url + endpoint, params)
+        with get_host_limiter(self.base_url).request() as request:
+            response = self._session.get(self.base_url + endpoint, params=params, stream=True)
+            request.record(response.status_code, response.headers.get("Retry-After"))
+        response.raise_for_status()
+        return response
+
+
+class AsyncApiClient:
+    """
+    Asynchronous variant of ApiClient that can be awaited from asyncio coroutines.
+
+    All requests are done in one thread and the count of requests in flight is
+    limited with a semaphore, so callers can start thousands of requests and the
+    client applies backpressure by making the extra requests wait.
+    """
+
+    def __init__(self, base_url, max_concurrency=DEFAULT_MAX_CONCURRENCY, tries=3, delay=2):
+        """
+        Initialize the AsyncApiClient with a base URL.
+
+        Args:
+            base_url (str): The base URL for the API.
+            max_concurrency (int, optional): Maximum count of requests in flight.
+            tries (int, optional): How many times the request is tried before giving up.
+            delay (float, optional): Seconds to wait between the tries.
+
+        Raises:
+            ImportError: If aiohttp is not installed.
+        """
+        if not self.is_available():
+            raise ImportError("AsyncApiClient requires aiohttp: pip install sportlocate[async]")
+        self.base_url = base_url
+        self._max_concurrency = max_concurrency
+        self._tries = tries
+        self._delay = delay
+        # Session and semaphore are bound to the event loop where those are created
+        self._loop = None
+        self._session = None
+        self._semaphore = None
+
+    @staticmethod
+    def is_available() -> bool:
+        """Returns True if the optional aiohttp dependency is installed."""
+        return aiohttp is not None
+
+    async def get(self, endpoint, params=None) -> dict:
+        """
+        Send a GET request to the specified endpoint.
+
+        Args:
+            endpoint (str): The endpoint to send the GET request to.
+            params (dict, optional): A dictionary of query parameters to include in the request.
+
+        Returns:
+            dict: The JSON response from the server.
+
+        Raises:
+            aiohttp.ClientResponseError: If the request results in an HTTP error.
+        """
+        self._bind_to_running_loop()
+        record_upstream_call(self.base_url + endpoint, params)
+        for attempt in range(1, self._tries + 1):
+            try:
+                async with self._semaphore:
+                    async with get_host_limiter(self.base_url).request_async() as request:
+                        async with self._session.get(
+                            self.base_url + endpoint, params=params
+                        ) as response:
+                            request.record(response.status, response.headers.get("Retry-After"))
+                            response.raise_for_status()
+                            return loads(await response.read())
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt == self._tries:
+                    raise
+                await asyncio.sleep(self._delay)
+
+    async def iter_items(self, endpoint, params=None) -> AsyncIterator[Any]:
+        """
+        Send a GET request to an endpoint that returns a JSON array and yield its items
+        while the response is still being received.
+
+        Only the request is retried, like in ApiClient.iter_items.
+
+        Args:
+            endpoint (str): The endpoint to send the GET request to.
+            params (dict, optional): A dictionary of query parameters to include in the request.
+
+        Yields:
+            Any: Decoded items of the array.
+
+        Raises:
+            aiohttp.ClientResponseError: If the request results in an HTTP error.
+        """
+        self._bind_to_running_loop()
+        record_upstream_call(self.base_url + endpoint, params)
+        response = await self._open_stream(endpoint, params)
+        async with response:
+            async for item in aiter_array_items(response.content):
+                yield item
+
+    async def _open_stream(self, endpoint, params=None) -> "aiohttp.ClientResponse":
+        # Request slot is held until the headers are received, not while the items are
+        # consumed, because the consumer may make more requests to the same host
+        for attempt in range(1, self._tries + 1):
+            try:
+                async with self._semaphore:
+                    async with get_host_limiter(self.base_url).request_async() as request:
+                        response = await self._session.get(self.base_url + endpoint, params=params)
+                        request.record(response.status, response.headers.get("Retry-After"))
+                if not response.ok:
+                    response.release()
+                    response.raise_for_status()
+                return response
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt == self._tries:
+                    raise
+                await asyncio.sleep(self._delay)
+
+    async def close(self):
+        """Closes the underlying HTTP session."""
+        if self._session is not None:
+            session = self._session
+            self._session = None
+            self._loop = None
+            _async_clients.discard(self)
+            await session.close()
+
+    def _bind_to_running_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._close_session_of_previous_loop()
+            self._loop = loop
+            self._session = aiohttp.ClientSession()
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+            _async_clients.add(self)
+
+    def _close_session_of_previous_loop(self):
+        """Closes the session that was created in another event loop. The session can be
+        closed only in its own loop, so the close is scheduled there."""
+        session, loop = self._session, self._loop
+        self._session = None
+        if session is None or session.closed:
+            return
+        if loop.is_closed():
+            # Loop was closed without close_async_clients, its connections are gone anyway
+            session.detach()
+            return
+        asyncio.run_coroutine_threadsafe(session.close(), loop)
+
+
+async def close_async_clients():
+    """Closes the sessions of all AsyncApiClients that were used in the running loop.
+    Must be awaited before the loop is closed."""
+    loop = asyncio.get_running_loop()
+    clients = [client for client in list(_async_clients) if client._loop is loop]
+    await asyncio.gather(*(client.close() for client in clients))
@@ -0,0 +1,307 @@
+"""
+apiserver.py
+
+Headless local HTTP/JSON API of the venues, recommendations and weather.
+
+The server runs without Qt on top of VenueModel, WeatherModel and CityModel, so
+several clients (kiosks, a web front end...) share one warm venue and weather
+cache and the connection pools of the upstream APIs instead of every desktop
+instance downloading everything itself.
+
+Requests are served asynchronously by aiohttp. Blocking model calls run in a
+thread pool and concurrent requests that need the same data wait for one call.
+Encoded venue lists are memoized as long as the model returns the same list, so
+repeated requests of a warm city are answered without encoding the venues again.
+
+Endpoints (city names are case insensitive, categories are category names):
+    GET /api/cities?q=aane&limit=10                  cities, searched if q is given
+    GET /api/categories                              venue categories
+    GET /api/cities/{city}/venues?categories=Gyms    venues, filtered by the categories
+    GET /api/cities/{city}/counts                    venue counts by category
+    GET /api/cities/{city}/recommendation            venue recommended for the weather
+    GET /api/cities/{city}/weather                   current weather
+    GET /api/stats                                   cache and request statistics
+
+Usage:
+    python -m sportlocate.utils.apiserver --port 8080
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from typing import Any, Callable, Hashable
+
+from sportlocate.models.city_model import CityModel
+from sportlocate.models.sportvenuecategorymodel import SportVenueCategoryModel
+from sportlocate.models.venuemodel import VenueModel
+from sportlocate.models.weathermodel import ClearSky, PartlyCloudy, WeatherModel
+from sportlocate.utils.jsonstream import dumps
+from sportlocate.utils.services import get_service
+
+try:
+    from aiohttp import web
+except ImportError:  # aiohttp is optional, install with: pip install sportlocate[async]
+    web = None
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+# Threads that run the blocking model calls
+DEFAULT_WORKERS = 16
+# Encoded venue lists that are kept, (city, category mask) pairs
+ENCODED_VENUE_LISTS = 256
+# Maximum count of cities returned by a search
+DEFAULT_CITY_SEARCH_LIMIT = 20
+
+
+class ApiServer:
+    """
+    JSON API of the shared models.
+
+    Usage:
+        server = ApiServer()
+        web.run_app(server.create_app(), port=8080)
+    """
+
+    def __init__(
+        self,
+        venue_model: VenueModel = None,
+        weather_model: WeatherModel = None,
+        city_model: CityModel = None,
+        workers: int = DEFAULT_WORKERS,
+    ):
+        """
+        Init the server.
+
+        Args:
+            venue_model (VenueModel, optional): Model whose venue factory serves the venues.
+            weather_model (WeatherModel, optional): Model that serves the weather.
+            city_model (CityModel, optional): Model that serves the cities.
+            workers (int, optional): Count of threads for the blocking model calls.
+
+        Raises:
+            ImportError: If aiohttp is not installed.
+        """
+        if web is None:
+            raise ImportError("ApiServer requires aiohttp: pip install sportlocate[async]")
+        self._venue_factory = (venue_model or get_service(VenueModel)).venue_factory
+        self._weather_model = weather_model or get_service(WeatherModel)
+        self._city_model = city_model or get_service(CityModel)
+        self._category_model = get_service(SportVenueCategoryModel)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ApiServer")
+        # Model calls in progress, key -> future, so that concurrent requests share them
+        self._in_progress: dict[Hashable, asyncio.Future] = {}
+        # (city, mask) -> (venue list, encoded list) of the latest responses
+        self._encoded_venues: OrderedDict[tuple, tuple[list, bytes]] = OrderedDict()
+        self._request_count = 0
+        self._coalesced_count = 0
+
+    def create_app(self) -> web.Application:
+        """Returns the aiohttp application of the API."""
+
+        @web.middleware
+        async def handle_errors(request: web.Request, handler) -> web.StreamResponse:
+            return await self._handle_errors(request, handler)
+
+        app = web.Application(middlewares=[handle_errors])
+        app.router.add_get("/api/cities", self._get_cities)
+        app.router.add_get("/api/categories", self._get_categories)
+        app.router.add_get("/api/cities/{city}/venues", self._get_venues)
+        app.router.add_get("/api/cities/{city}/counts", self._get_counts)
+        app.router.add_get("/api/cities/{city}/recommendation", self._get_recommendation)
+        app.router.add_get("/api/cities/{city}/weather", self._get_weather)
+        app.router.add_get("/api/stats", self._get_stats)
+        app.on_cleanup.append(self._on_cleanup)
+        return app
+
+    # Handlers
+
+    async def _get_cities(self, request: web.Request) -> web.Response:
+        text = request.query.get("q", "")
+        if not text:
+            return self._json(self._city_model.cities)
+        limit = self._int_param(request, "limit", DEFAULT_CITY_SEARCH_LIMIT)
+        return self._json(self._city_model.search(text, limit))
+
+    async def _get_categories(self, request: web.Request) -> web.Response:
+        indoor = {category.name for category in self._category_model.indoor_categories}
+        return self._json(
+            [
+                {
+                    "name": category.name,
+                    "code": category.category_code,
+                    "indoor": category.name in indoor,
+                    "types": category.sport_venue_types,
+                }
+                for category in self._category_model.sport_venue_categories
+            ]
+        )
+
+    async def _get_venues(self, request: web.Request) -> web.Response:
+        city = self._city_param(request)
+        mask = self._mask_param(request)
+        venues = await self._venues(city, mask)
+        memo_key = (city, mask)
+        memoized = self._encoded_venues.get(memo_key)
+        if memoized is not None and memoized[0] is venues:
+            self._encoded_venues.move_to_end(memo_key)
+            body = memoized[1]
+        else:
+            body = await self._call(("encode", city, mask), _encode_venues, venues)
+            self._encoded_venues[memo_key] = (venues, body)
+            self._encoded_venues.move_to_end(memo_key)
+            while len(self._encoded_venues) > ENCODED_VENUE_LISTS:
+                self._encoded_venues.popitem(last=False)
+        return web.Response(body=body, content_type="application/json")
+
+    async def _get_counts(self, request: web.Request) -> web.Response:
+        city = self._city_param(request)
+        venue_counts = self._venue_factory.venue_counts
+        category_counts = venue_counts.category_counts(city, self._category_model)
+        if category_counts is None:
+            raise _error(web.HTTPNotFound, f"Venues of {city.capitalize()} have not been loaded")
+        return self._json(
+            {"city": city.capitalize(), "total": venue_counts.count(city), "categories": category_counts}
+        )
+
+    async def _get_recommendation(self, request: web.Request) -> web.Response:
+        city = self._city_param(request)
+        mask = self._mask_param(request)
+        weather, venues = await asyncio.gather(self._weather(city), self._venues(city, mask))
+        recommendation = self._venue_factory.create_recommendation(weather, venues)
+        if recommendation is None:
+            raise _error(web.HTTPNotFound, "No venue to recommend for the weather")
+        return self._json(recommendation.to_dict())
+
+    async def _get_weather(self, request: web.Request) -> web.Response:
+        city = self._city_param(request)
+        weather = await self._weather(city)
+        return self._json(
+            {
+                "city": city.capitalize(),
+                "type": type(weather).__name__,
+                "outdoor": isinstance(weather, (ClearSky, PartlyCloudy)),
+                "temperature": weather.temperature,
+                "windspeed": weather.windspeed,
+                "weathercode": weather.weathercode,
+                "latitude": weather.latitude,
+                "longitude": weather.longitude,
+                "warning": weather.warningInfo(),
+            }
+        )
+
+    async def _get_stats(self, request: web.Request) -> web.Response:
+        return self._json(
+            {
+                "requests": self._request_count,
+                "coalesced": self._coalesced_count,
+                "encoded_venue_lists": len(self._encoded_venues),
+                "city_cache": asdict(self._venue_factory.city_cache_stats()),
+            }
+        )
+
+    # Model calls
+
+    async def _venues(self, city: str, mask: int | None) -> list:
+        if mask is None:
+            return await self._call(("venues", city), self._venue_factory.create_venues, city)
+        return await self._call(
+            ("venues", city, mask), self._venue_factory.create_filtered_venues_by_mask, city, mask
+        )
+
+    async def _weather(self, city: str):
+        weather = await self._call(
+            ("weather", city), self._weather_model.get_weather_info, city.capitalize()
+        )
+        if weather is None:
+            raise _error(web.HTTPServiceUnavailable, f"Weather of {city.capitalize()} is not available")
+        return weather
+
+    async def _call(self, key: Hashable, fn: Callable, *args) -> Any:
+        """Runs the blocking call in the thread pool. Concurrent calls with the same key
+        wait for the first one."""
+        future = self._in_progress.get(key)
+        if future is not None:
+            self._coalesced_count += 1
+        else:
+            future = asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+            self._in_progress[key] = future
+            future.add_done_callback(lambda _: self._in_progress.pop(key, None))
+        # Shielded so that a disconnected client doesn't cancel the call of the others
+        return await asyncio.shield(future)
+
+    # Helpers
+
+    def _city_param(self, request: web.Request) -> str:
+        city = request.match_info["city"].lower()
+        if city not in self._city_model.cities_and_city_codes:
+            raise _error(web.HTTPNotFound, f"Unknown city: {request.match_info['city']}")
+        return city
+
+    def _mask_param(self, request: web.Request) -> int | None:
+        """Returns mask of the categories parameter, or None if the venues are not filtered."""
+        names = request.query.get("categories")
+        if names is None:
+            return None
+        mask = 0
+        for name in filter(None, (name.strip() for name in names.split(","))):
+            try:
+                mask |= self._category_model.category_bit(name)
+            except KeyError:
+                raise _error(web.HTTPBadRequest, f"Unknown category: {name}") from None
+        return mask
+
+    @staticmethod
+    def _int_param(request: web.Request, name: str, default: int) -> int:
+        value = request.query.get(name)
+        if value is None:
+            return default
+        if not value.isdigit():
+            raise _error(web.HTTPBadRequest, f"{name} must be a positive integer")
+        return int(value)
+
+    @staticmethod
+    def _json(data: Any) -> web.Response:
+        return web.Response(body=dumps(data), content_type="application/json")
+
+    async def _handle_errors(self, request: web.Request, handler) -> web.StreamResponse:
+        """Counts the requests and returns errors of the models as JSON."""
+        self._request_count += 1
+        try:
+            return await handler(request)
+        except web.HTTPException:
+            raise
+        except Exception as e:
+            print(f"API request {request.path} failed: {e}")
+            raise _error(web.HTTPBadGateway, str(e)) from e
+
+    async def _on_cleanup(self, app: web.Application):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _encode_venues(venues: list) -> bytes:
+    return dumps([venue.to_dict() for venue in venues])
+
+
+def _error(http_error: type, message: str) -> Exception:
+    """Returns aiohttp HTTP error whose body is {"error": message}."""
+    return http_error(text=dumps({"error": message}).decode(), content_type="application/json")
+
+
+def main():
+    """Command line entry point of the API server."""
+    parser = argparse.ArgumentParser(description="Serve Sportlocate venues and weather as JSON.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Address to listen")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Model call thread count")
+    args = parser.parse_args()
+
+    server = ApiServer(workers=args.workers)
+    web.run_app(server.create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
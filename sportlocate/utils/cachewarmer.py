@@ -0,0 +1,230 @@
+"""
+cachewarmer.py
+
+Warm-up job that loads every municipality in city_codes.csv to the venue and
+weather caches so that any city user picks is already cached.
+
+Cities are processed in a thread pool. All workers share one rate limiter per
+upstream API so that LIPAS is not flooded with requests. Geocoding is always
+limited to the rate allowed by Nominatim (see utils/ratelimiter.py). Completed cities are
+stored to a checkpoint file and an interrupted job continues from where it
+stopped when it is started again.
+
+With --sync the cached cities are kept fresh by requesting only the venues
+that have changed in LIPAS since the previous sync of the city.
+
+Venue counts of every warmed city are stored next to the venue cache (see
+models/venuecounts.py), so the counts of all cities are known after the job.
+
+Usage:
+    python -m sportlocate.utils.cachewarmer --workers 4 --rate 5
+    python -m sportlocate.utils.cachewarmer --sync --no-weather
+"""
+from __future__ import annotations
+
+import argparse
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+
+from sportlocate.models.city_model import CityModel
+from sportlocate.models.venuefactory import (
+    SportVenueFactory,
+    SPORT_VENUE_API_URL,
+    VenueSyncResult,
+)
+from sportlocate.models.weathermodel import WeatherModel, WEATHER_API_URL
+from sportlocate.utils.diskcache import DiskCache
+from sportlocate.utils.ratelimiter import RateLimiter, set_rate_limiter
+from sportlocate.utils.services import get_service
+
+# Default requests per second to the APIs during the warm-up
+DEFAULT_VENUE_API_RATE = 5.0
+DEFAULT_WEATHER_API_RATE = 5.0
+DEFAULT_WORKERS = 4
+# Warmed venues are only written to disk, so little memory is needed for them
+WARMUP_CITY_CACHE_BUDGET = 4 * 1024 * 1024
+
+CHECKPOINT_KEY = "warmup_checkpoint"
+
+
+@dataclass
+class WarmupProgress:
+    """Progress of the warm-up job."""
+
+    total: int
+    completed: list[str] = field(default_factory=list)
+    skipped: list[str] = field(default_factory=list)
+    failed: dict[str, str] = field(default_factory=dict)
+    venue_count: int = 0
+    # Venue changes of sync mode
+    added: int = 0
+    changed: int = 0
+    removed: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def done(self) -> int:
+        """Count of cities handled so far (completed, skipped or failed)."""
+        return len(self.completed) + len(self.skipped) + len(self.failed)
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the job was started."""
+        return time.monotonic() - self.started_at
+
+    def report(self) -> str:
+        """Returns summary of the job as a printable string."""
+        report = (
+            f"Warmed {len(self.completed)} cities ({self.venue_count} venues), "
+            f"skipped {len(self.skipped)} already cached, {len(self.failed)} failed "
+            f"in {self.elapsed:.1f}s."
+        )
+        if self.added or self.changed or self.removed:
+            report += f" Venues {self.added} added, {self.changed} changed, {self.removed} removed."
+        return report
+
+
+class CacheWarmer:
+    """Loads all cities to the venue and weather caches."""
+
+    def __init__(
+        self,
+        workers: int = DEFAULT_WORKERS,
+        venue_api_rate: float = DEFAULT_VENUE_API_RATE,
+        weather_api_rate: float = DEFAULT_WEATHER_API_RATE,
+        include_weather: bool = True,
+        sync: bool = False,
+    ):
+        """
+        Initialize the cache warmer.
+
+        Args:
+            workers (int, optional): Count of worker threads.
+            venue_api_rate (float, optional): Requests per second allowed to LIPAS API.
+            weather_api_rate (float, optional): Requests per second allowed to weather API.
+            include_weather (bool, optional): Whether weather cache is warmed too.
+            sync (bool, optional): If True cached cities are updated with only the venues
+                changed since their previous sync instead of being skipped.
+        """
+        self._workers = workers
+        self._venue_limiter = RateLimiter(venue_api_rate)
+        self._weather_limiter = RateLimiter(weather_api_rate)
+        self._checkpoint_cache = DiskCache("warmup")
+        self._checkpoint_lock = threading.Lock()
+        self._venue_factory = SportVenueFactory(city_cache_budget=WARMUP_CITY_CACHE_BUDGET)
+        self._weather_model = get_service(WeatherModel) if include_weather else None
+        self._sync = sync
+
+    def run(self, cities: list[str] = None, resume: bool = True, progress_callback=None) -> WarmupProgress:
+        """
+        Warms the caches.
+
+        Args:
+            cities (list[str], optional): Cities to warm. Defaults to all cities in city_codes.csv.
+            resume (bool, optional): If True cities completed in previous run are skipped.
+            progress_callback (callable, optional): Called with (city, progress) after each city.
+                Defaults to printing progress line.
+
+        Returns:
+            WarmupProgress: Final progress of the job.
+        """
+        if cities is None:
+            cities = list(get_service(CityModel).cities_and_city_codes.keys())
+        cities = [city.lower() for city in cities]
+        if progress_callback is None:
+            progress_callback = self._print_progress
+
+        checkpoint = self._read_checkpoint() if resume else []
+        progress = WarmupProgress(total=len(cities))
+        pending = []
+        for city in cities:
+            if city in checkpoint:
+                progress.skipped.append(city)
+            else:
+                pending.append(city)
+
+        # Setting the shared rate limiters for the duration of the job
+        set_rate_limiter(SPORT_VENUE_API_URL, self._venue_limiter)
+        set_rate_limiter(WEATHER_API_URL, self._weather_limiter)
+        try:
+            with ThreadPoolExecutor(max_workers=self._workers) as executor:
+                futures = {executor.submit(self._warm_city, city): city for city in pending}
+                for future in as_completed(futures):
+                    city = futures[future]
+                    try:
+                        venue_count, sync_result = future.result()
+                        progress.venue_count += venue_count
+                        if sync_result is not None:
+                            progress.added += len(sync_result.added)
+                            progress.changed += len(sync_result.changed)
+                            progress.removed += len(sync_result.removed)
+                        progress.completed.append(city)
+                        self._write_checkpoint(progress.completed + checkpoint)
+                    except Exception as e:
+                        progress.failed[city] = str(e)
+                    progress_callback(city, progress)
+        finally:
+            set_rate_limiter(SPORT_VENUE_API_URL, None)
+            set_rate_limiter(WEATHER_API_URL, None)
+
+        # Clearing the checkpoint when everything is done so that next run warms all again
+        if not progress.failed:
+            self._write_checkpoint([])
+        return progress
+
+    def _warm_city(self, city: str) -> tuple[int, VenueSyncResult | None]:
+        """Loads one city to caches and returns its venue count and sync result."""
+        sync_result = None
+        if self._sync:
+            sync_result = self._venue_factory.sync_venues(city)
+        venues = self._venue_factory.create_venues(city)
+        if self._weather_model is not None:
+            self._weather_model.get_weather_info(city.capitalize())
+        return len(venues), sync_result
+
+    def _read_checkpoint(self) -> list[str]:
+        return self._checkpoint_cache.get(CHECKPOINT_KEY, [])
+
+    def _write_checkpoint(self, completed: list[str]):
+        with self._checkpoint_lock:
+            self._checkpoint_cache.set(CHECKPOINT_KEY, completed)
+
+    @staticmethod
+    def _print_progress(city: str, progress: WarmupProgress):
+        status = "failed: " + progress.failed[city] if city in progress.failed else "ok"
+        print(
+            f"[{progress.done}/{progress.total}] {city.capitalize()} {status} "
+            f"({progress.elapsed:.1f}s)"
+        )
+
+
+def main():
+    """Command line entry point of the warm-up job."""
+    parser = argparse.ArgumentParser(description="Warm Sportlocate venue and weather caches.")
+    parser.add_argument("cities", nargs="*", help="Cities to warm (default: all cities)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Worker thread count")
+    parser.add_argument("--rate", type=float, default=DEFAULT_VENUE_API_RATE, help="LIPAS requests per second")
+    parser.add_argument("--weather-rate", type=float, default=DEFAULT_WEATHER_API_RATE, help="Weather API requests per second")
+    parser.add_argument("--no-weather", action="store_true", help="Warm only the venue cache")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint of previous run")
+    parser.add_argument("--sync", action="store_true", help="Update cached cities with changed venues only")
+    args = parser.parse_args()
+
+    warmer = CacheWarmer(
+        workers=args.workers,
+        venue_api_rate=args.rate,
+        weather_api_rate=args.weather_rate,
+        include_weather=not args.no_weather,
+        sync=args.sync,
+    )
+    progress = warmer.run(cities=args.cities or None, resume=not args.restart)
+    print(progress.report())
+    for city, error in progress.failed.items():
+        print(f"  {city}: {error}")
+
+
+if __name__ == "__main__":
+    main()
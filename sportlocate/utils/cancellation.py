@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import threading
+
+
+class OperationCancelled(Exception):
+    """Raised inside a long running operation when it has been cancelled."""
+
+
+class CancellationToken:
+    """
+    Token for cooperative cancellation of long running operations.
+
+    The owner of the operation calls cancel() and the operation checks the token
+    between its steps (for example between API requests) with raise_if_cancelled().
+    The token is thread safe, so it can be cancelled on GUI thread while the
+    operation runs in a worker thread.
+    """
+
+    def __init__(self):
+        """Init."""
+        self._cancelled = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def is_cancelled(self) -> bool:
+        """True if the token has been cancelled."""
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """Cancels the token and calls the registered callbacks."""
+        with self._lock:
+            if self._cancelled.is_set():
+                return
+            self._cancelled.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def add_callback(self, callback):
+        """Registers callback that is called when the token is cancelled. If the token is
+        already cancelled the callback is called immediately."""
+        with self._lock:
+            if not self._cancelled.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def raise_if_cancelled(self):
+        """Raises OperationCancelled if the token has been cancelled."""
+        if self._cancelled.is_set():
+            raise OperationCancelled()
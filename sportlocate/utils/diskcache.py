@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import time
+
+from pathlib import Path
+from typing import Any
+from urllib.parse import quote, unquote
+
+from sportlocate.utils.paths import cache_dir
+
+
+def atomic_write_json(path: Path, data: Any):
+    """Writes data as JSON to path so that readers never see a half written file.
+
+    The data is first written to a temporary file in the same directory and then
+    renamed over the target file.
+
+    Args:
+        path (Path): Target file path.
+        data (Any): JSON serializable data.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        # Not leaving temporary files behind if something goes wrong
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class DiskCache:
+    """Simple JSON file cache that stores one file per key.
+
+    Every entry is stored with the time it was written so that entries can be
+    expired with an optional time to live. Writes are atomic so the cache can be
+    shared between threads and processes.
+    """
+
+    def __init__(self, namespace: str, ttl: float | None = None):
+        """
+        Initialize the cache.
+
+        Args:
+            namespace (str): Sub directory of the cache directory used by this cache.
+            ttl (float, optional): Time to live of the entries in seconds. None means
+                that the entries never expire.
+        """
+        self.namespace = namespace
+        self.ttl = ttl
+
+    @property
+    def directory(self) -> Path:
+        """Directory where the cache entries are stored."""
+        return cache_dir() / self.namespace
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        Get cached value for the key.
+
+        Args:
+            key (str): Cache key.
+            default (Any, optional): Value returned if the key is not cached or it has expired.
+
+        Returns:
+            Any: Cached value or default.
+        """
+        entry = self._read_entry(key)
+        if entry is None or self._is_expired(entry):
+            return default
+        return entry["value"]
+
+    def set(self, key: str, value: Any):
+        """Stores JSON serializable value to the cache."""
+        atomic_write_json(self._path(key), {"stored_at": time.time(), "value": value})
+
+    def stored_at(self, key: str) -> float | None:
+        """Returns the unix time when the key was stored or None if key is not cached."""
+        entry = self._read_entry(key)
+        return None if entry is None else entry["stored_at"]
+
+    def modified_at(self, key: str) -> int | None:
+        """Returns modification time of the entry file in nanoseconds without reading the
+        entry, or None if key is not cached. Can be used to notice changes made by other
+        processes cheaply."""
+        try:
+            return self._path(key).stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def keys(self) -> list[str]:
+        """Returns the stored keys, also the expired ones."""
+        if not self.directory.is_dir():
+            return []
+        return [unquote(path.stem) for path in self.directory.glob("*.json")]
+
+    def __contains__(self, key: str) -> bool:
+        entry = self._read_entry(key)
+        return entry is not None and not self._is_expired(entry)
+
+    def _is_expired(self, entry: dict) -> bool:
+        return self.ttl is not None and time.time() - entry["stored_at"] > self.ttl
+
+    def _read_entry(self, key: str) -> dict | None:
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _path(self, key: str) -> Path:
+        # Keys are quoted so that city names with special characters are safe file names
+        return self.directory / f"{quote(key, safe='')}.json"
@@ -0,0 +1,85 @@
+"""
+jsonstream.py
+
+Helpers for decoding JSON responses with the fastest decoder that is installed.
+
+Top level arrays are parsed incrementally with ijson, so the items of a large
+response can be handled one at a time without decoding the whole payload to
+memory first. orjson is used for the responses that are decoded at once and
+for the responses of the API server. Both libraries are optional and are
+installed with: pip install sportlocate[fastjson]
+"""
+from __future__ import annotations
+
+import json
+
+from typing import Any, AsyncIterator, BinaryIO, Iterator
+
+try:
+    import ijson
+except ImportError:  # ijson is optional, arrays are then decoded at once
+    ijson = None
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, json module is used instead
+    orjson = None
+
+
+def loads(data: bytes | str) -> Any:
+    """Decodes a JSON document with orjson if it is installed, otherwise with json."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(data: Any) -> bytes:
+    """Encodes data as UTF-8 JSON with orjson if it is installed, otherwise with json."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def iter_array_items(stream: BinaryIO) -> Iterator[Any]:
+    """
+    Yields the items of the top level JSON array of the stream.
+
+    With ijson only one item is decoded to memory at a time. Without it the whole
+    stream is read and decoded first.
+
+    Args:
+        stream (BinaryIO): File like object that contains a JSON array.
+
+    Yields:
+        Any: Decoded items of the array.
+    """
+    if ijson is not None:
+        # Numbers are decoded as floats instead of Decimals like json module does
+        yield from ijson.items(stream, "item", use_float=True)
+    else:
+        yield from loads(stream.read())
+
+
+async def aiter_array_items(stream) -> AsyncIterator[Any]:
+    """
+    Asynchronous variant of iter_array_items for streams whose read(size) is awaited,
+    like the content of an aiohttp response.
+
+    Args:
+        stream: Asynchronous stream that contains a JSON array.
+
+    Yields:
+        Any: Decoded items of the array.
+    """
+    if ijson is not None:
+        async for item in ijson.items_async(stream, "item", use_float=True):
+            yield item
+    else:
+        for item in loads(await stream.read()):
+            yield item
+
+
+def decoder_names() -> tuple[str, str]:
+    """Returns names of the streaming and the whole document decoders in use."""
+    streaming = f"ijson ({ijson.backend})" if ijson is not None else "none"
+    return streaming, "orjson" if orjson is not None else "json"
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+
+from collections import OrderedDict
+
+# Url of the documents. Documents are served by AppSchemeHandler.
+MAP_DOCUMENT_URL = "sportlocate://map/{name}"
+
+# How many documents are kept in memory. Older documents are not shown anymore.
+MAX_DOCUMENTS = 8
+
+
+class MapDocumentStore:
+    """
+    In memory store of the generated map documents and their data resources.
+
+    Map view loads the documents by url instead of receiving them as a string,
+    so the size of the document is not limited by WebEngineView.loadHtml. Documents
+    are named by their content hash, so storing the same content again (for example
+    the same venues) gives the same url and the browser can reuse it. Maps are
+    rendered in worker threads, so the store is thread safe.
+    """
+
+    def __init__(self, max_documents: int = MAX_DOCUMENTS):
+        """
+        Init the store.
+
+        Args:
+            max_documents (int, optional): How many documents are kept in memory.
+        """
+        self._max_documents = max_documents
+        self._documents: OrderedDict[str, tuple[bytes, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, data: bytes, mime_type: bytes, suffix: str) -> str:
+        """
+        Stores the document and returns its url.
+
+        Args:
+            data (bytes): Content of the document.
+            mime_type (bytes): Mime type of the content, for example b"text/html".
+            suffix (str): File name suffix of the document, for example ".html".
+
+        Returns:
+            str: Url of the document.
+        """
+        name = hashlib.sha1(data).hexdigest()[:16] + suffix
+        with self._lock:
+            self._documents[name] = (mime_type, data)
+            self._documents.move_to_end(name)
+            while len(self._documents) > self._max_documents:
+                self._documents.popitem(last=False)
+        return MAP_DOCUMENT_URL.format(name=name)
+
+    def size(self) -> int:
+        """Returns total size of the stored documents in bytes."""
+        with self._lock:
+            return sum(len(data) for _, data in self._documents.values())
+
+    def get(self, name: str) -> tuple[bytes, bytes] | None:
+        """Returns (mime type, data) of the document or None if the document is not stored."""
+        with self._lock:
+            return self._documents.get(name)
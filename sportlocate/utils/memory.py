@@ -0,0 +1,301 @@
+"""
+memory.py
+
+Memory accounting of the loaded data.
+
+Object sizes are measured by walking the objects and their contents (shared
+objects are counted once per measured entry), and allocations of an operation
+are measured with tracemalloc snapshots. collect_memory_report reports the
+resident bytes of every city in the venue cache, per venue, and of the map,
+weather and category data.
+
+The command line checks the memory usage of a recorded venue list, for example
+one recorded with benchmarks/bench_venue_ingest.py, and fails if a venue takes
+more memory than allowed. It can be run as a regression check:
+    python -m sportlocate.utils.memory --dataset helsinki.json --max-venue-bytes 1200
+    python -m sportlocate.utils.memory --city Tampere --render
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import tracemalloc
+import types
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+
+from sportlocate.models.venuefactory import SportVenueFactory
+from sportlocate.utils.jsonstream import iter_array_items
+
+# Venue size budget of the regression check (bytes per venue)
+DEFAULT_MAX_VENUE_BYTES = 1200
+# How many allocation sites are listed in AllocationTrace
+TOP_ALLOCATION_SITES = 10
+
+# Shared program objects that are not part of the measured data
+_UNCOUNTED_TYPES = (
+    type,
+    types.ModuleType,
+    types.FunctionType,
+    types.MethodType,
+    types.BuiltinFunctionType,
+)
+
+
+def deep_size(obj: Any, seen: set = None) -> int:
+    """
+    Returns memory usage of the object and everything it refers to in bytes.
+
+    Containers, attribute dicts and slots are walked. Objects that are already in
+    seen are not counted again, so a shared seen set counts shared objects (like
+    interned strings) only once. Classes, functions and modules are not counted.
+
+    Args:
+        obj (Any): Object to measure.
+        seen (set, optional): Ids of the objects that are already counted.
+
+    Returns:
+        int: Size in bytes.
+    """
+    if seen is None:
+        seen = set()
+    size = 0
+    pending = [obj]
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen or isinstance(obj, _UNCOUNTED_TYPES):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, (str, bytes, bytearray, int, float, bool)) or obj is None:
+            continue
+        if isinstance(obj, np.ndarray):
+            # getsizeof counts the data of arrays that own it, views are counted by their base
+            if obj.base is not None:
+                pending.append(obj.base)
+            continue
+        if isinstance(obj, dict):
+            pending.extend(obj.keys())
+            pending.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            pending.extend(obj)
+        if hasattr(obj, "__dict__"):
+            pending.append(vars(obj))
+        for slot in getattr(type(obj), "__slots__", ()):
+            if hasattr(obj, slot):
+                pending.append(getattr(obj, slot))
+    return size
+
+
+@dataclass
+class MemoryEntry:
+    """Memory usage of one measured object, for example the venues of one city."""
+
+    name: str
+    bytes: int
+    # Count of the items in the entry (venues, documents...) or 0
+    count: int = 0
+
+    @property
+    def bytes_per_item(self) -> float:
+        return self.bytes / self.count if self.count else 0.0
+
+
+@dataclass
+class MemoryReport:
+    """Memory usage by subsystem."""
+
+    sections: dict[str, list[MemoryEntry]] = field(default_factory=dict)
+
+    def add(self, section: str, entry: MemoryEntry):
+        self.sections.setdefault(section, []).append(entry)
+
+    def total(self, section: str = None) -> int:
+        """Returns bytes of the section or of all sections."""
+        sections = [section] if section is not None else list(self.sections)
+        return sum(entry.bytes for name in sections for entry in self.sections.get(name, []))
+
+    def report(self) -> str:
+        """Returns the report as a printable string."""
+        lines = [f"Resident memory {_format_bytes(self.total())}"]
+        for section, entries in self.sections.items():
+            lines.append(f"  {section}: {_format_bytes(self.total(section))}")
+            for entry in entries:
+                line = f"    {entry.name:<24} {_format_bytes(entry.bytes):>10}"
+                if entry.count:
+                    line += f"  {entry.count} items, {entry.bytes_per_item:.0f} B/item"
+                lines.append(line)
+        return "\n".join(lines)
+
+
+@dataclass
+class AllocationTrace:
+    """Memory allocated by an operation, measured with tracemalloc."""
+
+    # Bytes still allocated after the operation (the result and anything it cached)
+    retained: int
+    # Highest traced memory during the operation, relative to the start
+    peak: int
+    # Biggest retained allocation sites, "file:line" -> bytes
+    top_sites: list[tuple[str, int]]
+
+    def report(self) -> str:
+        lines = [f"retained {_format_bytes(self.retained)}, peak {_format_bytes(self.peak)}"]
+        lines.extend(f"    {site:<48} {_format_bytes(size):>10}" for site, size in self.top_sites)
+        return "\n".join(lines)
+
+
+def trace_allocations(fn: Callable, *args, **kwargs) -> tuple[Any, AllocationTrace]:
+    """
+    Runs the function and measures its allocations with tracemalloc.
+
+    Returns:
+        tuple[Any, AllocationTrace]: Result of the function and its allocations.
+    """
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    start_size = tracemalloc.get_traced_memory()[0]
+    before = tracemalloc.take_snapshot()
+    try:
+        result = fn(*args, **kwargs)
+        size, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+    top_sites = [
+        (f"{Path(stat.traceback[0].filename).name}:{stat.traceback[0].lineno}", stat.size_diff)
+        for stat in after.compare_to(before, "lineno")[:TOP_ALLOCATION_SITES]
+        if stat.size_diff > 0
+    ]
+    return result, AllocationTrace(size - start_size, peak - start_size, top_sites)
+
+
+def venue_cache_entries(venue_factory) -> list[MemoryEntry]:
+    """Returns resident bytes of every city in the in-memory venue cache of the factory."""
+    return [
+        MemoryEntry(city, deep_size(venues), len(venues))
+        for city, venues in venue_factory.cached_cities()
+    ]
+
+
+def collect_memory_report(
+    venue_factory=None,
+    category_model=None,
+    weather_model=None,
+    map_controller=None,
+    map_documents=None,
+) -> MemoryReport:
+    """
+    Measures the resident memory of the given subsystems.
+
+    Args:
+        venue_factory (SportVenueFactory, optional): Factory whose city venue cache is measured.
+        category_model (SportVenueCategoryModel, optional): Model whose categories are measured.
+        weather_model (WeatherModel, optional): Model whose current weather and forecasts
+            are measured.
+        map_controller (MapController, optional): Controller whose map html is measured.
+        map_documents (MapDocumentStore, optional): Store whose documents are measured.
+
+    Returns:
+        MemoryReport: Memory usage by subsystem.
+    """
+    report = MemoryReport()
+    if venue_factory is not None:
+        for entry in venue_cache_entries(venue_factory):
+            report.add("venue cache", entry)
+    if category_model is not None:
+        categories = category_model.sport_venue_categories
+        report.add("categories", MemoryEntry("categories", deep_size(categories), len(categories)))
+    if weather_model is not None:
+        report.add("weather", MemoryEntry("current weather", deep_size(weather_model.current_weather)))
+        for city, forecast in weather_model.cached_forecasts().items():
+            report.add("weather", MemoryEntry(f"forecast {city}", deep_size(forecast), len(forecast)))
+    if map_controller is not None:
+        report.add("map", MemoryEntry("map html", sys.getsizeof(map_controller.map_html)))
+    if map_documents is not None:
+        report.add("map", MemoryEntry("map documents", map_documents.size()))
+    return report
+
+
+def load_dataset(path: Path) -> list:
+    """Creates venues from a recorded LIPAS venue list."""
+    with open(path, "rb") as f:
+        return [SportVenueFactory._parse_sport_venue_data(item) for item in iter_array_items(f)]
+
+
+def check_dataset(path: Path, max_venue_bytes: float = DEFAULT_MAX_VENUE_BYTES) -> tuple[bool, str]:
+    """
+    Regression check of the venue memory usage.
+
+    Loads the recorded venue list and measures the resident bytes per venue.
+
+    Args:
+        path (Path): Recorded venue list (JSON array of LIPAS venues).
+        max_venue_bytes (float, optional): Allowed resident bytes per venue.
+
+    Returns:
+        tuple[bool, str]: True if the venues fit the budget, and printable report.
+    """
+    venues, trace = trace_allocations(load_dataset, path)
+    entry = MemoryEntry(Path(path).name, deep_size(venues), len(venues))
+    ok = entry.bytes_per_item <= max_venue_bytes
+    report = (
+        f"{entry.name}: {entry.count} venues, {_format_bytes(entry.bytes)} resident, "
+        f"{entry.bytes_per_item:.0f} B/venue (budget {max_venue_bytes:.0f}) "
+        f"{'ok' if ok else 'OVER BUDGET'}\n"
+        f"  loading: {trace.report()}"
+    )
+    return ok, report
+
+
+def _format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def main():
+    """Command line entry point of the memory report and regression check."""
+    parser = argparse.ArgumentParser(description="Report Sportlocate memory usage.")
+    parser.add_argument("--dataset", type=Path, help="Recorded venue list to check")
+    parser.add_argument(
+        "--max-venue-bytes", type=float, default=DEFAULT_MAX_VENUE_BYTES, help="Budget per venue"
+    )
+    parser.add_argument("--city", action="append", default=[], help="City to load and measure")
+    parser.add_argument("--render", action="store_true", help="Measure rendering of the city map")
+    args = parser.parse_args()
+
+    ok = True
+    if args.dataset is not None:
+        ok, report = check_dataset(args.dataset, args.max_venue_bytes)
+        print(report)
+    if args.city:
+        from sportlocate.controllers.mapcontroller import render_map
+        from sportlocate.models.sportvenuecategorymodel import SportVenueCategoryModel
+        from sportlocate.utils.services import get_service
+
+        venue_factory = SportVenueFactory()
+        for city in args.city:
+            venues, trace = trace_allocations(venue_factory.create_venues, city)
+            print(f"Loading {city}: {trace.report()}")
+            if args.render:
+                (map_html, _), trace = trace_allocations(render_map, venues, (61.5, 23.8), -1)
+                print(f"Rendering {city} ({_format_bytes(len(map_html))} html): {trace.report()}")
+        report = collect_memory_report(
+            venue_factory=venue_factory, category_model=get_service(SportVenueCategoryModel)
+        )
+        print(report.report())
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Per-user file locations used by Sportlocate.
+
+The locations follow the platform conventions (XDG on Linux, ``APPDATA`` and
+``LOCALAPPDATA`` on Windows and ``~/Library`` on macOS). The ``SPORTLOCATE_CACHE_DIR``
+and ``SPORTLOCATE_CONFIG_DIR`` environment variables can be used to override the
+locations, for example in tests.
+"""
+from __future__ import annotations
+
+import os
+import sys
+from pathlib import Path
+
+APP_NAME = "sportlocate"
+
+
+def cache_dir() -> Path:
+    """Returns the directory where downloaded data is cached."""
+    override = os.environ.get("SPORTLOCATE_CACHE_DIR")
+    if override:
+        return Path(override)
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or Path.home() / "AppData" / "Local"
+        return Path(base) / APP_NAME / "cache"
+    if sys.platform == "darwin":
+        return Path.home() / "Library" / "Caches" / APP_NAME
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / APP_NAME
+
+
+def config_dir() -> Path:
+    """Returns the directory where user settings are stored."""
+    override = os.environ.get("SPORTLOCATE_CONFIG_DIR")
+    if override:
+        return Path(override)
+    if sys.platform == "win32":
+        base = os.environ.get("APPDATA") or Path.home() / "AppData" / "Roaming"
+        return Path(base) / APP_NAME
+    if sys.platform == "darwin":
+        return Path.home() / "Library" / "Application Support" / APP_NAME
+    base = os.environ.get("XDG_CONFIG_HOME") or Path.home() / ".config"
+    return Path(base) / APP_NAME
@@ -0,0 +1,269 @@
+"""
+profiling.py
+
+On-demand profiling of single user interactions.
+
+Controller slots that start user facing actions are decorated with
+interaction(name). When profiling is armed the next decorated slot call is
+profiled with cProfile together with everything it starts: the worker jobs of
+the JobScheduler, the coroutines of the AsyncioBridge and their result
+callbacks, also in other threads. When the last of them has finished the
+combined profile is saved as <time>-<interaction>.prof to the profiles
+directory, where it can be read with pstats or snakeviz.
+
+Profiling is armed with the SPORTLOCATE_PROFILE environment variable ("all" or
+a count of interactions to profile) or from code with arm():
+    SPORTLOCATE_PROFILE=1 python sportlocate
+
+Other parts of the application can follow the interactions with
+add_interaction_listener, for example to stop background work when the user
+starts something.
+"""
+from __future__ import annotations
+
+import cProfile
+import functools
+import os
+import pstats
+import re
+import threading
+import time
+import types
+
+from pathlib import Path
+from typing import Callable
+
+from sportlocate.utils.paths import cache_dir
+
+# Environment variable that arms the profiling, "all" or count of interactions
+PROFILE_ENV_VARIABLE = "SPORTLOCATE_PROFILE"
+# Environment variable that overrides the directory of the saved profiles
+PROFILE_DIR_ENV_VARIABLE = "SPORTLOCATE_PROFILE_DIR"
+# Count of functions printed in the summary of a saved profile
+SUMMARY_FUNCTIONS = 5
+
+
+def profiles_dir() -> Path:
+    """Returns the directory where the interaction profiles are saved."""
+    override = os.environ.get(PROFILE_DIR_ENV_VARIABLE)
+    if override:
+        return Path(override)
+    return cache_dir() / "profiles"
+
+
+class _CaptureTask:
+    """Piece of work that belongs to a capture. Ending it more than once has no effect."""
+
+    def __init__(self, capture: InteractionCapture):
+        self._capture = capture
+        self._ended = False
+        self._lock = threading.Lock()
+
+    def end(self):
+        with self._lock:
+            if self._ended:
+                return
+            self._ended = True
+        self._capture._end_task()
+
+
+class InteractionCapture:
+    """
+    Profile of one interaction.
+
+    Every profiled call gets its own cProfile profiler because a profiler can only
+    profile the thread where it runs. The profiles are combined when the capture
+    is saved.
+    """
+
+    def __init__(self, name: str, on_finished: Callable[[InteractionCapture], None] = None):
+        """
+        Init the capture.
+
+        Args:
+            name (str): Name of the interaction, for example "choose city".
+            on_finished (Callable, optional): Called with the capture when all its tasks have
+                ended. Defaults to saving the profile.
+        """
+        self.name = name
+        self.started_at = time.time()
+        self.path = None
+        self._on_finished = on_finished or InteractionCapture.save
+        self._profiles: list[cProfile.Profile] = []
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def begin_task(self) -> _CaptureTask:
+        """Registers work that the capture waits for. The task must be ended with end()."""
+        with self._lock:
+            self._pending += 1
+        return _CaptureTask(self)
+
+    def call(self, fn: Callable, *args, **kwargs):
+        """Calls the function with profiler of the current thread. Work started by the
+        function is added to this capture."""
+        if getattr(_thread_state, "capture", None) is not None:
+            # Current thread is already being profiled
+            return fn(*args, **kwargs)
+        profile = cProfile.Profile()
+        with self._lock:
+            self._profiles.append(profile)
+        _thread_state.capture = self
+        profile.enable()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.disable()
+            _thread_state.capture = None
+
+    def wrap(self, fn: Callable) -> Callable:
+        """Returns function that calls fn with the profiler of this capture."""
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return self.call(fn, *args, **kwargs)
+
+        return wrapper
+
+    def wrap_coroutine(self, coro):
+        """Returns coroutine that runs every step of the coroutine with the profiler."""
+        return _profiled_coroutine(self, coro)
+
+    def stats(self) -> pstats.Stats:
+        """Returns the combined statistics of the profiled calls."""
+        with self._lock:
+            profiles = list(self._profiles)
+        return pstats.Stats(*profiles)
+
+    def save(self) -> Path:
+        """Saves the combined profile and prints its summary. Returns path of the file."""
+        directory = profiles_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        slug = re.sub(r"[^a-z0-9]+", "-", self.name.lower()).strip("-")
+        timestamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started_at))
+        self.path = directory / f"{timestamp}-{slug}.prof"
+        stats = self.stats()
+        stats.dump_stats(self.path)
+        print(
+            f"Profiled '{self.name}' ({time.time() - self.started_at:.2f}s, "
+            f"{len(self._profiles)} calls): {self.path}"
+        )
+        stats.sort_stats("cumulative").print_stats(SUMMARY_FUNCTIONS)
+        return self.path
+
+    def _end_task(self):
+        with self._lock:
+            self._pending -= 1
+            finished = self._pending == 0
+        if finished:
+            self._on_finished(self)
+
+
+@types.coroutine
+def _step_with_profiler(capture: InteractionCapture, coro):
+    """Drives the coroutine like the event loop does, profiling each step."""
+    value, error = None, None
+    while True:
+        try:
+            if error is not None:
+                yielded = capture.call(coro.throw, error)
+            else:
+                yielded = capture.call(coro.send, value)
+        except StopIteration as stop:
+            return stop.value
+        try:
+            value, error = (yield yielded), None
+        except BaseException as e:
+            value, error = None, e
+
+
+async def _profiled_coroutine(capture: InteractionCapture, coro):
+    return await _step_with_profiler(capture, coro)
+
+
+_thread_state = threading.local()
+# Called with the name of every interaction that starts
+_interaction_listeners: list[Callable[[str], None]] = []
+_armed_lock = threading.Lock()
+# Count of the next interactions that are profiled, -1 profiles all
+_armed = 0
+
+
+def _armed_from_environment() -> int:
+    value = os.environ.get(PROFILE_ENV_VARIABLE, "").strip().lower()
+    if value == "all":
+        return -1
+    return int(value) if value.isdigit() else 0
+
+
+_armed = _armed_from_environment()
+
+
+def arm(count: int = 1):
+    """Profiles the next count interactions. -1 profiles all and 0 disarms."""
+    global _armed
+    with _armed_lock:
+        _armed = count
+
+
+def is_armed() -> bool:
+    """Returns True if the next interaction is profiled."""
+    return _armed != 0
+
+
+def current_capture() -> InteractionCapture | None:
+    """Returns the capture of the interaction that the current thread is running."""
+    return getattr(_thread_state, "capture", None)
+
+
+def add_interaction_listener(listener: Callable[[str], None]):
+    """Adds a function that is called with the name of the interaction when a decorated
+    slot is called, before the slot runs."""
+    _interaction_listeners.append(listener)
+
+
+def remove_interaction_listener(listener: Callable[[str], None]):
+    """Removes a listener added with add_interaction_listener."""
+    if listener in _interaction_listeners:
+        _interaction_listeners.remove(listener)
+
+
+def _start_capture(name: str) -> InteractionCapture | None:
+    global _armed
+    with _armed_lock:
+        if _armed == 0:
+            return None
+        if _armed > 0:
+            _armed -= 1
+    return InteractionCapture(name)
+
+
+def interaction(name: str):
+    """
+    Decorator of the slots that start user interactions. The interaction listeners
+    are notified and the slot is profiled when profiling is armed, see the module
+    documentation.
+
+    Args:
+        name (str): Name of the interaction used in the profile file name.
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            for listener in list(_interaction_listeners):
+                listener(name)
+            if not is_armed() or current_capture() is not None:
+                return fn(*args, **kwargs)
+            capture = _start_capture(name)
+            if capture is None:
+                return fn(*args, **kwargs)
+            task = capture.begin_task()
+            try:
+                return capture.call(fn, *args, **kwargs)
+            finally:
+                task.end()
+
+        return wrapper
+
+    return decorator
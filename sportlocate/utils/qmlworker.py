@@ -3,6 +3,8 @@ import sys
 
 from PyQt5.QtCore import pyqtSignal, pyqtSlot, QObject, QRunnable
 
+from sportlocate.utils.cancellation import CancellationToken, OperationCancelled
+
 
 class WorkerSignals(QObject):
     """
@@ -19,11 +21,15 @@ class WorkerSignals(QObject):
     result
         object data returned from processing, anything
 
+    cancelled
+        No data, emitted instead of result when the worker was cancelled
+
     """
 
     finished = pyqtSignal()
     error = pyqtSignal(tuple)
     result = pyqtSignal(object)
+    cancelled = pyqtSignal()
 
 
 class Worker(QRunnable):
@@ -32,6 +38,10 @@ class Worker(QRunnable):
 
     Inherits from QRunnable to handler worker thread setup, signals and wrap-up.
 
+    Worker can be cancelled with cancel(). If a CancellationToken is passed to the
+    callback function with cancel_token keyword the worker uses the same token, so
+    the function can stop its work early. Cancelled worker never emits result.
+
     Args:
         fn (function): callback function
         args: Arguments to pass to the callback function
@@ -47,6 +57,14 @@ class Worker(QRunnable):
         self.args = args
         self.kwargs = kwargs
         self.signals = WorkerSignals()
+        self.cancel_token = kwargs.get("cancel_token") or CancellationToken()
+
+    def cancel(self):
+        """
+        Cancels the worker. Work that has not started is skipped and result of a
+        running work is discarded.
+        """
+        self.cancel_token.cancel()
 
     @pyqtSlot()
     def run(self):
@@ -55,7 +73,11 @@ class Worker(QRunnable):
         """
 
         try:
+            self.cancel_token.raise_if_cancelled()
             result = self.fn(*self.args, **self.kwargs)
+            self.cancel_token.raise_if_cancelled()
+        except OperationCancelled:
+            self.signals.cancelled.emit()
         except:
             traceback.print_exc()
             exctype, value = sys.exc_info()[:2]
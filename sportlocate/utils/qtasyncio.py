@@ -0,0 +1,108 @@
+import asyncio
+
+from PyQt5.QtCore import QObject, QTimer
+
+from sportlocate.utils.apiclient import close_async_clients
+from sportlocate.utils.profiling import current_capture
+
+# How often the asyncio loop is stepped while there are running tasks (milliseconds)
+STEP_INTERVAL_MS = 5
+
+
+class AsyncioBridge(QObject):
+    """
+    Runs an asyncio event loop inside the Qt event loop.
+
+    The asyncio loop is stepped from a QTimer on the thread that owns the bridge
+    (the GUI thread), so coroutines and their result callbacks run on that thread
+    and callbacks can update controllers and emit signals directly. The timer runs
+    only while there are unfinished tasks so an idle application is not woken up.
+
+    Usage:
+        bridge = AsyncioBridge()
+        bridge.run(weather_model.get_weather_info_async("Tampere"), on_result=callback)
+    """
+
+    def __init__(self, parent=None):
+        """Init the bridge and its asyncio event loop."""
+        super().__init__(parent)
+        self._loop = asyncio.new_event_loop()
+        self._tasks = set()
+        self._timer = QTimer(self)
+        self._timer.setInterval(STEP_INTERVAL_MS)
+        self._timer.timeout.connect(self._step)
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The asyncio event loop driven by the bridge."""
+        return self._loop
+
+    def run(self, coro, on_result=None, on_error=None) -> asyncio.Task:
+        """
+        Schedules the coroutine to the asyncio loop.
+
+        Args:
+            coro (coroutine): Coroutine to run.
+            on_result (callable, optional): Called with the result of the coroutine.
+            on_error (callable, optional): Called with the exception if coroutine fails.
+                Defaults to printing the exception.
+
+        Returns:
+            asyncio.Task: Task of the coroutine. The task can be cancelled with task.cancel().
+        """
+        capture = current_capture()
+        if capture is not None:
+            # Coroutine and its callbacks belong to the interaction that is being profiled
+            coro = capture.wrap_coroutine(coro)
+            capture_task = capture.begin_task()
+            on_result = on_result and capture.wrap(on_result)
+            on_error = on_error and capture.wrap(on_error)
+        task = self._loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(
+            lambda finished_task: self._on_task_done(finished_task, on_result, on_error)
+        )
+        if capture is not None:
+            task.add_done_callback(lambda finished_task: capture_task.end())
+        if not self._timer.isActive():
+            self._timer.start()
+        return task
+
+    def close(self):
+        """Cancels the unfinished tasks, closes the HTTP sessions of the asynchronous API
+        clients used in the loop and closes the loop."""
+        if self._loop.is_closed():
+            return
+        self._timer.stop()
+        for task in self._tasks:
+            task.cancel()
+        if self._tasks:
+            self._loop.run_until_complete(
+                asyncio.gather(*self._tasks, return_exceptions=True)
+            )
+        self._loop.run_until_complete(close_async_clients())
+        # Sessions replaced by clients that moved to another loop are closed in tasks
+        pending = asyncio.all_tasks(self._loop)
+        if pending:
+            self._loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        self._loop.close()
+
+    def _step(self):
+        """Runs one iteration of the asyncio loop without blocking."""
+        self._loop.call_soon(self._loop.stop)
+        self._loop.run_forever()
+        if not self._tasks:
+            self._timer.stop()
+
+    def _on_task_done(self, task: asyncio.Task, on_result, on_error):
+        self._tasks.discard(task)
+        if task.cancelled():
+            return
+        exception = task.exception()
+        if exception is not None:
+            if on_error is not None:
+                on_error(exception)
+            else:
+                print(f"An error occurred in asynchronous task: {exception!r}")
+        elif on_result is not None:
+            on_result(task.result())
@@ -0,0 +1,396 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+# Concurrency limits of the hosts that have no configured limits
+DEFAULT_INITIAL_CONCURRENCY = 4
+DEFAULT_MAX_CONCURRENCY = 32
+# Concurrency limit is decreased when the smoothed latency grows this many times
+# higher than the lowest latency of the host, and at least by the minimum (seconds)
+LATENCY_BACKOFF_FACTOR = 2.0
+MIN_LATENCY_INCREASE = 0.05
+# Lowest latency follows the smoothed latency this slowly so that a lasting change
+# of the host (or the responses) becomes the new normal
+LOWEST_LATENCY_DRIFT = 0.01
+# Multiplicative decrease of the concurrency limit on overload
+BACKOFF_MULTIPLIER = 0.5
+# Weight of the newest response in the smoothed latency
+LATENCY_SMOOTHING = 0.2
+# Seconds to pause the host after 429 response without Retry-After header
+DEFAULT_RETRY_AFTER = 1.0
+# Seconds between the checks of a free slot in acquire_async
+ASYNC_POLL_INTERVAL = 0.01
+
+
+class RateLimiter:
+    """
+    Thread safe token bucket rate limiter.
+
+    Tokens are added to the bucket with the given rate and every request consumes
+    one token. If the bucket is empty the caller blocks until a token is available.
+    One limiter instance can be shared by any number of worker threads.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        Initialize the rate limiter.
+
+        Args:
+            rate (float): Allowed requests per second.
+            burst (int, optional): Maximum number of requests that can be done at once.
+        """
+        if rate <= 0:
+            raise ValueError(f"Rate must be positive: {rate}")
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until the request is allowed."""
+        while True:
+            wait_time = self._try_acquire()
+            if wait_time == 0:
+                return
+            time.sleep(wait_time)
+
+    async def acquire_async(self):
+        """Waits without blocking the event loop until the request is allowed."""
+        while True:
+            wait_time = self._try_acquire()
+            if wait_time == 0:
+                return
+            await asyncio.sleep(wait_time)
+
+    def try_acquire(self) -> bool:
+        """Takes a token without waiting. Returns False if the bucket is empty."""
+        return self._try_acquire() == 0
+
+    def _try_acquire(self) -> float:
+        """Takes a token if available. Returns 0 on success, otherwise seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+
+@dataclass
+class HostLimiterStats:
+    """Metrics of one host limiter."""
+
+    requests: int = 0
+    failures: int = 0
+    throttled: int = 0
+    backoffs: int = 0
+    in_flight: int = 0
+    concurrency_limit: float = 0.0
+    smoothed_latency: float = 0.0
+
+
+class RequestRecord:
+    """Outcome of one request made in HostLimiter.request."""
+
+    def __init__(self):
+        self.status = None
+        self.retry_after = None
+
+    def record(self, status: int, retry_after: str = None):
+        """
+        Records the response of the request.
+
+        Args:
+            status (int): HTTP status code of the response.
+            retry_after (str, optional): Value of the Retry-After header.
+        """
+        self.status = status
+        self.retry_after = retry_after
+
+
+class HostLimiter:
+    """
+    Limits the request rate and the concurrency of the requests to one host.
+
+    The request rate is limited with an optional RateLimiter (token bucket). The
+    count of requests in flight is limited with an AIMD (additive increase,
+    multiplicative decrease) limit: every successful response with normal latency
+    increases the limit so that it grows by about one per round trip, and 429 or
+    5xx responses, connection errors or latency growing over LATENCY_BACKOFF_FACTOR
+    times the lowest seen latency halve it. 429 responses also pause the host for
+    the Retry-After time. This way parallel fetches use as much of the host's
+    capacity as it tolerates without getting throttled.
+
+    Usage:
+        with limiter.request() as request:
+            response = requests.get(url)
+            request.record(response.status_code, response.headers.get("Retry-After"))
+    """
+
+    def __init__(
+        self,
+        rate_limiter: RateLimiter = None,
+        initial_concurrency: int = DEFAULT_INITIAL_CONCURRENCY,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        min_concurrency: int = 1,
+    ):
+        """
+        Initialize the host limiter.
+
+        Args:
+            rate_limiter (RateLimiter, optional): Token bucket of the host. None means that
+                only the concurrency is limited.
+            initial_concurrency (int, optional): Concurrency limit at the start.
+            max_concurrency (int, optional): Highest allowed concurrency limit.
+            min_concurrency (int, optional): Lowest allowed concurrency limit.
+        """
+        self.rate_limiter = rate_limiter
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self._limit = float(min(max(initial_concurrency, min_concurrency), max_concurrency))
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._lowest_latency = None
+        self._smoothed_latency = None
+        self._last_backoff = 0.0
+        self._stats = HostLimiterStats()
+        self._condition = threading.Condition()
+
+    @property
+    def concurrency_limit(self) -> int:
+        """Count of requests that may currently be in flight."""
+        return int(self._limit)
+
+    def acquire(self):
+        """Blocks until a request slot and a rate limiter token are available. The slot
+        must be given back with release."""
+        with self._condition:
+            while True:
+                wait_time = self._try_enter()
+                if wait_time == 0:
+                    break
+                self._condition.wait(wait_time)
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+
+    async def acquire_async(self):
+        """Waits without blocking the event loop until a request slot and a rate limiter
+        token are available. The slot must be given back with release."""
+        while True:
+            with self._condition:
+                wait_time = self._try_enter()
+            if wait_time == 0:
+                break
+            await asyncio.sleep(min(wait_time, ASYNC_POLL_INTERVAL))
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire_async()
+
+    def release(self, status: int | None, latency: float, retry_after: str = None):
+        """
+        Gives back the request slot and adapts the concurrency limit to the outcome.
+
+        Args:
+            status (int | None): HTTP status of the response or None if the request failed
+                without response.
+            latency (float): Seconds from the start of the request to the response.
+            retry_after (str, optional): Value of the Retry-After header of the response.
+        """
+        with self._condition:
+            self._in_flight -= 1
+            self._stats.requests += 1
+            now = time.monotonic()
+            overloaded = status is None or status == 429 or status >= 500
+            if overloaded:
+                self._stats.failures += 1
+            else:
+                self._update_latency(latency)
+                overloaded = self._smoothed_latency > max(
+                    LATENCY_BACKOFF_FACTOR * self._lowest_latency,
+                    self._lowest_latency + MIN_LATENCY_INCREASE,
+                )
+            if status == 429:
+                self._stats.throttled += 1
+                self._paused_until = max(self._paused_until, now + parse_retry_after(retry_after))
+            if overloaded:
+                # Responses of requests started before the previous backoff don't back off again
+                if now - self._last_backoff > (self._smoothed_latency or latency):
+                    self._limit = max(self.min_concurrency, self._limit * BACKOFF_MULTIPLIER)
+                    self._last_backoff = now
+                    self._stats.backoffs += 1
+            else:
+                self._limit = min(self.max_concurrency, self._limit + 1 / self._limit)
+            self._condition.notify_all()
+
+    @contextmanager
+    def request(self):
+        """Context manager that holds a request slot. Yields RequestRecord where the
+        response status is recorded. Errors without recorded status count as failures."""
+        self.acquire()
+        request = RequestRecord()
+        start = time.monotonic()
+        try:
+            yield request
+        finally:
+            self.release(request.status, time.monotonic() - start, request.retry_after)
+
+    @asynccontextmanager
+    async def request_async(self):
+        """Asynchronous variant of request."""
+        await self.acquire_async()
+        request = RequestRecord()
+        start = time.monotonic()
+        try:
+            yield request
+        except asyncio.CancelledError:
+            # Cancelled request tells nothing about the host
+            self._leave()
+            raise
+        except BaseException:
+            self.release(request.status, time.monotonic() - start, request.retry_after)
+            raise
+        self.release(request.status, time.monotonic() - start, request.retry_after)
+
+    def _leave(self):
+        """Gives back the request slot without adapting the limit."""
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def stats(self) -> HostLimiterStats:
+        """Returns copy of the limiter metrics."""
+        with self._condition:
+            return HostLimiterStats(
+                requests=self._stats.requests,
+                failures=self._stats.failures,
+                throttled=self._stats.throttled,
+                backoffs=self._stats.backoffs,
+                in_flight=self._in_flight,
+                concurrency_limit=self._limit,
+                smoothed_latency=self._smoothed_latency or 0.0,
+            )
+
+    def _try_enter(self) -> float:
+        """Takes a request slot if available. Must be called with the condition held.
+        Returns 0 on success, otherwise seconds to wait (None waits for a release)."""
+        pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            return pause
+        if self._in_flight >= int(self._limit):
+            return None
+        self._in_flight += 1
+        return 0
+
+    def _update_latency(self, latency: float):
+        if self._smoothed_latency is None:
+            self._smoothed_latency = self._lowest_latency = latency
+            return
+        self._smoothed_latency += LATENCY_SMOOTHING * (latency - self._smoothed_latency)
+        drifted = self._lowest_latency + LOWEST_LATENCY_DRIFT * (
+            self._smoothed_latency - self._lowest_latency
+        )
+        self._lowest_latency = min(drifted, latency)
+
+
+def parse_retry_after(retry_after: str | None) -> float:
+    """Returns seconds of Retry-After header value (seconds or HTTP date)."""
+    if not retry_after:
+        return DEFAULT_RETRY_AFTER
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER
+
+
+# Limiters shared by all API clients. Key is the host name of the API.
+_host_limiters: dict[str, HostLimiter] = {}
+# Limits of the hosts given with configure_host
+_host_configs: dict[str, dict] = {}
+_registry_lock = threading.Lock()
+
+
+def configure_host(
+    url: str,
+    rate: float = None,
+    burst: int = 1,
+    initial_concurrency: int = DEFAULT_INITIAL_CONCURRENCY,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+):
+    """
+    Sets the limits of the requests to the host of the url. Modules that call an API
+    configure its host when they are imported.
+
+    Args:
+        url (str): Url (or base url) of the API.
+        rate (float, optional): Allowed requests per second. None means no rate limit.
+        burst (int, optional): Maximum number of requests that can be done at once.
+        initial_concurrency (int, optional): Concurrency limit at the start.
+        max_concurrency (int, optional): Highest allowed concurrency limit.
+    """
+    host = urlparse(url).netloc
+    with _registry_lock:
+        _host_configs[host] = {
+            "rate": rate,
+            "burst": burst,
+            "initial_concurrency": initial_concurrency,
+            "max_concurrency": max_concurrency,
+        }
+        _host_limiters.pop(host, None)
+
+
+def get_host_limiter(url: str) -> HostLimiter:
+    """Returns the limiter of the url host, creating it on first use."""
+    host = urlparse(url).netloc
+    with _registry_lock:
+        limiter = _host_limiters.get(host)
+        if limiter is None:
+            limiter = _create_host_limiter(host)
+            _host_limiters[host] = limiter
+        return limiter
+
+
+def set_rate_limiter(url: str, limiter: RateLimiter | None):
+    """
+    Replaces the rate limiter used for all requests to the host of the url.
+
+    Args:
+        url (str): Url (or base url) of the API.
+        limiter (RateLimiter): Limiter to use. None restores the configured rate limit.
+    """
+    host_limiter = get_host_limiter(url)
+    if limiter is None:
+        limiter = _create_rate_limiter(_host_configs.get(urlparse(url).netloc, {}))
+    host_limiter.rate_limiter = limiter
+
+
+def get_rate_limiter(url: str) -> RateLimiter | None:
+    """Returns the rate limiter of the url host or None if request rate is not limited."""
+    return get_host_limiter(url).rate_limiter
+
+
+def _create_host_limiter(host: str) -> HostLimiter:
+    config = _host_configs.get(host, {})
+    return HostLimiter(
+        _create_rate_limiter(config),
+        initial_concurrency=config.get("initial_concurrency", DEFAULT_INITIAL_CONCURRENCY),
+        max_concurrency=config.get("max_concurrency", DEFAULT_MAX_CONCURRENCY),
+    )
+
+
+def _create_rate_limiter(config: dict) -> RateLimiter | None:
+    if config.get("rate") is None:
+        return None
+    return RateLimiter(config["rate"], config["burst"])
@@ -0,0 +1,340 @@
+from __future__ import annotations
+
+import asyncio
+import sys
+import threading
+import time
+import traceback
+
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Callable, Hashable
+
+from PyQt5.QtCore import QObject, QThreadPool
+
+from sportlocate.utils.cancellation import CancellationToken, OperationCancelled
+from sportlocate.utils.profiling import current_capture
+from sportlocate.utils.qmlworker import Worker
+from sportlocate.utils.services import get_service
+
+
+class JobLane(IntEnum):
+    """Priority lanes of the scheduler. Every lane has its own thread pool so that
+    lower priority work can never keep the interactive work waiting."""
+
+    INTERACTIVE = 0
+    PREFETCH = 1
+    BACKGROUND = 2
+    # Map tiles that the user is looking at. Tile downloads have their own pool so that
+    # they neither wait behind city prefetches nor take the threads of the venue loads.
+    TILES = 3
+
+
+# Default thread counts of the lanes
+DEFAULT_POOL_SIZES = {
+    JobLane.INTERACTIVE: 4,
+    JobLane.PREFETCH: 2,
+    JobLane.BACKGROUND: 1,
+    JobLane.TILES: 2,
+}
+
+
+@dataclass(eq=False)
+class _Subscriber:
+    """Caller waiting for the result of a job."""
+
+    cancel_token: CancellationToken
+    on_result: Callable[[Any], None] | None
+    on_error: Callable[[tuple], None] | None
+
+
+@dataclass(eq=False)
+class _Job:
+    """Job that has been submitted to the scheduler."""
+
+    key: Hashable
+    lane: JobLane
+    fn: Callable
+    cancellable: bool
+    cancel_token: CancellationToken = field(default_factory=CancellationToken)
+    subscribers: list[_Subscriber] = field(default_factory=list)
+    submitted_at: float = field(default_factory=time.monotonic)
+    started_at: float | None = None
+
+
+@dataclass
+class LaneStats:
+    """Statistics of one scheduler lane."""
+
+    queued: int = 0
+    running: int = 0
+    started: int = 0
+    completed: int = 0
+    coalesced: int = 0
+    cancelled: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    @property
+    def average_wait(self) -> float:
+        """Average seconds jobs have waited in the queue before those were started."""
+        return self.total_wait / self.started if self.started else 0.0
+
+
+class JobScheduler(QObject):
+    """
+    Runs Worker jobs in prioritized thread pools.
+
+    Jobs are submitted with a key. If a job with the same key is already queued
+    or running the caller is attached to that job instead of starting a new one
+    (single-flight), so identical requests are done only once. Every caller can
+    cancel its own interest with its cancel token and the job itself is cancelled
+    when nobody waits for it anymore.
+
+    Result callbacks are called in the thread that owns the scheduler (GUI thread).
+
+    Coroutine functions are run on the asyncio loop of the AsyncioBridge set with
+    set_async_bridge instead of the thread pool of their lane. They are coalesced,
+    cancelled and counted in the lane statistics like the other jobs, so for example
+    an asynchronous venue load and a threaded one with the same key are done once.
+    """
+
+    def __init__(self, pool_sizes: dict[JobLane, int] = None, parent=None):
+        """
+        Init the scheduler.
+
+        Args:
+            pool_sizes (dict[JobLane, int], optional): Thread counts of the lanes.
+            parent (QObject, optional): Parent object.
+        """
+        super().__init__(parent)
+        pool_sizes = {**DEFAULT_POOL_SIZES, **(pool_sizes or {})}
+        self._pools = {}
+        for lane in JobLane:
+            pool = QThreadPool(self)
+            pool.setMaxThreadCount(pool_sizes[lane])
+            self._pools[lane] = pool
+        self._in_flight: dict[Hashable, _Job] = {}
+        self._stats = {lane: LaneStats() for lane in JobLane}
+        self._lock = threading.Lock()
+        self._async_bridge = None
+
+    @property
+    def async_bridge(self):
+        """Bridge whose asyncio loop runs the coroutine jobs, or None."""
+        return self._async_bridge
+
+    def set_async_bridge(self, async_bridge):
+        """Sets the AsyncioBridge (GUI thread) that runs the coroutine jobs."""
+        self._async_bridge = async_bridge
+
+    def submit(
+        self,
+        fn: Callable,
+        *args,
+        key: Hashable = None,
+        lane: JobLane = JobLane.INTERACTIVE,
+        on_result: Callable[[Any], None] = None,
+        on_error: Callable[[tuple], None] = None,
+        cancel_token: CancellationToken = None,
+        cancellable: bool = False,
+        **kwargs,
+    ) -> CancellationToken:
+        """
+        Submits a job to the scheduler.
+
+        Args:
+            fn (Callable): Function to run in worker thread, or coroutine function to run
+                on the asyncio loop of the bridge.
+            *args: Arguments of the function.
+            key (Hashable, optional): Identity of the job. Jobs with same key are coalesced.
+                Defaults to a unique key, so the job is never coalesced.
+            lane (JobLane, optional): Priority lane of the job.
+            on_result (Callable, optional): Called with the result of the function.
+            on_error (Callable, optional): Called with the error tuple of the Worker.
+            cancel_token (CancellationToken, optional): Token to cancel this request.
+            cancellable (bool, optional): If True the job's own cancel token is passed to
+                the function with cancel_token keyword so that it can stop early.
+            **kwargs: Keyword arguments of the function.
+
+        Returns:
+            CancellationToken: Token that cancels this request.
+
+        Raises:
+            ValueError: If fn is a coroutine function and the scheduler has no bridge.
+        """
+        is_coroutine = asyncio.iscoroutinefunction(fn)
+        if is_coroutine and self._async_bridge is None:
+            raise ValueError("Coroutine jobs need an asyncio bridge, see set_async_bridge")
+        if cancel_token is None:
+            cancel_token = CancellationToken()
+        if key is None:
+            key = object()
+        capture = current_capture()
+        if capture is not None:
+            # Job and its callbacks belong to the interaction that is being profiled
+            fn, on_result, on_error = self._profile_job(
+                capture, cancel_token, fn, on_result, on_error
+            )
+        subscriber = _Subscriber(cancel_token, on_result, on_error)
+
+        with self._lock:
+            job = self._in_flight.get(key)
+            if job is not None and not job.cancel_token.is_cancelled:
+                # Identical job is already in flight, waiting for its result
+                job.subscribers.append(subscriber)
+                self._stats[job.lane].coalesced += 1
+                start_job = False
+            else:
+                job = _Job(key=key, lane=lane, fn=fn, cancellable=cancellable)
+                job.subscribers.append(subscriber)
+                self._in_flight[key] = job
+                self._stats[lane].queued += 1
+                start_job = True
+
+        cancel_token.add_callback(lambda: self._unsubscribe(job, subscriber))
+        if start_job and is_coroutine:
+            task = self._async_bridge.run(self._run_async_job(job, *args, **kwargs))
+            # Awaits of the task are interrupted, the token may be cancelled in any thread
+            job.cancel_token.add_callback(
+                lambda: self._async_bridge.loop.call_soon_threadsafe(task.cancel)
+            )
+        elif start_job:
+            worker = Worker(self._run_job, job, *args, cancel_token=job.cancel_token, **kwargs)
+            worker.signals.result.connect(lambda result: self._on_job_result(job, result))
+            worker.signals.error.connect(lambda error: self._on_job_error(job, error))
+            worker.signals.cancelled.connect(lambda: self._on_job_cancelled(job))
+            self._pools[lane].start(worker)
+        return cancel_token
+
+    def stats(self) -> dict[JobLane, LaneStats]:
+        """Returns copy of the lane statistics."""
+        with self._lock:
+            return {lane: LaneStats(**vars(stats)) for lane, stats in self._stats.items()}
+
+    def report(self) -> str:
+        """Returns queue depths and wait times of the lanes as printable string."""
+        lines = []
+        for lane, stats in self.stats().items():
+            lines.append(
+                f"{lane.name.lower()}: queued {stats.queued}, running {stats.running}, "
+                f"completed {stats.completed}, coalesced {stats.coalesced}, "
+                f"cancelled {stats.cancelled}, wait avg {stats.average_wait * 1000:.1f} ms "
+                f"max {stats.max_wait * 1000:.1f} ms"
+            )
+        return "\n".join(lines)
+
+    def wait_for_done(self, msecs: int = -1) -> bool:
+        """Waits until all lanes are idle. Returns False if timeout was reached."""
+        return all(pool.waitForDone(msecs) for pool in self._pools.values())
+
+    @staticmethod
+    def _profile_job(capture, cancel_token: CancellationToken, fn, on_result, on_error):
+        """Returns the job function and callbacks wrapped to the profiler of the capture.
+        The capture waits until a callback has been called or the job is cancelled."""
+        task = capture.begin_task()
+        cancel_token.add_callback(task.end)
+
+        def finish(callback, value):
+            try:
+                if callback is not None:
+                    capture.call(callback, value)
+            finally:
+                task.end()
+
+        return (
+            capture.wrap(fn),
+            lambda result: finish(on_result, result),
+            lambda error: finish(on_error, error),
+        )
+
+    def _run_job(self, job: _Job, *args, cancel_token: CancellationToken, **kwargs):
+        """Runs the job function in the worker thread and records the wait time."""
+        self._record_start(job)
+        if job.cancellable:
+            kwargs["cancel_token"] = cancel_token
+        return job.fn(*args, **kwargs)
+
+    async def _run_async_job(self, job: _Job, *args, **kwargs):
+        """Runs the coroutine job in the asyncio loop of the bridge (GUI thread) and calls
+        the result handlers like the Worker signals of the threaded jobs."""
+        self._record_start(job)
+        if job.cancellable:
+            kwargs["cancel_token"] = job.cancel_token
+        try:
+            job.cancel_token.raise_if_cancelled()
+            result = await job.fn(*args, **kwargs)
+            job.cancel_token.raise_if_cancelled()
+        except (OperationCancelled, asyncio.CancelledError):
+            self._on_job_cancelled(job)
+        except Exception:
+            traceback.print_exc()
+            exctype, value = sys.exc_info()[:2]
+            self._on_job_error(job, (exctype, value, traceback.format_exc()))
+        else:
+            self._on_job_result(job, result)
+
+    def _record_start(self, job: _Job):
+        """Records the wait time of the job that is started."""
+        with self._lock:
+            job.started_at = time.monotonic()
+            wait_time = job.started_at - job.submitted_at
+            stats = self._stats[job.lane]
+            stats.queued -= 1
+            stats.running += 1
+            stats.started += 1
+            stats.total_wait += wait_time
+            stats.max_wait = max(stats.max_wait, wait_time)
+
+    def _unsubscribe(self, job: _Job, subscriber: _Subscriber):
+        """Detaches cancelled subscriber and cancels the job if nobody waits for it."""
+        with self._lock:
+            if subscriber in job.subscribers:
+                job.subscribers.remove(subscriber)
+            cancel_job = not job.subscribers
+        if cancel_job:
+            job.cancel_token.cancel()
+
+    def _finish_job(self, job: _Job) -> list[_Subscriber]:
+        """Removes the job from in flight jobs and returns its active subscribers."""
+        with self._lock:
+            if self._in_flight.get(job.key) is job:
+                del self._in_flight[job.key]
+            stats = self._stats[job.lane]
+            if job.started_at is None:
+                # Job was cancelled before it was started
+                stats.queued -= 1
+            else:
+                stats.running -= 1
+            subscribers, job.subscribers = job.subscribers, []
+        return [
+            subscriber
+            for subscriber in subscribers
+            if not subscriber.cancel_token.is_cancelled
+        ]
+
+    def _on_job_result(self, job: _Job, result):
+        subscribers = self._finish_job(job)
+        with self._lock:
+            self._stats[job.lane].completed += 1
+        for subscriber in subscribers:
+            if subscriber.on_result is not None:
+                subscriber.on_result(result)
+
+    def _on_job_error(self, job: _Job, error: tuple):
+        subscribers = self._finish_job(job)
+        with self._lock:
+            self._stats[job.lane].completed += 1
+        for subscriber in subscribers:
+            if subscriber.on_error is not None:
+                subscriber.on_error(error)
+
+    def _on_job_cancelled(self, job: _Job):
+        self._finish_job(job)
+        with self._lock:
+            self._stats[job.lane].cancelled += 1
+
+
+def default_scheduler() -> JobScheduler:
+    """Returns the scheduler shared by the controllers."""
+    return get_service(JobScheduler)
@@ -0,0 +1,199 @@
+"""
+searchindex.py
+
+In-memory search index for the search-as-you-type fields.
+
+Texts are folded before indexing and searching: diacritics are removed and the
+case is folded, so "aanekoski" finds "Äänekoski" and "ALAJA" finds "Alajärvi".
+Every word of the query must match a word of the document. A query word matches
+the words that start with it (prefix matching through the sorted vocabulary).
+If no word starts with it, the words sharing enough trigrams with it are used,
+which finds misspelled words and words that contain the query ("jarvi" finds
+"Alajärvi").
+"""
+from __future__ import annotations
+
+import bisect
+import re
+import unicodedata
+
+from collections import Counter
+from typing import Hashable, Iterable
+
+# Query words shorter than this are matched only by prefix
+MIN_TRIGRAM_WORD_LENGTH = 3
+# Share of the trigrams of the query word that a similar word must contain
+MIN_TRIGRAM_SIMILARITY = 0.5
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def fold_text(text: str) -> str:
+    """Returns the text without diacritics and with folded case."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def text_words(text: str) -> list[str]:
+    """Returns the folded words of the text."""
+    return _WORD_PATTERN.findall(fold_text(text))
+
+
+def _trigrams(word: str) -> set[str]:
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+
+class SearchIndex:
+    """
+    Prefix and trigram index of short texts, for example city or venue names.
+
+    Documents are identified by keys. The documents of every word are stored as a
+    bit mask of the document numbers, so the results of the query words are
+    combined with integer operations and come out in the order the documents were
+    added. Results are ranked so that documents whose first word starts with the
+    query come first, then other prefix matches and last the trigram matches.
+
+    Usage:
+        index = SearchIndex()
+        index.add(1, "Äänekoski")
+        index.search("aane")  # [1]
+    """
+
+    def __init__(self, documents: Iterable[tuple[Hashable, str]] = ()):
+        """
+        Init the index.
+
+        Args:
+            documents (Iterable[tuple[Hashable, str]], optional): Keys and texts to add.
+        """
+        self._keys: list[Hashable] = []
+        self._numbers: dict[Hashable, int] = {}
+        # Word -> mask of the documents that contain it / start with it
+        self._postings: dict[str, int] = {}
+        self._first_word_postings: dict[str, int] = {}
+        self._with_first_word = 0
+        # Sorted vocabularies, built on the first search after changes, and trigram
+        # index of the vocabulary, built on the first trigram search after changes
+        self._words: list[str] = None
+        self._first_words: list[str] = None
+        self._word_trigrams: dict[str, set[str]] = None
+        for key, text in documents:
+            self.add(key, text)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, key: Hashable, *texts: str):
+        """Adds the texts to the document of the key."""
+        number = self._numbers.get(key)
+        if number is None:
+            number = self._numbers[key] = len(self._keys)
+            self._keys.append(key)
+        bit = 1 << number
+        words = [word for text in texts if text for word in text_words(text)]
+        if words and not self._with_first_word & bit:
+            self._first_word_postings[words[0]] = self._first_word_postings.get(words[0], 0) | bit
+            self._with_first_word |= bit
+        postings = self._postings
+        for word in words:
+            postings[word] = postings.get(word, 0) | bit
+        self._words = None
+        self._word_trigrams = None
+
+    def clear(self):
+        """Removes all documents."""
+        self._keys = []
+        self._numbers = {}
+        self._postings = {}
+        self._first_word_postings = {}
+        self._with_first_word = 0
+        self._words = None
+        self._first_words = None
+        self._word_trigrams = None
+
+    def matches(self, query: str) -> set:
+        """Returns keys of the documents that match every word of the query. An empty
+        query matches all documents."""
+        mask, _ = self._match(text_words(query))
+        keys = self._keys
+        # Set bits from the lowest, through the binary string which is faster than shifting
+        return {keys[i] for i, bit in enumerate(reversed(bin(mask)[2:])) if bit == "1"}
+
+    def search(self, query: str, limit: int = None) -> list:
+        """
+        Returns keys of the documents that match the query, best matches first.
+
+        Args:
+            query (str): Search text.
+            limit (int, optional): Maximum count of the returned keys.
+
+        Returns:
+            list: Matching keys.
+        """
+        query_words = text_words(query)
+        mask, fuzzy = self._match(query_words)
+        if not query_words:
+            return self._take(mask, limit, [])
+        prefix = mask & ~fuzzy
+        leading = prefix & self._prefix_mask(self._first_words, self._first_word_postings, query_words[0])
+        results = []
+        for bucket in (leading, prefix & ~leading, fuzzy):
+            self._take(bucket, limit, results)
+        return results
+
+    def _take(self, mask: int, limit: int | None, results: list) -> list:
+        """Appends the keys of the mask to the results until it has limit keys."""
+        keys = self._keys
+        while mask and (limit is None or len(results) < limit):
+            lowest = mask & -mask
+            results.append(keys[lowest.bit_length() - 1])
+            mask ^= lowest
+        return results
+
+    def _match(self, query_words: list[str]) -> tuple[int, int]:
+        """Returns mask of the matching documents and mask of the documents that matched
+        some word only by trigrams."""
+        if not query_words:
+            return (1 << len(self._keys)) - 1, 0
+        if self._words is None:
+            self._build_vocabulary()
+        mask = -1
+        fuzzy = 0
+        for query_word in query_words:
+            word_mask = self._prefix_mask(self._words, self._postings, query_word)
+            if not word_mask and len(query_word) >= MIN_TRIGRAM_WORD_LENGTH:
+                for word in self._similar_words(query_word):
+                    word_mask |= self._postings[word]
+                fuzzy |= word_mask
+            mask &= word_mask
+            if not mask:
+                return 0, 0
+        return mask, fuzzy & mask
+
+    @staticmethod
+    def _prefix_mask(words: list[str], postings: dict[str, int], prefix: str) -> int:
+        """Returns mask of the documents of the sorted words that start with the prefix."""
+        mask = 0
+        i = bisect.bisect_left(words, prefix)
+        while i < len(words) and words[i].startswith(prefix):
+            mask |= postings[words[i]]
+            i += 1
+        return mask
+
+    def _build_vocabulary(self):
+        self._words = sorted(self._postings)
+        self._first_words = sorted(self._first_word_postings)
+
+    def _similar_words(self, query_word: str) -> list[str]:
+        """Returns the words that contain enough of the trigrams of the query word."""
+        if self._word_trigrams is None:
+            self._word_trigrams = {}
+            for word in self._words:
+                for trigram in _trigrams(word):
+                    self._word_trigrams.setdefault(trigram, set()).add(word)
+        query_trigrams = _trigrams(query_word)
+        shared = Counter()
+        for trigram in query_trigrams:
+            shared.update(self._word_trigrams.get(trigram, ()))
+        required = MIN_TRIGRAM_SIMILARITY * len(query_trigrams)
+        return [word for word, count in shared.items() if count >= required]
@@ -0,0 +1,133 @@
+"""
+services.py
+
+Registry of the services shared by the application: the models (VenueModel,
+SportVenueCategoryModel, WeatherModel, CityModel and PreferencesModel), the
+venue count index, the job scheduler and the preferences store. The models are
+plain classes, and the instances shared by the application are obtained with
+get_service, so for example the venue cache of VenueModel and the categories
+fetched by SportVenueCategoryModel exist once.
+
+Every service is constructed once, on first use, with its registered factory or
+by calling its class without arguments. Construction is thread safe, so
+controllers in the GUI thread and jobs in worker threads get the same instance,
+and a service that needs other services (for example VenueModel needs
+SportVenueCategoryModel and CityModel) gets them from the registry while it is
+constructed. Constructions are recorded to the startup trace.
+
+Usage:
+    venue_model = get_service(VenueModel)
+
+Tests start every test with fresh services with reset_services(), and can
+replace a service with set_service().
+"""
+from __future__ import annotations
+
+import threading
+import time
+
+from typing import Any, Callable, TypeVar
+
+from sportlocate.utils.startuptrace import record_service
+
+T = TypeVar("T")
+
+
+class ServiceRegistry:
+    """
+    Lazily constructed shared instances of the services, keyed by class.
+
+    Usage:
+        registry = ServiceRegistry()
+        registry.register(VenueModel, lambda: VenueModel("sport"))
+        registry.get(VenueModel) is registry.get(VenueModel)  # True
+    """
+
+    def __init__(self):
+        """Init the registry."""
+        self._factories: dict[type, Callable[[], Any]] = {}
+        self._instances: dict[type, Any] = {}
+        # Reentrant so that a factory can get the services it needs. One lock for all
+        # services, because a lock per service could deadlock on services that are
+        # constructed in different order in different threads.
+        self._lock = threading.RLock()
+        # Services being constructed, to report dependency cycles
+        self._constructing: list[type] = []
+
+    def register(self, service: type, factory: Callable[[], Any]):
+        """Sets the function that constructs the service. An existing instance is dropped."""
+        with self._lock:
+            self._factories[service] = factory
+            self._instances.pop(service, None)
+
+    def set(self, service: type[T], instance: T):
+        """Replaces the shared instance of the service, for example with a test double."""
+        with self._lock:
+            self._instances[service] = instance
+
+    def get(self, service: type[T]) -> T:
+        """
+        Returns the shared instance of the service, constructed on first use.
+
+        Args:
+            service (type): Class of the service.
+
+        Returns:
+            The shared instance.
+
+        Raises:
+            RuntimeError: If the service needs itself while it is constructed.
+        """
+        # Constructed services are returned without locking
+        instance = self._instances.get(service)
+        if instance is not None:
+            return instance
+        with self._lock:
+            instance = self._instances.get(service)
+            if instance is not None:
+                return instance
+            if service in self._constructing:
+                cycle = " -> ".join(cls.__name__ for cls in [*self._constructing, service])
+                raise RuntimeError(f"Service dependency cycle: {cycle}")
+            self._constructing.append(service)
+            start = time.perf_counter()
+            try:
+                instance = self._factories.get(service, service)()
+            finally:
+                self._constructing.pop()
+            self._instances[service] = instance
+        record_service(service.__name__, time.perf_counter() - start)
+        return instance
+
+    def is_created(self, service: type) -> bool:
+        """Returns True if the shared instance of the service exists."""
+        return service in self._instances
+
+    def reset(self):
+        """Drops the shared instances, so services are constructed again on next use.
+        Registered factories are kept."""
+        with self._lock:
+            self._instances.clear()
+
+
+_registry = ServiceRegistry()
+
+
+def get_service(service: type[T]) -> T:
+    """Returns the instance of the service shared by the application."""
+    return _registry.get(service)
+
+
+def register_service(service: type, factory: Callable[[], Any]):
+    """Sets the function that constructs the shared instance of the service."""
+    _registry.register(service, factory)
+
+
+def set_service(service: type[T], instance: T):
+    """Replaces the shared instance of the service."""
+    _registry.set(service, instance)
+
+
+def reset_services():
+    """Drops the shared instances of all services."""
+    _registry.reset()
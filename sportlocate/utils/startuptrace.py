@@ -0,0 +1,128 @@
+"""
+startuptrace.py
+
+Trace of the shared service constructions and the upstream API calls.
+
+With the trace it can be checked that every service is constructed once and
+that no upstream resource (like the LIPAS categories) is requested more than
+once while the application starts. Calls that were made several times are
+listed first in the report.
+
+The trace is enabled with the SPORTLOCATE_TRACE_STARTUP environment variable
+and the report is printed when the application exits:
+    SPORTLOCATE_TRACE_STARTUP=1 python sportlocate
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+
+from collections import Counter
+from urllib.parse import urlencode
+
+# Environment variable that enables the trace in the application
+TRACE_ENV_VARIABLE = "SPORTLOCATE_TRACE_STARTUP"
+# Maximum count of the upstream calls listed in the report
+REPORT_CALLS = 30
+
+
+class StartupTrace:
+    """
+    Records the service constructions and upstream calls from its creation.
+
+    Usage:
+        trace = start_trace()
+        ...
+        print(trace.report())
+    """
+
+    def __init__(self):
+        """Init the trace."""
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        # (service name, seconds since start, construction seconds)
+        self._services: list[tuple[str, float, float]] = []
+        self._upstream_calls: Counter[str] = Counter()
+
+    @property
+    def services(self) -> list[str]:
+        """Names of the constructed services in construction order."""
+        with self._lock:
+            return [name for name, _, _ in self._services]
+
+    @property
+    def upstream_calls(self) -> dict[str, int]:
+        """Counts of the upstream calls by URL."""
+        with self._lock:
+            return dict(self._upstream_calls)
+
+    def record_service(self, name: str, seconds: float):
+        """Records construction of a shared service."""
+        with self._lock:
+            self._services.append((name, time.perf_counter() - self._start, seconds))
+
+    def record_upstream_call(self, url: str):
+        """Records a request to an upstream API."""
+        with self._lock:
+            self._upstream_calls[url] += 1
+
+    def report(self) -> str:
+        """Returns the trace as text."""
+        with self._lock:
+            services = list(self._services)
+            calls = self._upstream_calls.most_common()
+        repeated = sum(1 for _, count in calls if count > 1)
+        lines = [f"Startup trace, {time.perf_counter() - self._start:.1f} s:"]
+        lines.append(f"  {len(services)} services constructed")
+        for name, at, seconds in services:
+            lines.append(f"    {at * 1000:8.0f} ms  {name} ({seconds * 1000:.0f} ms)")
+        lines.append(
+            f"  {sum(count for _, count in calls)} upstream calls to {len(calls)} URLs, "
+            f"{repeated} called more than once"
+        )
+        for url, count in calls[:REPORT_CALLS]:
+            lines.append(f"    {count:4}x  {url}")
+        if len(calls) > REPORT_CALLS:
+            lines.append(f"    ... {len(calls) - REPORT_CALLS} more URLs called once")
+        return "\n".join(lines)
+
+
+_trace: StartupTrace | None = None
+
+
+def start_trace() -> StartupTrace:
+    """Starts recording to a new trace and returns it."""
+    global _trace
+    _trace = StartupTrace()
+    return _trace
+
+
+def stop_trace():
+    """Stops recording."""
+    global _trace
+    _trace = None
+
+
+def trace_from_environment() -> StartupTrace | None:
+    """Returns started trace if SPORTLOCATE_TRACE_STARTUP is set, otherwise None."""
+    if not os.environ.get(TRACE_ENV_VARIABLE):
+        return None
+    return start_trace()
+
+
+def record_service(name: str, seconds: float):
+    """Records construction of a shared service if the trace is on."""
+    trace = _trace
+    if trace is not None:
+        trace.record_service(name, seconds)
+
+
+def record_upstream_call(url: str, params: dict = None):
+    """Records a request to an upstream API if the trace is on. Query parameters are
+    added to the URL, so requests of different cities are told apart."""
+    trace = _trace
+    if trace is not None:
+        if params:
+            url = f"{url}{'&' if '?' in url else '?'}{urlencode(params, doseq=True)}"
+        trace.record_upstream_call(url)
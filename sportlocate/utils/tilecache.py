@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+
+from pathlib import Path
+
+import requests
+
+from sportlocate.utils.paths import cache_dir
+from sportlocate.utils.ratelimiter import configure_host, get_host_limiter
+
+# Network tile source. OpenStreetMap tile usage policy requires an identifying user agent.
+TILE_SERVER_URL = "https://tile.openstreetmap.org/{z}/{x}/{y}.png"
+TILE_USER_AGENT = "Sportlocate/1.0 (desktop application)"
+TILE_ATTRIBUTION = "&copy; OpenStreetMap contributors"
+TILE_REQUEST_TIMEOUT = 10
+# The policy also allows at most two parallel downloads
+configure_host(TILE_SERVER_URL, initial_concurrency=2, max_concurrency=2)
+
+# Maximum size of the downloaded tiles on disk (bytes)
+DEFAULT_MAX_CACHE_BYTES = 200 * 1024 * 1024
+
+# Tiles that are shipped with the application are read from this file if it exists
+BUNDLED_MBTILES = Path(__file__).resolve().parent.parent / "data" / "tiles.mbtiles"
+
+
+def tile_mime_type(data: bytes) -> bytes:
+    """Returns mime type of the tile image data."""
+    if data.startswith(b"\x89PNG"):
+        return b"image/png"
+    if data.startswith(b"\xff\xd8"):
+        return b"image/jpeg"
+    if data[8:12] == b"WEBP":
+        return b"image/webp"
+    return b"application/octet-stream"
+
+
+class MBTilesSource:
+    """Read only tile source of an MBTiles file (SQLite database of map tiles).
+
+    MBTiles stores the rows in TMS order, so the y coordinate is flipped when reading.
+    """
+
+    def __init__(self, path: Path):
+        """
+        Init the source.
+
+        Args:
+            path (Path): Path of the MBTiles file.
+        """
+        self._path = Path(path)
+        self._connection = sqlite3.connect(
+            f"file:{self._path}?mode=ro", uri=True, check_same_thread=False
+        )
+        self._lock = threading.Lock()
+
+    def get(self, z: int, x: int, y: int) -> bytes | None:
+        """Returns the tile or None if the file doesn't contain it."""
+        tms_y = (1 << z) - 1 - y
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT tile_data FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?",
+                (z, x, tms_y),
+            ).fetchone()
+        return None if row is None else bytes(row[0])
+
+    def close(self):
+        """Closes the file."""
+        with self._lock:
+            self._connection.close()
+
+
+class TileCache:
+    """
+    Map tiles for the map view from bundled MBTiles files, the disk cache or the network.
+
+    Tiles downloaded from the tile server are stored to a SQLite database in the
+    cache directory. When the total size of the stored tiles exceeds max_bytes the
+    least recently used tiles are evicted. Once the tiles of an area are cached the
+    map of the area can be shown without network.
+
+    Lookups are made from the GUI thread, so they never write nor wait for the
+    writes: every thread reads with its own read only connection of the database in
+    WAL mode, and the access times of the hits are kept in memory and written in the
+    transaction of the next put, before the eviction, or when the cache is closed.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_MAX_CACHE_BYTES,
+        sources: list[MBTilesSource] = None,
+        tile_server_url: str = TILE_SERVER_URL,
+    ):
+        """
+        Init the tile cache.
+
+        Args:
+            max_bytes (int, optional): Maximum size of the cached tiles.
+            sources (list[MBTilesSource], optional): Tile sources that are used before the
+                disk cache. Defaults to the bundled MBTiles file if it exists.
+            tile_server_url (str, optional): URL template of the tile server.
+        """
+        if sources is None:
+            sources = [MBTilesSource(BUNDLED_MBTILES)] if BUNDLED_MBTILES.exists() else []
+        self._sources = sources
+        self._max_bytes = max_bytes
+        self._tile_server_url = tile_server_url
+        self._session = requests.Session()
+        self._session.headers["User-Agent"] = TILE_USER_AGENT
+        # Lock of the write connection, held by put and eviction
+        self._lock = threading.Lock()
+        self._connection = None
+        self._size = 0
+        # Read connections of the threads, and the access times of the hits that are
+        # not written yet, (z, x, y) -> time. The lock is never held during a query.
+        self._readers = threading.local()
+        self._read_connections: list[sqlite3.Connection] = []
+        self._accessed: dict[tuple[int, int, int], float] = {}
+        self._access_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def path(self) -> Path:
+        """Path of the tile database."""
+        return cache_dir() / "tiles.sqlite"
+
+    @property
+    def size(self) -> int:
+        """Total size of the cached tiles in bytes."""
+        with self._lock:
+            self._get_connection()
+            return self._size
+
+    def get_cached(self, z: int, x: int, y: int) -> bytes | None:
+        """Returns the tile from the bundled sources or the disk cache without using network.
+
+        Returns:
+            bytes | None: Tile image data or None if the tile is not available locally.
+        """
+        for source in self._sources:
+            data = source.get(z, x, y)
+            if data is not None:
+                self.hits += 1
+                return data
+        row = self._read_connection().execute(
+            "SELECT data FROM tiles WHERE z=? AND x=? AND y=?", (z, x, y)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        with self._access_lock:
+            self._accessed[(z, x, y)] = time.time()
+        self.hits += 1
+        return bytes(row[0])
+
+    def get(self, z: int, x: int, y: int) -> bytes:
+        """Returns the tile from local sources or downloads it from the tile server.
+
+        Raises:
+            requests.RequestException: If the tile cannot be downloaded.
+        """
+        data = self.get_cached(z, x, y)
+        if data is None:
+            data = self._download(z, x, y)
+            self.put(z, x, y, data)
+        return data
+
+    def put(self, z: int, x: int, y: int, data: bytes):
+        """Stores the tile to the disk cache and evicts least recently used tiles if needed."""
+        with self._lock:
+            connection = self._get_connection()
+            old_row = connection.execute(
+                "SELECT size FROM tiles WHERE z=? AND x=? AND y=?", (z, x, y)
+            ).fetchone()
+            connection.execute(
+                "INSERT OR REPLACE INTO tiles (z, x, y, data, size, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (z, x, y, sqlite3.Binary(data), len(data), time.time()),
+            )
+            self._size += len(data) - (old_row[0] if old_row else 0)
+            self._write_access_times(connection)
+            self._evict(connection)
+            connection.commit()
+
+    def close(self):
+        """Writes the pending access times and closes the database and the tile sources."""
+        with self._access_lock:
+            read_connections, self._read_connections = self._read_connections, []
+            self._readers = threading.local()
+        for connection in read_connections:
+            connection.close()
+        with self._lock:
+            if self._connection is not None:
+                self._write_access_times(self._connection)
+                self._connection.commit()
+                self._connection.close()
+                self._connection = None
+        for source in self._sources:
+            source.close()
+
+    def _download(self, z: int, x: int, y: int) -> bytes:
+        url = self._tile_server_url.format(z=z, x=x, y=y)
+        with get_host_limiter(url).request() as request:
+            response = self._session.get(url, timeout=TILE_REQUEST_TIMEOUT)
+            request.record(response.status_code, response.headers.get("Retry-After"))
+        response.raise_for_status()
+        return response.content
+
+    def _write_access_times(self, connection: sqlite3.Connection):
+        """Writes the access times of the hits since the last write. Must be called with
+        the lock held, and is committed with the rest of the transaction."""
+        with self._access_lock:
+            accessed, self._accessed = self._accessed, {}
+        connection.executemany(
+            "UPDATE tiles SET last_access=? WHERE z=? AND x=? AND y=?",
+            [(accessed_at, z, x, y) for (z, x, y), accessed_at in accessed.items()],
+        )
+
+    def _evict(self, connection: sqlite3.Connection):
+        """Deletes least recently used tiles until the cache fits to max_bytes."""
+        while self._size > self._max_bytes:
+            rows = connection.execute(
+                "SELECT z, x, y, size FROM tiles ORDER BY last_access LIMIT 64"
+            ).fetchall()
+            if not rows:
+                break
+            for z, x, y, size in rows:
+                if self._size <= self._max_bytes:
+                    break
+                connection.execute("DELETE FROM tiles WHERE z=? AND x=? AND y=?", (z, x, y))
+                self._size -= size
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """Opens the tile database on first use. Must be called with the lock held."""
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            # Readers don't block the writer nor wait for it in WAL mode
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS tiles (z INTEGER, x INTEGER, y INTEGER, data BLOB, "
+                "size INTEGER, last_access REAL, PRIMARY KEY (z, x, y))"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS tiles_last_access ON tiles (last_access)"
+            )
+            self._size = self._connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM tiles"
+            ).fetchone()[0]
+        return self._connection
+
+    def _read_connection(self) -> sqlite3.Connection:
+        """Returns the read only connection of the current thread, opened on first use."""
+        connection = getattr(self._readers, "connection", None)
+        if connection is None:
+            # Database is created by the write connection
+            with self._lock:
+                self._get_connection()
+            connection = sqlite3.connect(
+                f"file:{self.path}?mode=ro", uri=True, check_same_thread=False
+            )
+            with self._access_lock:
+                self._read_connections.append(connection)
+                self._readers.connection = connection
+        return connection
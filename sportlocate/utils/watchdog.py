@@ -0,0 +1,223 @@
+"""
+watchdog.py
+
+Watchdog that measures the latency of the Qt event loop of the GUI thread.
+
+A heartbeat timer runs in the GUI thread and a monitor thread checks that the
+heartbeats keep coming. When the GUI thread is blocked longer than the threshold
+the monitor captures the Python stack of the GUI thread, so the slot or signal
+handler that blocks it (for example a heavy _draw_map or write_to_disk) is
+known. Stalls are collected to a report grouped by the blocking function.
+
+The watchdog is enabled with the SPORTLOCATE_WATCHDOG_MS environment variable,
+whose value is the stall threshold in milliseconds:
+    SPORTLOCATE_WATCHDOG_MS=100 python sportlocate
+"""
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+import traceback
+
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from PyQt5.QtCore import QObject, QTimer
+
+# Stalls longer than this are recorded (milliseconds)
+DEFAULT_THRESHOLD_MS = 100
+# Interval of the heartbeats (milliseconds). Stalls are measured with this accuracy.
+HEARTBEAT_INTERVAL_MS = 20
+# Environment variable that enables the watchdog in the application
+WATCHDOG_ENV_VARIABLE = "SPORTLOCATE_WATCHDOG_MS"
+
+# Frames of these files are not reported as the location of the stall
+_PACKAGE_DIR = Path(__file__).resolve().parent.parent
+_IGNORED_FILES = {str(Path(__file__).resolve())}
+
+
+@dataclass
+class StallRecord:
+    """One stall of the event loop."""
+
+    duration: float
+    # Function that was running when the stall was detected, "function (file:line)"
+    location: str
+    stack: list[str] = field(default_factory=list)
+
+
+@dataclass
+class StallGroup:
+    """Stalls of one location."""
+
+    location: str
+    count: int = 0
+    total: float = 0.0
+    worst: StallRecord = None
+
+
+class EventLoopWatchdog(QObject):
+    """
+    Detects stalls of the event loop of the thread that owns the watchdog.
+
+    Usage:
+        watchdog = EventLoopWatchdog(threshold_ms=100)
+        watchdog.start()
+        ...
+        print(watchdog.report())
+    """
+
+    def __init__(
+        self,
+        threshold_ms: float = DEFAULT_THRESHOLD_MS,
+        interval_ms: int = HEARTBEAT_INTERVAL_MS,
+        print_stalls: bool = False,
+        parent=None,
+    ):
+        """
+        Init the watchdog.
+
+        Args:
+            threshold_ms (float, optional): Stalls longer than this are recorded.
+            interval_ms (int, optional): Interval of the heartbeats.
+            print_stalls (bool, optional): If True every stall is printed when it ends.
+            parent (QObject, optional): Parent object.
+        """
+        super().__init__(parent)
+        self._threshold = threshold_ms / 1000
+        self._interval = interval_ms / 1000
+        self._print_stalls = print_stalls
+        self._timer = QTimer(self)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self._on_heartbeat)
+        self._thread_id = None
+        self._monitor = None
+        self._running = threading.Event()
+        self._lock = threading.Lock()
+        self._last_beat = 0.0
+        # Stack captured by the monitor during the stall that is going on
+        self._pending_stack = None
+        self._stalls: list[StallRecord] = []
+
+    def start(self):
+        """Starts the watchdog. Must be called in the thread whose event loop is watched."""
+        if self._running.is_set():
+            return
+        self._thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._running.set()
+        self._timer.start()
+        self._monitor = threading.Thread(
+            target=self._monitor_loop, name="EventLoopWatchdog", daemon=True
+        )
+        self._monitor.start()
+
+    def stop(self):
+        """Stops the watchdog. Recorded stalls are kept."""
+        self._running.clear()
+        self._timer.stop()
+        if self._monitor is not None:
+            self._monitor.join()
+            self._monitor = None
+
+    def stalls(self) -> list[StallRecord]:
+        """Returns the recorded stalls in the order they happened."""
+        with self._lock:
+            return list(self._stalls)
+
+    def groups(self) -> list[StallGroup]:
+        """Returns the stalls grouped by location, the longest total stall time first."""
+        groups: dict[str, StallGroup] = {}
+        for stall in self.stalls():
+            group = groups.setdefault(stall.location, StallGroup(stall.location))
+            group.count += 1
+            group.total += stall.duration
+            if group.worst is None or stall.duration > group.worst.duration:
+                group.worst = stall
+        return sorted(groups.values(), key=lambda group: group.total, reverse=True)
+
+    def report(self) -> str:
+        """Returns stall counts and durations per location and the stack of the worst
+        stall of every location as a printable string."""
+        stalls = self.stalls()
+        if not stalls:
+            return f"No event loop stalls over {self._threshold * 1000:.0f} ms."
+        lines = [
+            f"Event loop stalls over {self._threshold * 1000:.0f} ms: {len(stalls)}, "
+            f"total {sum(stall.duration for stall in stalls) * 1000:.0f} ms, "
+            f"worst {max(stall.duration for stall in stalls) * 1000:.0f} ms"
+        ]
+        for group in self.groups():
+            lines.append(
+                f"  {group.count} x {group.location}: total {group.total * 1000:.0f} ms, "
+                f"worst {group.worst.duration * 1000:.0f} ms"
+            )
+            lines.extend("      " + line for line in group.worst.stack)
+        return "\n".join(lines)
+
+    def _on_heartbeat(self):
+        """Measures the time since the previous heartbeat in the watched thread."""
+        now = time.monotonic()
+        with self._lock:
+            stall_duration = now - self._last_beat - self._interval
+            self._last_beat = now
+            stack, self._pending_stack = self._pending_stack, None
+            if stall_duration < self._threshold:
+                return
+            if stack is None:
+                # Monitor didn't wake up during the stall, the stall is reported without stack
+                stack = []
+            stall = StallRecord(stall_duration, self._stall_location(stack), _format_stack(stack))
+            self._stalls.append(stall)
+        if self._print_stalls:
+            print(f"Event loop stalled {stall_duration * 1000:.0f} ms in {stall.location}")
+
+    def _monitor_loop(self):
+        """Captures the stack of the watched thread when its heartbeat is late."""
+        while self._running.is_set():
+            time.sleep(self._interval)
+            with self._lock:
+                late = time.monotonic() - self._last_beat - self._interval
+                if late < self._threshold or self._pending_stack is not None:
+                    continue
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            stack = traceback.extract_stack(frame)
+            del frame
+            with self._lock:
+                self._pending_stack = stack
+
+    @staticmethod
+    def _stall_location(stack: traceback.StackSummary) -> str:
+        """Returns the innermost function of the application in the stack, or the innermost
+        function if none of the frames are in the application."""
+        frames = [frame for frame in stack if frame.filename not in _IGNORED_FILES]
+        if not frames:
+            return "unknown"
+        location = frames[-1]
+        for frame in reversed(frames):
+            if frame.filename.startswith(str(_PACKAGE_DIR)):
+                location = frame
+                break
+        return f"{location.name} ({Path(location.filename).name}:{location.lineno})"
+
+
+def _format_stack(stack: traceback.StackSummary) -> list[str]:
+    return [
+        f"{Path(frame.filename).name}:{frame.lineno} {frame.name}"
+        for frame in stack
+        if frame.filename not in _IGNORED_FILES
+    ]
+
+
+def watchdog_from_environment(parent=None) -> EventLoopWatchdog | None:
+    """Returns started watchdog if SPORTLOCATE_WATCHDOG_MS is set, otherwise None."""
+    threshold = os.environ.get(WATCHDOG_ENV_VARIABLE)
+    if not threshold:
+        return None
+    watchdog = EventLoopWatchdog(float(threshold), print_stalls=True, parent=parent)
+    watchdog.start()
+    return watchdog
@@ -0,0 +1,215 @@
+"""
+webassets.py
+
+Local mirror of the JavaScript and CSS libraries of the map documents.
+
+Folium pages load Leaflet, jQuery, Bootstrap and awesome-markers from CDNs. With
+localize_assets the map document refers to them as
+sportlocate://assets/{host}/{path} instead, and AppSchemeHandler serves the files
+from AssetStore: first from the assets bundled with the application
+(sportlocate/data/assets), then from the asset cache in the cache directory. A
+file that is in neither is downloaded from its CDN once and cached, so the map of
+a cached area can be shown without network. Relative references of the style
+sheets (fonts and images) resolve to the same mirror.
+
+The bundled assets are downloaded for a release with:
+    python -m sportlocate.utils.webassets
+"""
+from __future__ import annotations
+
+import os
+import posixpath
+import re
+import tempfile
+
+from pathlib import Path, PurePosixPath
+from urllib.parse import urljoin, urlsplit
+
+import folium
+import requests
+
+from sportlocate.utils.paths import cache_dir
+from sportlocate.utils.tilecache import TILE_USER_AGENT
+
+# Url of the mirrored files. Files are served by AppSchemeHandler.
+ASSET_URL = "sportlocate://assets/{host}{path}"
+
+# CDN hosts of the folium libraries that are mirrored
+ASSET_HOSTS = (
+    "cdn.jsdelivr.net",
+    "code.jquery.com",
+    "cdnjs.cloudflare.com",
+    "netdna.bootstrapcdn.com",
+)
+ASSET_REQUEST_TIMEOUT = 10
+
+# Assets that are shipped with the application
+BUNDLED_ASSETS = Path(__file__).resolve().parent.parent / "data" / "assets"
+
+_MIME_TYPES = {
+    ".js": b"text/javascript",
+    ".css": b"text/css",
+    ".png": b"image/png",
+    ".svg": b"image/svg+xml",
+    ".woff2": b"font/woff2",
+    ".woff": b"font/woff",
+    ".ttf": b"font/ttf",
+    ".eot": b"application/vnd.ms-fontobject",
+}
+
+# url(...) references of the style sheets
+_CSS_URL = re.compile(r"""url\(\s*['"]?([^'")]+?)['"]?\s*\)""")
+
+
+def asset_mime_type(path: str) -> bytes:
+    """Returns mime type of the asset file by its suffix."""
+    return _MIME_TYPES.get(PurePosixPath(path).suffix.lower(), b"application/octet-stream")
+
+
+def local_asset_url(url: str) -> str:
+    """Returns the sportlocate://assets url of the CDN url. Urls of other hosts are
+    returned as they are."""
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or parts.netloc not in ASSET_HOSTS:
+        return url
+    return ASSET_URL.format(host=parts.netloc, path=parts.path)
+
+
+def localize_assets(element):
+    """Points the JavaScript and CSS links of the folium element and its children to
+    the local mirror. Must be called before the element is rendered."""
+    for attribute in ("default_js", "default_css"):
+        links = getattr(element, attribute, None)
+        if links:
+            setattr(element, attribute, [(name, local_asset_url(url)) for name, url in links])
+    for child in element._children.values():
+        localize_assets(child)
+
+
+def asset_file_path(path: str) -> PurePosixPath:
+    """
+    Returns the relative file path of the asset url path "/{host}/{path}".
+
+    Raises:
+        ValueError: If the path is not under a mirrored host.
+    """
+    host, _, file_path = posixpath.normpath("/" + path.lstrip("/")).lstrip("/").partition("/")
+    if host not in ASSET_HOSTS or not file_path:
+        raise ValueError(f"Not a mirrored asset: {path}")
+    return PurePosixPath(host, file_path)
+
+
+class AssetStore:
+    """
+    Files of the map libraries for the map view, see the module documentation.
+
+    Usage:
+        store = AssetStore()
+        mime_type, data = store.get("/cdn.jsdelivr.net/npm/leaflet@1.9.3/dist/leaflet.js")
+    """
+
+    def __init__(self, bundled_dir: Path = BUNDLED_ASSETS):
+        """
+        Init the store.
+
+        Args:
+            bundled_dir (Path, optional): Directory of the bundled assets.
+        """
+        self._bundled_dir = Path(bundled_dir)
+        self._session = requests.Session()
+        self._session.headers["User-Agent"] = TILE_USER_AGENT
+
+    @property
+    def path(self) -> Path:
+        """Directory of the downloaded assets."""
+        return cache_dir() / "assets"
+
+    def get_cached(self, path: str) -> tuple[bytes, bytes] | None:
+        """Returns mime type and content of the bundled or cached asset without using
+        network, or None if the asset is not available locally.
+
+        Raises:
+            ValueError: If the path is not under a mirrored host.
+        """
+        file_path = asset_file_path(path)
+        for directory in (self._bundled_dir, self.path):
+            asset_file = directory / file_path
+            if asset_file.is_file():
+                return asset_mime_type(path), asset_file.read_bytes()
+        return None
+
+    def get(self, path: str) -> tuple[bytes, bytes]:
+        """Returns mime type and content of the asset, downloaded and cached if needed.
+
+        Raises:
+            ValueError: If the path is not under a mirrored host.
+            requests.RequestException: If the asset cannot be downloaded.
+        """
+        asset = self.get_cached(path)
+        if asset is None:
+            file_path = asset_file_path(path)
+            data = self._download(file_path)
+            _atomic_write_bytes(self.path / file_path, data)
+            asset = (asset_mime_type(path), data)
+        return asset
+
+    def _download(self, file_path: PurePosixPath) -> bytes:
+        response = self._session.get(f"https://{file_path}", timeout=ASSET_REQUEST_TIMEOUT)
+        response.raise_for_status()
+        return response.content
+
+
+def _atomic_write_bytes(path: Path, data: bytes):
+    """Writes the file so that readers never see a half written file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def download_assets(target_dir: Path = BUNDLED_ASSETS) -> list[str]:
+    """
+    Downloads the folium libraries and the fonts and images of their style sheets.
+
+    Args:
+        target_dir (Path, optional): Directory where the assets are stored.
+
+    Returns:
+        list[str]: Urls of the downloaded files.
+    """
+    folium_map = folium.Map()
+    urls = [url for _, url in [*folium_map.default_js, *folium_map.default_css]]
+    session = requests.Session()
+    session.headers["User-Agent"] = TILE_USER_AGENT
+    downloaded = []
+    while urls:
+        url = urls.pop(0)
+        if url in downloaded or local_asset_url(url) == url:
+            continue
+        response = session.get(url, timeout=ASSET_REQUEST_TIMEOUT)
+        response.raise_for_status()
+        parts = urlsplit(url)
+        file_path = asset_file_path(parts.netloc + parts.path)
+        _atomic_write_bytes(target_dir / file_path, response.content)
+        downloaded.append(url)
+        if file_path.suffix == ".css":
+            for reference in _CSS_URL.findall(response.text):
+                if not reference.startswith("data:"):
+                    urls.append(urljoin(url, reference).split("#")[0].split("?")[0])
+    return downloaded
+
+
+def main():
+    """Command line entry point that downloads the bundled assets."""
+    for url in download_assets():
+        print(f"Downloaded {url}")
+
+
+if __name__ == "__main__":
+    main()
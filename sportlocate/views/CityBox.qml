@@ -9,6 +9,8 @@ ComboBox {
     id: cityComboBox
 
     textRole: "name"
+    // City can be typed, the best match of the search is chosen with enter
+    editable: true
     implicitWidth: 200
     implicitHeight: 30
 
@@ -18,6 +20,27 @@ ComboBox {
 
     model: CityController && CityController.cities
 
+    // Venue counts of the loaded cities in the preferred categories, read when the list opens
+    property var venueCounts: ({})
+
+    popup.onAboutToShow: {
+        venueCounts = PreferencesController.getCityVenueCounts();
+    }
+
+    delegate: ItemDelegate {
+        width: cityComboBox.width
+        text: cityComboBox.venueCounts[modelData.name] !== undefined
+              ? modelData.name + " (" + cityComboBox.venueCounts[modelData.name] + ")"
+              : modelData.name
+        highlighted: cityComboBox.highlightedIndex === index
+        // City under the cursor is prefetched, so choosing it is instant
+        onHoveredChanged: {
+            if (hovered) {
+                PrefetchController.hint_city(modelData.name);
+            }
+        }
+    }
+
     background: Rectangle {
         border.color: "#008080"
         border.width: 2
@@ -27,9 +50,9 @@ ComboBox {
         height: parent.height
     }
 
-    // Changes the city in ComboBox
+    // Changes the city in ComboBox, also when the city changes by switching the profile
     currentIndex: {
-        var city = PreferencesController && PreferencesController.get_city();
+        var city = PreferencesController && PreferencesController.city;
         if (model){
           for (var i = 0; i < model.length; ++i) {
             if (model[i].name === city) {
@@ -40,14 +63,26 @@ ComboBox {
         return -1;
     }
 
+    // Weather of the city is updated by WeatherBox when the city changes
+    function chooseCity(city_name) {
+        PreferencesController.set_city(city_name);
+        MapController.showCurrentVenues();
+        PrefetchController.record_city(city_name);
+    }
+
     // When user has clicked the ComboBox city the weather and map is updated.
     onActivated: {
         if (currentIndex >= 0 && currentIndex < model.length) {
-            var city_name = model[currentIndex].name;
-            WeatherController.get_and_display_weather(city_name);
-            PreferencesController.set_city(city_name);
-            MapController.showCurrentVenues();
+            chooseCity(model[currentIndex].name);
+        }
+    }
 
+    // Typed text is searched ignoring diacritics, so "aane" chooses Äänekoski
+    onAccepted: {
+        var matches = CityController.search_cities(editText);
+        if (matches.length > 0) {
+            editText = matches[0].name;
+            chooseCity(matches[0].name);
         }
     }
 
@@ -64,7 +64,12 @@ Rectangle {
     Connections {
         target: MapController
         function onMapUpdated() {
-            webview.loadHtml(MapController.map_html);
+            // Map is loaded by url when the documents are served by the application
+            if (MapController.map_url !== "") {
+                webview.url = MapController.map_url;
+            } else {
+                webview.loadHtml(MapController.map_html);
+            }
         }
         function onNoRecommendation() {
             noRecommendationDialog.open();
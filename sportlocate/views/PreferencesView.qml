@@ -33,6 +33,7 @@ Rectangle {
                 columnSpacing: 10
                 rowSpacing: 10
                 Repeater {
+                    id: preferencesRepeater
                     model: PreferencesController ? PreferencesController.getPreferences() : undefined
                     delegate: CheckBox {
                         font.pixelSize: 15
@@ -41,7 +42,10 @@ Rectangle {
                             MapController.showCurrentVenues();
                         }
                         checked: modelData.value
-                        text: qsTr(modelData.name)
+                        // Venue count of the current city is known once the city has been loaded
+                        text: modelData.count >= 0
+                              ? qsTr(modelData.name) + " (" + modelData.count + ")"
+                              : qsTr(modelData.name)
                     }
                 }
             }
@@ -49,4 +53,12 @@ Rectangle {
     }
 
     BackToMapButton {}
+
+    // Reloading the checkboxes and the map when the profile is changed
+    ProfileBox {
+        onProfileChanged: {
+            preferencesRepeater.model = PreferencesController.getPreferences();
+            MapController.showCurrentVenues();
+        }
+    }
 }
@@ -0,0 +1,45 @@
+import QtQuick 2.15
+import QtQuick.Controls 2.15
+
+//
+// Preferences views profile combo box. Typing a new name and pressing enter creates a new profile.
+//
+
+ComboBox {
+    id: profileComboBox
+
+    signal profileChanged()
+
+    editable: true
+    implicitWidth: 200
+    implicitHeight: 30
+    anchors.bottom: parent.bottom
+    anchors.right: parent.right
+    anchors.bottomMargin: 10
+    anchors.rightMargin: 10
+
+    model: PreferencesController ? PreferencesController.get_profiles() : []
+    currentIndex: PreferencesController ? model.indexOf(PreferencesController.get_profile()) : -1
+
+    background: Rectangle {
+        border.color: "#008080"
+        border.width: 2
+        radius: 5
+        color: "white"
+        width: parent.width
+        height: parent.height
+    }
+
+    function changeProfile(name) {
+        if (name.length === 0 || name === PreferencesController.get_profile()) {
+            return;
+        }
+        PreferencesController.set_profile(name);
+        model = PreferencesController.get_profiles();
+        currentIndex = model.indexOf(name);
+        profileChanged();
+    }
+
+    onActivated: changeProfile(currentText)
+    onAccepted: changeProfile(editText)
+}
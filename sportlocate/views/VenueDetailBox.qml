@@ -31,8 +31,8 @@ Rectangle {
             Text {
                 width: parent.width * 0.8     
                 wrapMode: Text.WordWrap
-                text: MapController && MapController.selected_venue_id != 0 
-                ? ((venue => venue && venue[value])(MapController.venues.find(v => v.id == MapController.selected_venue_id)) || "")
+                text: MapController && MapController.selected_venue_id != 0
+                ? (MapController.selected_venue[value] || "")
                 : ""
                 font.pixelSize: 24
                 color: "black"
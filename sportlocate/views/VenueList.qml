@@ -5,85 +5,139 @@ import QtQuick.Controls 2.15
 // VenueList
 //
 
-ListView {
-    clip: true
+Item {
+    id: venueList
+
+    // Search, sort and category facets of the list are handled by the proxy model on python side
+    property var proxyModel: MapController ? MapController.venue_proxy_model : null
+
     width: parent.width / 3 - 40
     height: parent.height - 150
     anchors.rightMargin: 20
     anchors.bottom: parent.bottom
-    
-    model: ListModel {
-        id: venueModel
-    }
-
     anchors.right: parent.right
-    orientation: ListView.Vertical
-    spacing: 10
-
-    delegate: MouseArea {
-        width: parent ? parent.width : 0
-        height: 100
-        onClicked: {
-            MapController.set_selected_venue_id(model.id);
-        }
 
-        Rectangle {
-            id: venueRectangle
+    Column {
+        id: listHeader
 
-            width: parent ? parent.width : 0
-            height: 100
-            border.color: "#008080"
-            border.width: 2
-            radius: 8
-
-            // Text to display the venue name
-            Text {
-                id: venueText
-                anchors.centerIn: parent
-                text: model.name
-                font.pixelSize: 16
-            }
+        width: parent.width
+        spacing: 5
 
-            // Define two states for those venue "cards" that are shown in the webview.
-            states: [
-                State {
-                    name: "selected"
-                    when: MapController && MapController.selected_venue_id === model.id
-                    PropertyChanges {
-                        target: venueRectangle
-                        color: "#008080"
-                    }
-                    PropertyChanges {
-                        target: venueText
-                        color: "white"
-                    }
-                },
-                State {
-                    name: "unselected"
-                    when: MapController && MapController.selected_venue_id !== model.id
-                    PropertyChanges {
-                        target: venueRectangle
-                        color: "white"
+        Row {
+            width: parent.width
+            spacing: 5
+
+            TextField {
+                id: searchField
+                width: parent.width - sortBox.width - parent.spacing
+                placeholderText: "Search venues"
+                onTextChanged: {
+                    if (venueList.proxyModel) {
+                        venueList.proxyModel.search_text = text;
                     }
-                    PropertyChanges {
-                        target: venueText
-                        color: "black"
+                }
+            }
+
+            ComboBox {
+                id: sortBox
+                width: 130
+                textRole: "text"
+                model: [
+                    { text: "Load order", key: "" },
+                    { text: "Name", key: "name" },
+                    { text: "Distance", key: "distance" },
+                    { text: "Type", key: "type" }
+                ]
+                onActivated: {
+                    if (venueList.proxyModel) {
+                        venueList.proxyModel.sort_key = model[index].key;
                     }
                 }
-            ]
+            }
         }
-    }
 
-    // Connecting the update signal to webview
-    Connections {
-        target: MapController
-        function onVenuesChanged() {
-            var venues = MapController.venues;
-            venueModel.clear();
-            for (var i = 0; i < venues.length; ++i) {
-                venueModel.append(venues[i]);
+        // Category facets of the venues that match the search
+        Flow {
+            width: parent.width
+            spacing: 5
+
+            Repeater {
+                model: venueList.proxyModel ? venueList.proxyModel.facets : []
+                delegate: Button {
+                    text: modelData.name + " (" + modelData.count + ")"
+                    checkable: true
+                    checked: modelData.selected
+                    font.pixelSize: 12
+                    onClicked: venueList.proxyModel.toggle_facet(modelData.name)
+                }
             }
         }
+    }
+
+    ListView {
+        clip: true
+        width: parent.width
+        anchors.top: listHeader.bottom
+        anchors.topMargin: 10
+        anchors.bottom: parent.bottom
+
+        model: venueList.proxyModel
+
+        orientation: ListView.Vertical
+        spacing: 10
+
+        delegate: MouseArea {
+            width: parent ? parent.width : 0
+            height: 100
+            onClicked: {
+                MapController.set_selected_venue_id(model.id);
+            }
+
+            Rectangle {
+                id: venueRectangle
+
+                width: parent ? parent.width : 0
+                height: 100
+                border.color: "#008080"
+                border.width: 2
+                radius: 8
+
+                // Text to display the venue name
+                Text {
+                    id: venueText
+                    anchors.centerIn: parent
+                    text: model.name
+                    font.pixelSize: 16
+                }
 
+                // Define two states for those venue "cards" that are shown in the webview.
+                states: [
+                    State {
+                        name: "selected"
+                        when: MapController && MapController.selected_venue_id === model.id
+                        PropertyChanges {
+                            target: venueRectangle
+                            color: "#008080"
+                        }
+                        PropertyChanges {
+                            target: venueText
+                            color: "white"
+                        }
+                    },
+                    State {
+                        name: "unselected"
+                        when: MapController && MapController.selected_venue_id !== model.id
+                        PropertyChanges {
+                            target: venueRectangle
+                            color: "white"
+                        }
+                        PropertyChanges {
+                            target: venueText
+                            color: "black"
+                        }
+                    }
+                ]
+            }
+        }
     }
 }
@@ -71,4 +71,12 @@ Rectangle {
         var city_name = PreferencesController.get_city();
         WeatherController.get_and_display_weather(city_name);
     }
+
+    // Weather of the new city when the user chooses a city or switches the profile
+    Connections {
+        target: PreferencesController
+        function onCityChanged() {
+            WeatherController.get_and_display_weather(PreferencesController.city);
+        }
+    }
 }
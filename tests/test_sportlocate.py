@@ -1,37 +1,1154 @@
+import asyncio
+import io
+import json
+import threading
+import time
+
+from datetime import datetime, timezone
+
+import aiohttp
 import pytest
 
+from PyQt5.QtCore import QCoreApplication
+
 from sportlocate.models.venuemodel import VenueModel
-from sportlocate.models.venuefactory import SportVenue
+from sportlocate.models.venuefactory import SportVenue, SportVenueFactory
+from sportlocate.models.venue import Coordinates
 from sportlocate.models.sportvenuecategorymodel import SportVenueCategoryModel
 from sportlocate.models.weathermodel import WeatherModel, WeatherData
+from sportlocate.models.preferencesmodel import PreferencesModel
+from sportlocate.models.citycache import CITY_OVERHEAD_BYTES, CityVenueCache, estimate_venue_size
+from sportlocate.models import preferencesstore
+from sportlocate.utils.apiclient import ApiClient, AsyncApiClient
+from sportlocate.utils.diskcache import DiskCache
+from sportlocate.utils.jsonstream import iter_array_items
+from sportlocate.utils.ratelimiter import HostLimiter, RateLimiter
+from sportlocate.utils.cachewarmer import CacheWarmer
+from sportlocate.utils.qtasyncio import AsyncioBridge
+from sportlocate.utils.qmlworker import Worker
+from sportlocate.utils.cancellation import CancellationToken, OperationCancelled
+from sportlocate.utils.scheduler import JobScheduler, JobLane
+from sportlocate.utils.tilecache import MBTilesSource, TileCache
+from sportlocate.utils.webassets import AssetStore
+from sportlocate.utils.mapdocuments import MapDocumentStore
+from sportlocate.utils.searchindex import SearchIndex
+from sportlocate.utils.apiserver import ApiServer
+from sportlocate.utils.services import get_service, reset_services, set_service
+from sportlocate.utils.startuptrace import start_trace, stop_trace
+from sportlocate.models.city_model import CityModel
+from sportlocate.models.venuecounts import VenueCountIndex
+from sportlocate.controllers.preferences_controller import PreferencesController
+from sportlocate.controllers.mapcontroller import MapController, render_map
+from sportlocate.controllers.venue_list_model import VenueListModel
+from sportlocate.controllers.venue_proxy_model import VenueProxyModel
+from sportlocate.controllers.prefetch_controller import CityPredictor, PrefetchController
+
+# Canned LIPAS responses used by the offline tests
+FAKE_CATEGORIES = [
+    {
+        "typeCode": 2000,
+        "subCategories": [{"typeCode": 2100, "name": "Gyms", "sportsPlaceTypes": [2120]}],
+    },
+    {
+        "typeCode": 1000,
+        "subCategories": [{"typeCode": 1100, "name": "Fields", "sportsPlaceTypes": [1110, 1120]}],
+    },
+]
+
+
+def fake_sport_venue(venue_id, type_code, city="Akaa"):
+    return {
+        "sportsPlaceId": venue_id,
+        "type": {"name": f"Venue {venue_id}", "typeCode": type_code},
+        "location": {
+            "coordinates": {"wgs84": {"lon": 23.0 + venue_id / 100, "lat": 61.0}},
+            "city": {"name": city},
+        },
+        "properties": {"infoFi": "info"},
+    }
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """Keeps the disk caches and settings of the tests in a temporary directory."""
+    monkeypatch.setenv("SPORTLOCATE_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("SPORTLOCATE_CONFIG_DIR", str(tmp_path / "config"))
+    # Shared services of the previous test used its directories
+    reset_services()
+    return tmp_path / "cache"
+
+
+@pytest.fixture
+def fake_api(monkeypatch):
+    """Replaces the LIPAS API with canned responses and records requested endpoints."""
+    venues = {1: fake_sport_venue(1, 2120), 2: fake_sport_venue(2, 1110), 3: fake_sport_venue(3, 9999)}
+    requests = []
+
+    def get(self, endpoint, params=None):
+        requests.append(endpoint)
+        if endpoint.startswith("/categories"):
+            return FAKE_CATEGORIES
+        if endpoint.startswith("/sports-places?"):
+            return [{"sportsPlaceId": venue_id} for venue_id in venues]
+        venue_id = int(endpoint.split("/")[2].split("?")[0])
+        return venues[venue_id]
+
+    async def get_async(self, endpoint, params=None):
+        return get(self, endpoint, params)
+
+    def iter_items(self, endpoint, params=None):
+        # Looked up from the class so that tests can replace get afterwards
+        return iter(ApiClient.get(self, endpoint, params))
+
+    async def iter_items_async(self, endpoint, params=None):
+        for item in get(self, endpoint, params):
+            yield item
+
+    monkeypatch.setattr(ApiClient, "get", get)
+    monkeypatch.setattr(ApiClient, "iter_items", iter_items)
+    monkeypatch.setattr(AsyncApiClient, "get", get_async)
+    monkeypatch.setattr(AsyncApiClient, "iter_items", iter_items_async)
+    return requests
+
+
+@pytest.fixture
+def map_controller(fake_api):
+    return MapController()
+
+
+@pytest.fixture(scope="session")
+def qt_app():
+    # Kept alive for the whole session, Qt objects of the shared scheduler belong to it
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+def process_events_until(app, condition, timeout=5):
+    """Runs Qt event loop until condition is true."""
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.001)
+    assert condition()
+
+
+def draw_map_and_wait(app, controller, venues):
+    """Draws the venues and waits until the map is rendered in worker thread."""
+    updated = []
+    controller.map_updated.connect(lambda: updated.append(True))
+    controller._draw_map(venues)
+    process_events_until(app, lambda: updated)
 
 
 @pytest.fixture
 def venue_model():
-    return VenueModel('sport')
+    return get_service(VenueModel)
 
 def test_sport_venue_model_singleton(venue_model):
-    model2 = VenueModel('sport')
-    assert venue_model == model2
+    model2 = get_service(VenueModel)
+    assert venue_model is model2
+    assert venue_model.venue_factory is model2.venue_factory
 
 def test_get_filtered_sport_venues(venue_model):
-    category_model = SportVenueCategoryModel()
+    category_model = get_service(SportVenueCategoryModel)
     all_categories = category_model.sport_venue_categories
     some_categories = all_categories[0:3]
     filtered_sport_venues = venue_model.get_filtered_venues("akaa", some_categories)
     assert len(filtered_sport_venues) != 0
 
 def test_get_sport_venue_recommendation(venue_model):
-    weather_model = WeatherModel()
+    weather_model = get_service(WeatherModel)
     weather_info = weather_model.get_weather_info("Tampere")
     # Before recommendation some city venues should be get from API
-    category_model = SportVenueCategoryModel()
+    category_model = get_service(SportVenueCategoryModel)
     all_categories = category_model.sport_venue_categories
     venue_model.get_filtered_venues("Tampere", all_categories)
     recommendation = venue_model.get_recommendation(weather_info)
     assert isinstance(recommendation, SportVenue)
 
 def test_get_weather_info():
-    weather_model = WeatherModel()
+    weather_model = get_service(WeatherModel)
     weather_info = weather_model.get_weather_info("Tampere")
     assert isinstance(weather_info, WeatherData)
+
+
+def test_disk_cache_expires_entries():
+    cache = DiskCache("test", ttl=60)
+    cache.set("tampere", {"value": 1})
+    assert cache.get("tampere") == {"value": 1}
+    assert "tampere" in cache
+    cache.ttl = -1
+    assert cache.get("tampere") is None
+
+def test_rate_limiter_limits_request_rate():
+    limiter = RateLimiter(rate=50, burst=1)
+    start = time.monotonic()
+    for _ in range(6):
+        limiter.acquire()
+    # First request is free, next five need to wait 1/50 seconds each
+    assert time.monotonic() - start >= 0.09
+
+def test_host_limiter_adapts_concurrency_to_responses():
+    limiter = HostLimiter(initial_concurrency=2, max_concurrency=4)
+    limiter.acquire()
+    limiter.acquire()
+    third_started = threading.Event()
+    thread = threading.Thread(target=lambda: (limiter.acquire(), third_started.set()))
+    thread.start()
+    # Third request waits until one of the two requests in flight is done
+    assert not third_started.wait(0.05)
+    limiter.release(200, 0.01)
+    assert third_started.wait(1)
+    thread.join()
+
+    # Throttled response halves the limit and pauses the host for Retry-After seconds
+    limiter.release(429, 0.01, retry_after="0.1")
+    assert limiter.concurrency_limit == 1
+    limiter.release(200, 0.01)
+    start = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - start >= 0.05
+    limiter.release(200, 0.01)
+
+    # Healthy responses ramp the limit up to the maximum
+    for _ in range(20):
+        limiter.acquire()
+        limiter.release(200, 0.01)
+    assert limiter.concurrency_limit == 4
+    assert limiter.stats().throttled == 1
+
+    # Rising latency backs off, but only once per round trip
+    limiter = HostLimiter(initial_concurrency=4, max_concurrency=4)
+    for latency in (0.01, 0.01, 0.5, 0.5, 0.5):
+        limiter.acquire()
+        limiter.release(200, latency)
+    assert limiter.concurrency_limit == 2 and limiter.stats().backoffs == 1
+
+
+def test_cache_warmer_warms_venue_cache(fake_api):
+    warmer = CacheWarmer(workers=2, venue_api_rate=1000, include_weather=False)
+    progress = warmer.run(["Akaa", "Alavus"], progress_callback=lambda city, progress: None)
+    assert sorted(progress.completed) == ["akaa", "alavus"]
+    assert progress.venue_count == 6
+    # Venues are now served from the disk cache without API calls
+    fake_api.clear()
+    assert len(SportVenueFactory().create_venues("Akaa")) == 3
+    assert not [endpoint for endpoint in fake_api if endpoint.startswith("/sports-places")]
+
+def test_venue_counts_are_stored_while_warming_and_skip_empty_fetches(fake_api, qt_app):
+    CacheWarmer(workers=1, venue_api_rate=1000, include_weather=False).run(
+        ["Akaa"], progress_callback=lambda city, progress: None
+    )
+    category_model = get_service(SportVenueCategoryModel)
+    # Counts are read from the file stored next to the venue cache
+    counts = VenueCountIndex()
+    assert counts.type_code_counts("Akaa") == {2120: 1, 1110: 1, 9999: 1}
+    assert counts.category_counts("akaa", category_model) == {"Gyms": 1, "Fields": 1}
+    assert counts.city_counts([2120]) == {"akaa": 1}
+    assert counts.count("Alavus") is None
+
+    factory = SportVenueFactory()
+    factory.venue_counts.update("alavus", [SportVenue(coordinates=Coordinates(23.0, 62.0), type_code=1110)])
+    assert counts.count("Alavus") == 1
+    # Indexes of two processes that update different cities don't lose each other's cities
+    other_process_counts = VenueCountIndex()
+    other_process_counts.update("valkeakoski", [])
+    counts.update("urjala", [])
+    assert VenueCountIndex().city_counts() == {"akaa": 3, "alavus": 1, "valkeakoski": 0, "urjala": 0}
+    fake_api.clear()
+    # Alavus has no gyms, so those are not fetched
+    assert factory.create_filtered_venues_by_mask("Alavus", category_model.category_bit("Gyms")) == []
+    assert fake_api == []
+
+    controller = PreferencesController()
+    controller.set_city("Akaa")
+    assert [(pref["name"], pref["count"]) for pref in controller.get_preferences()] == [("Gyms", 1), ("Fields", 1)]
+    assert controller.get_city_venue_counts() == {"Akaa": 2, "Alavus": 1, "Valkeakoski": 0, "Urjala": 0}
+
+def test_asyncio_bridge_runs_coroutines_in_qt_event_loop(qt_app):
+    bridge = AsyncioBridge()
+    results = []
+
+    async def double(value):
+        await asyncio.sleep(0.01)
+        return value * 2
+
+    for i in range(1000):
+        bridge.run(double(i), on_result=results.append)
+    process_events_until(qt_app, lambda: len(results) == 1000)
+    assert sorted(results) == [i * 2 for i in range(1000)]
+    bridge.close()
+
+def test_create_venues_async_fetches_details_concurrently(fake_api):
+    factory = SportVenueFactory()
+    venues = asyncio.run(factory.create_venues_async("Akaa"))
+    assert sorted(venue.id for venue in venues) == [1, 2, 3]
+    # Second call is served from the cache
+    fake_api.clear()
+    assert len(asyncio.run(factory.create_venues_async("Akaa"))) == 3
+    assert fake_api == []
+
+    # City fetched by a worker thread is not fetched again, and the waiting fetch can be cancelled
+    token = CancellationToken()
+
+    async def fetch_while_locked():
+        fetch = asyncio.ensure_future(factory.create_venues_async("Alavus", token))
+        await asyncio.sleep(0.2)
+        token.cancel()
+        return await fetch
+
+    with factory._get_city_fetch_lock("alavus"):
+        with pytest.raises(OperationCancelled):
+            asyncio.run(fetch_while_locked())
+    assert fake_api == []
+
+def test_scheduler_runs_coroutine_jobs_on_the_asyncio_bridge(fake_api, qt_app, monkeypatch):
+    bridge = AsyncioBridge()
+    scheduler = JobScheduler()
+    with pytest.raises(ValueError):
+        scheduler.submit(asyncio.sleep, 0)
+    scheduler.set_async_bridge(bridge)
+
+    # Identical coroutine jobs are coalesced like the threaded ones
+    venue_model = get_service(VenueModel)
+    mask = get_service(SportVenueCategoryModel).mask_for_type_code(2120)
+    results = []
+    for _ in range(2):
+        scheduler.submit(
+            venue_model.get_filtered_venues_by_mask_async, "Akaa", mask,
+            key=("venues", "akaa", mask), on_result=results.append, cancellable=True,
+        )
+    process_events_until(qt_app, lambda: len(results) == 2)
+    assert [venue.id for venue in results[0]] == [1] and results[1] is results[0]
+    assert fake_api.count("/sports-places?cityCodes=20") == 1
+    assert scheduler.stats()[JobLane.INTERACTIVE].coalesced == 1
+
+    # Cancelled coroutine job is interrupted without a result
+    token = scheduler.submit(asyncio.sleep, 10, on_result=results.append)
+    process_events_until(qt_app, lambda: scheduler.stats()[JobLane.INTERACTIVE].running == 1)
+    token.cancel()
+    process_events_until(qt_app, lambda: scheduler.stats()[JobLane.INTERACTIVE].cancelled == 1)
+    assert len(results) == 2
+
+    # Map controller loads the venues with the asynchronous requests
+    monkeypatch.setattr(VenueModel, "get_filtered_venues_by_mask", None)
+    PreferencesController().set_city("Alavus")
+    controller = MapController(scheduler=scheduler)
+    drawn = []
+    monkeypatch.setattr(controller, "_draw_map", drawn.append)
+    controller.show_current_venues()
+    process_events_until(qt_app, lambda: drawn)
+    bridge.close()
+
+def test_cancelled_worker_does_not_emit_result():
+    token = CancellationToken()
+    worker = Worker(lambda cancel_token: token.cancel() or "result", cancel_token=token)
+    results, cancelled = [], []
+    worker.signals.result.connect(results.append)
+    worker.signals.cancelled.connect(lambda: cancelled.append(True))
+    worker.run()
+    assert results == [] and cancelled == [True]
+
+def test_cancelled_venue_fetch_stops_and_is_not_cached(fake_api):
+    token = CancellationToken()
+    token.cancel()
+    factory = SportVenueFactory()
+    with pytest.raises(OperationCancelled):
+        factory.create_venues("Akaa", cancel_token=token)
+    # Only the venue list was requested, no venue details
+    assert [endpoint for endpoint in fake_api if endpoint.startswith("/sports-places")] == [
+        "/sports-places?cityCodes=20"
+    ]
+    assert DiskCache("venues").get("akaa") is None
+
+def test_map_controller_draws_only_newest_venue_load(map_controller, monkeypatch):
+    drawn = []
+    monkeypatch.setattr(map_controller, "_draw_map", drawn.append)
+    old_generation, old_token = map_controller._start_new_venue_load()
+    new_generation, new_token = map_controller._start_new_venue_load()
+    assert old_token.is_cancelled and not new_token.is_cancelled
+    map_controller._on_venues_loaded(new_generation, ["new"])
+    map_controller._on_venues_loaded(old_generation, ["old"])
+    assert drawn == [["new"]]
+
+def test_scheduler_coalesces_identical_jobs(qt_app):
+    scheduler = JobScheduler(pool_sizes={JobLane.INTERACTIVE: 2})
+    release = threading.Event()
+    calls, results = [], []
+
+    def fetch(city):
+        calls.append(city)
+        release.wait(5)
+        return city.upper()
+
+    scheduler.submit(fetch, "akaa", key=("venues", "akaa"), on_result=results.append)
+    scheduler.submit(fetch, "akaa", key=("venues", "akaa"), on_result=results.append)
+    release.set()
+    process_events_until(qt_app, lambda: len(results) == 2)
+    assert calls == ["akaa"] and results == ["AKAA", "AKAA"]
+    stats = scheduler.stats()[JobLane.INTERACTIVE]
+    assert stats.coalesced == 1 and stats.completed == 1 and stats.queued == 0
+
+def test_scheduler_cancels_job_when_all_callers_cancel(qt_app):
+    scheduler = JobScheduler(pool_sizes={JobLane.BACKGROUND: 1})
+    started, release = threading.Event(), threading.Event()
+    results = []
+
+    def fetch(cancel_token):
+        started.set()
+        release.wait(5)
+        cancel_token.raise_if_cancelled()
+        return "result"
+
+    first = scheduler.submit(fetch, key="job", lane=JobLane.BACKGROUND, on_result=results.append, cancellable=True)
+    second = scheduler.submit(fetch, key="job", lane=JobLane.BACKGROUND, on_result=results.append, cancellable=True)
+    started.wait(5)
+    first.cancel()
+    second.cancel()
+    release.set()
+    process_events_until(qt_app, lambda: scheduler.stats()[JobLane.BACKGROUND].cancelled == 1)
+    assert results == []
+
+def test_factory_fetches_city_once_from_concurrent_threads(fake_api):
+    factory = SportVenueFactory()
+    threads = [threading.Thread(target=factory.create_venues, args=("Akaa",)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert fake_api.count("/sports-places?cityCodes=20") == 1
+
+def test_preference_changes_are_written_once_atomically(fake_api, tmp_path):
+    model = get_service(PreferencesModel)
+    for category in model.all_categories * 10:
+        model.set_preferences(category.name, False)
+    model.current_city = "Akaa"
+    store = preferencesstore.default_store()
+    assert store.write_count == 0
+    model.flush()
+    assert store.write_count == 1
+    assert [path.name for path in (tmp_path / "config").iterdir()] == ["preferences.json"]
+    # Reading the written file with a fresh store
+    stored = preferencesstore.PreferencesStore().load("default")
+    assert stored == {"overrides": {"Gyms": False, "Fields": False}, "city": "Akaa"}
+
+def test_preference_profiles_are_separate(fake_api):
+    model = get_service(PreferencesModel)
+    model.current_city = "Akaa"
+    model.switch_profile("kids")
+    assert model.current_city == "Tampere"
+    model.switch_profile("default")
+    assert model.current_city == "Akaa"
+    assert model.profile_names == ["default", "kids"]
+
+def test_profile_switch_changes_the_city_of_the_controller(fake_api):
+    controller = PreferencesController()
+    # Default profile is listed before anything has been changed
+    assert controller.get_profiles() == ["default"]
+    changes = []
+    controller.city_changed.connect(lambda: changes.append(controller.property("city")))
+    controller.set_city("Akaa")
+    controller.set_profile("kids")
+    controller.set_profile("default")
+    assert changes == ["Akaa", "Tampere", "Akaa"]
+    assert controller.get_profiles() == ["default", "kids"]
+
+def test_category_masks_are_stable_and_map_to_type_codes(fake_api):
+    category_model = get_service(SportVenueCategoryModel)
+    # Bits follow category codes, not the order of the API response
+    assert category_model.category_bit("Fields") == 1
+    assert category_model.category_bit("Gyms") == 2
+    assert category_model.type_codes_for_mask(0b11) == frozenset({1110, 1120, 2120})
+    assert category_model.categories_for_mask(0b01)[0].name == "Fields"
+
+def test_filtered_venues_are_memoized_per_city_and_mask(fake_api):
+    factory = SportVenueFactory()
+    gyms = factory.create_filtered_venues_by_mask("Akaa", 0b10)
+    assert [venue.id for venue in gyms] == [1]
+    assert factory.create_filtered_venues_by_mask("Akaa", 0b10) is gyms
+    assert [venue.id for venue in factory.create_filtered_venues_by_mask("Akaa", 0b11)] == [1, 2]
+
+def test_preferences_mask_follows_overrides(fake_api):
+    model = get_service(PreferencesModel)
+    model.set_preferences("Gyms", False)
+    assert model.get_preferences_mask() == 0b01
+    assert not model.is_category_enabled("Gyms")
+    assert [category.name for category in model.get_preferences()] == ["Fields"]
+
+def make_venues(*ids):
+    return [SportVenue(coordinates=Coordinates(lon=23.0, lat=61.0), id=venue_id, name=f"Venue {venue_id}") for venue_id in ids]
+
+def test_recommendation_keeps_venue_list_rows(map_controller, qt_app, monkeypatch):
+    venues = make_venues(1, 2, 3)
+    draw_map_and_wait(qt_app, map_controller, venues)
+    model = map_controller.venue_list_model
+    monkeypatch.setattr(VenueModel, "get_recommendation", lambda self, weather: venues[1])
+    updated = []
+    map_controller.map_updated.connect(lambda: updated.append(True))
+    map_controller.show_recommendation()
+    process_events_until(qt_app, lambda: updated)
+    assert [model.data(model.index(row), VenueListModel.IdRole) for row in range(model.rowCount())] == [1, 2, 3]
+
+def test_venue_list_model_updates_only_changed_rows(qt_app):
+    from PyQt5.QtTest import QAbstractItemModelTester
+
+    model = VenueListModel()
+    tester = QAbstractItemModelTester(model, QAbstractItemModelTester.FailureReportingMode.Fatal)
+    model.set_venues(make_venues(1, 2, 3, 4))
+    removed, inserted, changed = [], [], []
+    model.rowsRemoved.connect(lambda parent, first, last: removed.append((first, last)))
+    model.rowsInserted.connect(lambda parent, first, last: inserted.append((first, last)))
+    model.dataChanged.connect(lambda first, last: changed.append(first.row()))
+    new_venues = make_venues(1, 3, 4, 5)
+    new_venues[1].name = "Renamed"
+    model.set_venues(new_venues)
+    # Changes are applied from the end, so rows are reported before venue 2 is removed
+    assert inserted == [(4, 4)] and removed == [(1, 1)] and changed == [2]
+    assert [model.data(model.index(row), VenueListModel.IdRole) for row in range(model.rowCount())] == [1, 3, 4, 5]
+    assert model.data(model.index(1), VenueListModel.NameRole) == "Renamed"
+    assert model.row_of(5) == 3
+
+def test_venue_proxy_model_searches_sorts_and_filters(fake_api, qt_app):
+    from PyQt5.QtTest import QAbstractItemModelTester
+
+    venues = [
+        SportVenue(
+            coordinates=Coordinates(lon=23.0, lat=61.0 + venue_id / 1000),
+            id=venue_id,
+            name=f"Venue {5000 - venue_id}",
+            type_code=2120 if venue_id % 2 else 1110,
+        )
+        for venue_id in range(1, 5001)
+    ]
+    source = VenueListModel()
+    source.set_venues(venues)
+    proxy = VenueProxyModel(get_service(SportVenueCategoryModel))
+    tester = QAbstractItemModelTester(proxy, QAbstractItemModelTester.FailureReportingMode.Fatal)
+    proxy.setSourceModel(source)
+
+    def ids():
+        return [proxy.data(proxy.index(row), VenueListModel.IdRole) for row in range(proxy.rowCount())]
+
+    start = time.perf_counter()
+    proxy.search_text = "VENUE 49"
+    # Updating the results as the user types must fit in a frame
+    assert time.perf_counter() - start < 0.016
+    assert ids() == [venue.id for venue in venues if "venue 49" in venue.name.lower()]
+    assert proxy.facets == [
+        {"name": "Gyms", "count": 56, "selected": False},
+        {"name": "Fields", "count": 55, "selected": False},
+    ]
+    proxy.toggle_facet("Gyms")
+    assert all(venue_id % 2 for venue_id in ids()) and proxy.count == 56
+    proxy.sort_key = "name"
+    assert ids()[:2] == [4951, 99]  # "Venue 49", "Venue 4901"
+    proxy.search_text = ""
+    proxy.clear_facets()
+    proxy.set_reference_point(61.2, 23.0)
+    proxy.sort_key = "distance"
+    assert ids()[0] == 200 and set(ids()[1:3]) == {199, 201}
+    assert proxy.mapFromSource(source.index(199)).row() == 0
+
+def test_venue_proxy_model_forwards_source_row_changes(fake_api, qt_app):
+    from PyQt5.QtTest import QAbstractItemModelTester
+
+    def make(venue_id, name=None):
+        return SportVenue(
+            coordinates=Coordinates(lon=23.0, lat=61.0 + venue_id / 1000),
+            id=venue_id,
+            name=name or f"Venue {venue_id}",
+            type_code=2120 if venue_id % 2 else 1110,
+        )
+
+    source = VenueListModel()
+    source.set_venues([make(venue_id) for venue_id in range(1, 2001)])
+    proxy = VenueProxyModel(get_service(SportVenueCategoryModel))
+    proxy.setSourceModel(source)
+    proxy.sort_key = "name"
+    proxy.toggle_facet("Gyms")
+    resets = []
+    proxy.modelReset.connect(lambda: resets.append(True))
+
+    def ids():
+        return [proxy.data(proxy.index(row), VenueListModel.IdRole) for row in range(proxy.rowCount())]
+
+    # Every 7th venue is removed, one is renamed and one changes its type
+    venues = [make(venue_id) for venue_id in range(1, 2001) if venue_id % 7]
+    venues[0] = make(1, "Zzz Hall")
+    venues[2] = make(3, "Aaa Hall")
+    venues[3].type_code = 2120
+    start = time.perf_counter()
+    source.set_venues(venues)
+    assert time.perf_counter() - start < 1.0
+    assert resets == []
+    expected = sorted(
+        (venue for venue in venues if venue.type_code == 2120), key=lambda venue: venue.name.casefold()
+    )
+    assert ids() == [venue.id for venue in expected] and proxy.count == len(expected)
+    assert ids()[0] == 3 and ids()[-1] == 1 and 4 in ids()
+
+    # Search and sort changes still reset
+    tester = QAbstractItemModelTester(proxy, QAbstractItemModelTester.FailureReportingMode.Fatal)
+    proxy.search_text = "hall"
+    assert ids() == [3, 1] and len(resets) == 1
+    source.set_venues(venues[1:] + [make(2001, "Uusi Hall")])
+    assert ids() == [3, 2001] and len(resets) == 1
+    proxy.search_text = ""
+    proxy.sort_key = ""
+    assert ids()[:3] == [3, 4, 5] and ids()[-1] == 2001 and len(resets) == 3
+
+def test_search_index_ignores_diacritics_and_matches_prefixes_and_trigrams(qt_app):
+    cities = get_service(CityModel)
+    assert cities.search("aane")[0]["name"] == "Äänekoski"
+    assert cities.search("ALAJA")[0]["name"] == "Alajärvi"
+    # Misspelled and partial words are found by trigrams
+    assert cities.search("Tampre")[0]["name"] == "Tampere"
+    assert "Alajärvi" in [city["name"] for city in cities.search("jarvi")]
+    assert cities.search("xyzzy") == []
+
+    index = SearchIndex()
+    for venue_id in range(5000):
+        index.add(venue_id, f"Kenttä {venue_id}", "Pukuhuoneet ja sauna" if venue_id % 2 else "")
+    index.add(5000, "Äänekosken uimahalli", "Kuntosali")
+    assert index.search("uimahalli") == [5000]
+    assert index.matches("kentta 49") == {49} | set(range(490, 500)) | set(range(4900, 5000))
+    assert len(index.matches("SAUNA")) == 2500
+    index.search("xyz")  # vocabulary and its trigrams are indexed on the first searches
+
+    # Results of search as you type come back in under a millisecond
+    for text in ("ä", "ää", "aane", "aanekosken u", "kuntosali", "tampre"):
+        start = time.perf_counter()
+        cities.search(text, 20)
+        index.search(text, 20)
+        assert time.perf_counter() - start < 0.001
+
+    index.clear()
+    assert len(index) == 0 and index.search("uimahalli") == []
+    index.add("pool", "Uimahalli")
+    assert index.search("uima") == ["pool"]
+
+def test_tile_cache_evicts_least_recently_used_tiles(tmp_path, monkeypatch):
+    import sqlite3
+
+    mbtiles = tmp_path / "bundled.mbtiles"
+    with sqlite3.connect(mbtiles) as connection:
+        connection.execute("CREATE TABLE tiles (zoom_level, tile_column, tile_row, tile_data)")
+        # MBTiles rows are in TMS order: y=0 is stored as row 2**z - 1
+        connection.execute("INSERT INTO tiles VALUES (1, 0, 1, ?)", (b"bundled",))
+    downloads = []
+    monkeypatch.setattr(TileCache, "_download", lambda self, z, x, y: downloads.append((z, x, y)) or b"t" * 100)
+    cache = TileCache(max_bytes=250, sources=[MBTilesSource(mbtiles)])
+
+    assert cache.get(1, 0, 0) == b"bundled"
+    cache.get(10, 1, 1)
+    cache.get(10, 1, 2)
+    cache.get(10, 1, 1)  # Cached, and now the most recently used tile
+    cache.get(10, 1, 3)
+    assert downloads == [(10, 1, 1), (10, 1, 2), (10, 1, 3)]
+    assert cache.size == 200
+    assert cache.get_cached(10, 1, 2) is None
+    assert cache.get_cached(10, 1, 1) is not None
+
+    # Lookups don't write nor wait for the lock that put and eviction hold
+    def last_access():
+        with sqlite3.connect(cache.path) as connection:
+            return dict(connection.execute("SELECT y, last_access FROM tiles").fetchall())
+
+    written = last_access()
+    with cache._lock:
+        assert cache.get_cached(10, 1, 3) is not None
+    assert last_access() == written
+    # Access times of the hits are written when the cache is closed
+    cache.close()
+    assert last_access()[3] > written[3]
+
+def test_map_document_loads_libraries_from_the_local_mirror(tmp_path, monkeypatch):
+    import re
+
+    venues = make_venues(1, 2)
+    for venue_layer in ("markers", "canvas"):
+        map_html, _ = render_map(venues, (61.0, 23.0), 1, venue_layer=venue_layer, local_assets=True)
+        references = re.findall(r'<(?:script|link)[^>]*(?:src|href)="([^"]+)"', map_html)
+        assert references and all(url.startswith("sportlocate://assets/") for url in references)
+        assert not re.search(r'<(?:script|link)[^>]*(?:src|href)="https?://', map_html)
+
+    # Bundled files are served first, others are downloaded once to the cache
+    bundled = tmp_path / "bundled"
+    (bundled / "code.jquery.com").mkdir(parents=True)
+    (bundled / "code.jquery.com" / "jquery-3.7.1.min.js").write_bytes(b"jquery")
+    downloads = []
+    monkeypatch.setattr(AssetStore, "_download", lambda self, path: downloads.append(str(path)) or b"css")
+    store = AssetStore(bundled)
+    assert store.get("/code.jquery.com/jquery-3.7.1.min.js") == (b"text/javascript", b"jquery")
+    path = "/cdn.jsdelivr.net/npm/leaflet@1.9.3/dist/leaflet.css"
+    assert store.get_cached(path) is None
+    assert store.get(path) == (b"text/css", b"css") and store.get_cached(path) == (b"text/css", b"css")
+    assert downloads == ["cdn.jsdelivr.net/npm/leaflet@1.9.3/dist/leaflet.css"]
+    with pytest.raises(ValueError):
+        store.get_cached("/cdn.jsdelivr.net/../../etc/passwd")
+
+def test_map_document_is_served_separately_from_venue_data(fake_api, qt_app):
+    import json
+
+    map_documents = MapDocumentStore()
+    controller = MapController(map_documents=map_documents)
+    venues = make_venues(1, 2)
+    venues[0].name = "</script> Hall"
+    draw_map_and_wait(qt_app, controller, venues)
+
+    map_url = controller.property("map_url")
+    assert map_url.startswith("sportlocate://map/") and controller.property("map_html") == ""
+    mime_type, document = map_documents.get(map_url.rsplit("/", 1)[1])
+    assert mime_type == b"text/html" and b"Hall" not in document
+    data_url = document.decode().split('fetch("', 1)[1].split('"', 1)[0]
+    mime_type, data = map_documents.get(data_url.rsplit("/", 1)[1])
+    assert mime_type == b"application/json"
+    assert [venue["name"] for venue in json.loads(data)] == ["</script> Hall", "Venue 2"]
+
+    # Without document store the data is embedded to the html
+    inline_controller = MapController()
+    draw_map_and_wait(qt_app, inline_controller, venues)
+    map_html = inline_controller.property("map_html")
+    assert "<\\/script> Hall" in map_html and "</script> Hall" not in map_html
+
+def test_large_venue_sets_are_drawn_on_canvas_from_geojson(fake_api, monkeypatch, qt_app):
+    import json
+    from sportlocate.controllers import mapcontroller
+
+    monkeypatch.setattr(mapcontroller, "CANVAS_LAYER_THRESHOLD", 2)
+    map_documents = MapDocumentStore()
+    controller = MapController(map_documents=map_documents)
+    draw_map_and_wait(qt_app, controller, make_venues(1, 2, 3))
+
+    document = map_documents.get(controller.property("map_url").rsplit("/", 1)[1])[1].decode()
+    assert "L.canvas" in document and "L.AwesomeMarkers.icon({" not in document
+    data_url = document.split('fetch("', 1)[1].split('"', 1)[0]
+    geojson = json.loads(map_documents.get(data_url.rsplit("/", 1)[1])[1])
+    assert geojson["type"] == "FeatureCollection"
+    assert geojson["features"][0]["geometry"]["coordinates"] == [23.0, 61.0]
+    assert [feature["properties"]["id"] for feature in geojson["features"]] == [1, 2, 3]
+
+def test_city_venue_cache_evicts_least_recently_used_unpinned_cities():
+    city_size = CITY_OVERHEAD_BYTES + 2 * estimate_venue_size(make_venues(11)[0])
+    evicted = []
+    cache = CityVenueCache(budget_bytes=3 * city_size, on_evict=evicted.append)
+    cache.put("akaa", make_venues(11, 12))
+    cache.pin("akaa")
+    cache.put("tampere", make_venues(13, 14))
+    cache.put("turku", make_venues(15, 16))
+    assert cache.get("tampere") is not None  # Turku is now least recently used
+    cache.put("oulu", make_venues(17, 18))
+
+    assert evicted == ["turku"]
+    assert "akaa" in cache and "tampere" in cache and "oulu" in cache
+    cache.unpin("akaa")
+    cache.put("espoo", make_venues(19, 20))
+    assert evicted == ["turku", "akaa"]
+    stats = cache.stats()
+    assert (stats.evictions, stats.evicted_venues, stats.resident_cities) == (2, 4, 3)
+    assert 0 < stats.resident_bytes <= stats.budget_bytes
+
+def test_sync_venues_merges_only_changed_venues(fake_api, monkeypatch):
+    factory = SportVenueFactory()
+    first_sync = factory.sync_venues("Akaa")
+    assert first_sync.full and first_sync.added == [1, 2, 3]
+
+    changed_venue = fake_sport_venue(2, 1120)
+    requests = []
+
+    def get(self, endpoint, params=None):
+        requests.append((endpoint, params))
+        if endpoint == "/sports-places":
+            return [{"sportsPlaceId": 2}, {"sportsPlaceId": 4}]
+        if endpoint == "/deleted-sports-places":
+            return [{"sportsPlaceId": 3}, {"sportsPlaceId": 999}]
+        return changed_venue if endpoint.startswith("/sports-places/2") else fake_sport_venue(4, 2120)
+
+    monkeypatch.setattr(ApiClient, "get", get)
+    result = factory.sync_venues("akaa")
+    assert (result.full, result.added, result.changed, result.removed) == (False, [4], [2], [3])
+    assert requests[0][1]["cityCodes"] == 20 and requests[0][1]["modifiedAfter"]
+    venues = factory.create_venues("Akaa")
+    assert [(venue.id, venue.type_code) for venue in venues] == [(1, 2120), (2, 1120), (4, 2120)]
+    # Merged venues are also on disk for the next start
+    assert [venue.id for venue in SportVenueFactory().create_venues("Akaa")] == [1, 2, 4]
+
+
+def test_hourly_forecast_is_cached_and_best_slots_are_found(monkeypatch):
+    # Codes: snow, rain, partly cloudy, clear sky, clear sky (windy), fog
+    raw_forecast = {
+        "latitude": 61.5,
+        "longitude": 23.8,
+        "utc_offset_seconds": 7200,
+        "current_weather": {"temperature": 5.0, "windspeed": 3.0, "weathercode": 73},
+        "hourly": {
+            "time": [f"2024-05-01T{hour:02d}:00" for hour in range(10, 16)],
+            "temperature_2m": [1.0, 10.0, 17.0, 18.0, 18.0, 12.0],
+            "windspeed_10m": [5.0, 5.0, 2.0, 3.0, 12.0, 1.0],
+            "weathercode": [73, 61, 2, 0, 1, 45],
+        },
+    }
+    requests = []
+
+    def get(self, endpoint, params=None):
+        requests.append(params)
+        return raw_forecast
+
+    monkeypatch.setattr(ApiClient, "get", get)
+    monkeypatch.setattr(WeatherModel, "get_city_location", lambda self, city: (61.5, 23.8))
+    weather_model = get_service(WeatherModel)
+
+    # Snow branch of the weather factory is covered by the lookup table
+    assert type(weather_model.get_weather_info("Tampere")).__name__ == "SnowWeather"
+    assert "hourly" in requests[0]
+
+    forecast = weather_model.get_hourly_forecast("Tampere")
+    assert [cls.__name__ for cls in (type(forecast.slot(i).weather) for i in range(2))] == [
+        "SnowWeather",
+        "RainWeather",
+    ]
+    now = datetime(2024, 5, 1, 8, 30, tzinfo=timezone.utc)
+    outdoor_slot = weather_model.best_time_slot("Tampere", 6, outdoor=True, now=now)
+    assert outdoor_slot.time == datetime(2024, 5, 1, 13, 0) and outdoor_slot.outdoor
+    indoor_slot = weather_model.best_time_slot("Tampere", 6, outdoor=False, now=now)
+    assert indoor_slot.time == datetime(2024, 5, 1, 10, 0) and not indoor_slot.outdoor
+    # Only the rainy hour that is going on at 11:30 local time is considered
+    later = datetime(2024, 5, 1, 9, 30, tzinfo=timezone.utc)
+    assert weather_model.best_time_slot("Tampere", 1, outdoor=True, now=later) is None
+    assert len(requests) == 1
+
+
+def test_venues_are_created_from_streamed_venue_list(fake_api, monkeypatch):
+    payload = json.dumps([fake_sport_venue(venue_id, 2120) for venue_id in (5, 6, 7)]).encode()
+
+    def iter_items(self, endpoint, params=None):
+        fake_api.append(endpoint)
+        assert "type.typeCode" in params["fields"]
+        return iter_array_items(io.BytesIO(payload))
+
+    monkeypatch.setattr(ApiClient, "iter_items", iter_items)
+    venues = SportVenueFactory().create_venues("Akaa")
+    assert [venue.id for venue in venues] == [5, 6, 7]
+    # Venue data was in the list, so no venue was requested separately
+    assert [endpoint for endpoint in fake_api if endpoint.startswith("/sports-places")] == [
+        "/sports-places?cityCodes=20"
+    ]
+    assert venues[0].city_name is venues[2].city_name
+
+
+def test_map_is_rendered_in_worker_thread_and_only_newest_is_shown(fake_api, qt_app, monkeypatch):
+    from sportlocate.controllers import mapcontroller
+
+    render_threads = []
+    render_map = mapcontroller.render_map
+
+    def recording_render_map(venues, *args):
+        render_threads.append(threading.current_thread())
+        time.sleep(0.05)
+        return render_map(venues, *args)
+
+    monkeypatch.setattr(mapcontroller, "render_map", recording_render_map)
+    controller = MapController()
+    updates = []
+    controller.map_updated.connect(lambda: updates.append(controller.property("map_html")))
+    controller._draw_map(make_venues(1))
+    controller._draw_map(make_venues(1, 2))
+    # Venue list is updated right away, the map when its render is ready
+    assert controller.venue_list_model.rowCount() == 2 and controller.property("map_html") == ""
+    process_events_until(qt_app, lambda: updates)
+    qt_app.processEvents()
+    assert threading.main_thread() not in render_threads
+    assert len(updates) == 1 and "Venue 2" in updates[0]
+
+
+def test_watchdog_records_stalls_with_the_blocking_handler(qt_app):
+    from PyQt5.QtCore import QTimer
+    from sportlocate.utils.watchdog import EventLoopWatchdog
+
+    watchdog = EventLoopWatchdog(threshold_ms=100, interval_ms=10)
+
+    def slow_handler():
+        time.sleep(0.3)
+
+    watchdog.start()
+    QTimer.singleShot(30, slow_handler)
+    deadline = time.monotonic() + 1
+    while time.monotonic() < deadline:
+        qt_app.processEvents()
+        time.sleep(0.005)
+    watchdog.stop()
+
+    stalls = watchdog.stalls()
+    assert len(stalls) == 1 and stalls[0].duration >= 0.25
+    assert stalls[0].location.startswith("slow_handler (test_sportlocate.py:")
+    assert "1 x slow_handler" in watchdog.report()
+
+
+def test_memory_report_measures_city_cache_and_checks_venue_budget(fake_api, tmp_path):
+    from sportlocate.utils.memory import check_dataset, collect_memory_report, deep_size
+
+    factory = SportVenueFactory()
+    factory.create_venues("Akaa")
+    report = collect_memory_report(venue_factory=factory, map_documents=MapDocumentStore())
+    (entry,) = report.sections["venue cache"]
+    assert (entry.name, entry.count) == ("akaa", 3)
+    venues = factory.create_venues("Akaa")
+    # Shared objects are counted once
+    assert entry.bytes == deep_size(venues) < 3 * deep_size(venues[0])
+    assert "akaa" in report.report()
+
+    dataset = tmp_path / "venues.json"
+    dataset.write_text(json.dumps([fake_sport_venue(venue_id, 2120) for venue_id in range(200)]))
+    ok, _ = check_dataset(dataset, max_venue_bytes=2000)
+    assert ok
+    ok, message = check_dataset(dataset, max_venue_bytes=100)
+    assert not ok and "OVER BUDGET" in message
+
+
+def test_armed_interaction_is_profiled_with_its_worker_jobs(fake_api, qt_app, tmp_path, monkeypatch):
+    import pstats
+    from sportlocate.utils import profiling
+
+    monkeypatch.setenv("SPORTLOCATE_PROFILE_DIR", str(tmp_path / "profiles"))
+    scheduler = JobScheduler()
+    results = []
+
+    def fetch_in_worker():
+        return sum(range(1000))
+
+    @profiling.interaction("choose city")
+    def slot():
+        scheduler.submit(fetch_in_worker, on_result=results.append)
+
+    slot()
+    assert not (tmp_path / "profiles").exists()
+
+    profiling.arm()
+    slot()
+    process_events_until(qt_app, lambda: len(results) == 2)
+    (profile_path,) = (tmp_path / "profiles").glob("*-choose-city.prof")
+    profiled_functions = {function for _, _, function in pstats.Stats(str(profile_path)).stats}
+    # Worker job is in the same profile as the slot, and only the armed call was profiled
+    assert {"slot", "fetch_in_worker"} <= profiled_functions
+    assert not profiling.is_armed()
+
+
+def test_api_server_serves_shared_cache_to_concurrent_clients(fake_api):
+    from aiohttp.test_utils import TestClient, TestServer
+
+    # Weather of Akaa is cached, so it is served without the weather API
+    DiskCache("weather").set(
+        "akaa",
+        {"latitude": 61.2, "longitude": 23.9, "current_weather": {"temperature": 15.0, "windspeed": 2.0, "weathercode": 0}},
+    )
+    server = ApiServer(workers=4)
+
+    async def run():
+        async with TestClient(TestServer(server.create_app())) as client:
+            async def get(path):
+                response = await client.get(path)
+                return response.status, await response.json()
+
+            assert (await get("/api/cities?q=aane&limit=1"))[1] == [{"name": "Äänekoski", "code": 992}]
+            # Concurrent clients of an uncached city wait for one fetch
+            responses = await asyncio.gather(*(get("/api/cities/Akaa/venues") for _ in range(20)))
+            assert all(status == 200 and len(venues) == 3 for status, venues in responses)
+            assert len([endpoint for endpoint in fake_api if endpoint.startswith("/sports-places?")]) == 1
+            status, gyms = await get("/api/cities/akaa/venues?categories=Gyms")
+            assert status == 200 and [venue["type_code"] for venue in gyms] == [2120]
+            assert (await get("/api/cities/akaa/counts"))[1] == {
+                "city": "Akaa", "total": 3, "categories": {"Gyms": 1, "Fields": 1}
+            }
+            status, weather = await get("/api/cities/Akaa/weather")
+            assert status == 200 and weather["type"] == "ClearSky" and weather["outdoor"]
+            status, recommendation = await get("/api/cities/Akaa/recommendation?categories=Gyms,Fields")
+            assert status == 200 and recommendation["id"] in (1, 2)
+            assert await get("/api/cities/Atlantis/venues") == (404, {"error": "Unknown city: Atlantis"})
+            assert (await get("/api/cities/Akaa/venues?categories=Bowling"))[0] == 400
+            assert (await get("/api/cities/Alavus/counts"))[0] == 404
+            stats = (await get("/api/stats"))[1]
+            assert stats["coalesced"] > 0 and stats["city_cache"]["resident_cities"] == 1
+
+    asyncio.run(run())
+
+
+def test_prefetcher_warms_predicted_cities_within_budget_and_yields_to_interactions(fake_api, qt_app, monkeypatch):
+    from sportlocate.utils import profiling
+
+    # Located and weather cached cities, only the venues are prefetched from the fake API
+    locations = {"tampere": [61.50, 23.76], "valkeakoski": [61.26, 24.03], "akaa": [61.17, 23.87], "alavus": [62.59, 23.62]}
+    for city, location in locations.items():
+        DiskCache("locations").set(city, location)
+        DiskCache("weather").set(city, {"latitude": location[0], "longitude": location[1], "current_weather": {}})
+
+    predictor = CityPredictor(get_service(WeatherModel).cached_city_locations)
+    predictor.record("Alavus")
+    predictor.record("Tampere")
+    predictor.hint("Akaa")
+    # Hovered city, recent cities and neighbours within the radius, not the current city
+    assert predictor.candidates("Tampere") == ["akaa", "alavus", "valkeakoski"]
+
+    factory = SportVenueFactory()
+    prefetched = []
+    controller = PrefetchController(
+        venue_factory=factory,
+        weather_model=get_service(WeatherModel),
+        scheduler=JobScheduler(),
+        current_city="Tampere",
+        budget=RateLimiter(rate=0.001, burst=2),
+        idle_delay_ms=0,
+    )
+    controller.prefetched.connect(prefetched.append)
+    controller.hint_city("Akaa")
+    process_events_until(qt_app, lambda: len(prefetched) == 2)
+    # Budget of two cities is used, the third waits for tokens
+    for _ in range(50):
+        qt_app.processEvents()
+    assert prefetched == ["akaa", "alavus"]
+    assert factory.is_city_cached("akaa") and not factory.is_city_cached("valkeakoski")
+    controller.stop()
+
+    # Interaction cancels the prefetch in progress before the venues are fetched
+    started = threading.Event()
+    release = threading.Event()
+    original_get = ApiClient.get
+
+    def slow_get(self, endpoint, params=None):
+        started.set()
+        release.wait(5)
+        return original_get(self, endpoint, params)
+
+    monkeypatch.setattr(ApiClient, "get", slow_get)
+    controller = PrefetchController(
+        venue_factory=factory,
+        weather_model=get_service(WeatherModel),
+        scheduler=JobScheduler(),
+        current_city="Tampere",
+        idle_delay_ms=0,
+    )
+    controller.prefetched.connect(prefetched.append)
+    controller.start()
+    process_events_until(qt_app, started.is_set)
+    profiling.interaction("choose city")(lambda: None)()
+    controller.stop()
+    release.set()
+    for _ in range(50):
+        qt_app.processEvents()
+        time.sleep(0.001)
+    assert prefetched == ["akaa", "alavus"]
+    assert not factory.is_city_cached("valkeakoski")
+
+
+def test_services_are_shared_and_startup_calls_each_upstream_url_once(qt_app, monkeypatch):
+    import requests
+    from sportlocate.controllers.city_controller import CityController
+    from sportlocate.controllers.weather_controller import WeatherController
+
+    class FakeResponse:
+        status_code = 200
+        headers = {}
+        content = json.dumps(FAKE_CATEGORIES).encode()
+
+        def raise_for_status(self):
+            pass
+
+    # Upstream is faked below ApiClient, so the calls are recorded by the trace
+    session_calls = []
+    monkeypatch.setattr(requests.Session, "get", lambda self, url, **kwargs: session_calls.append(url) or FakeResponse())
+    trace = start_trace()
+    try:
+        # Controllers and worker threads need the services at the same time during startup
+        threads = [threading.Thread(target=get_service, args=(VenueModel,)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        PreferencesController()
+        PreferencesController()
+        CityController()
+        WeatherController()
+        PrefetchController(idle_delay_ms=0).stop()
+        for thread in threads:
+            thread.join()
+    finally:
+        stop_trace()
+
+    assert session_calls == ["http://lipas.cc.jyu.fi/api/categories?lang=en"]
+    assert trace.upstream_calls == {"http://lipas.cc.jyu.fi/api/categories?lang=en": 1}
+    assert sorted(trace.services) == sorted(set(trace.services))
+    assert {"SportVenueCategoryModel", "VenueModel", "PreferencesModel", "WeatherModel"} <= set(trace.services)
+    assert "1x  http://lipas.cc.jyu.fi/api/categories?lang=en" in trace.report()
+    # Categories are not duplicated and the venue cache belongs to the one shared factory
+    assert [category.name for category in get_service(SportVenueCategoryModel).sport_venue_categories] == ["Gyms", "Fields"]
+    assert get_service(VenueModel).venue_factory is get_service(VenueModel).venue_factory
+
+    # Tests can replace a service
+    weather_model = WeatherModel()
+    set_service(WeatherModel, weather_model)
+    assert WeatherController()._weather_model is weather_model
+
+
+def test_async_client_sessions_are_closed_with_their_loop(qt_app):
+    # Nothing listens on the port, so requests fail right after the session is created
+    client = AsyncApiClient("http://127.0.0.1:9", tries=1)
+    errors = []
+    bridge = AsyncioBridge()
+    bridge.run(client.get("/"), on_error=errors.append)
+    process_events_until(qt_app, lambda: errors)
+    first_session = client._session
+    # Using the client in another loop replaces the session of the open bridge loop
+    with pytest.raises(aiohttp.ClientError):
+        asyncio.run(client.get("/"))
+    bridge.close()
+    assert first_session.closed
+
+    # Session of the loop closed by asyncio.run is released when the client is used again
+    second_session = client._session
+    bridge = AsyncioBridge()
+    bridge.run(client.get("/"), on_error=errors.append)
+    process_events_until(qt_app, lambda: len(errors) == 2)
+    assert second_session.closed and not client._session.closed
+    bridge.close()
+    assert client._session is None
+
+
+def test_async_client_streams_array_items():
+    from aiohttp import web
+    from aiohttp.test_utils import TestServer
+
+    async def venues(request):
+        return web.json_response([{"sportsPlaceId": venue_id} for venue_id in range(1000)])
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/sports-places", venues)
+        async with TestServer(app) as server:
+            client = AsyncApiClient(str(server.make_url("")).rstrip("/"), tries=1)
+            items = [item["sportsPlaceId"] async for item in client.iter_items("/sports-places")]
+            await client.close()
+        return items
+
+    assert asyncio.run(run()) == list(range(1000))
+
+
+def test_map_controller_waits_for_prefetch_of_the_same_city(fake_api, qt_app, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    original_get = ApiClient.get
+
+    def slow_get(self, endpoint, params=None):
+        started.set()
+        release.wait(5)
+        return original_get(self, endpoint, params)
+
+    PreferencesController().set_city("Akaa")
+    controller = MapController()
+    drawn = []
+    monkeypatch.setattr(controller, "_draw_map", drawn.append)
+    monkeypatch.setattr(ApiClient, "get", slow_get)
+    venue_factory = get_service(VenueModel).venue_factory
+    controller._scheduler.submit(venue_factory.create_venues, "akaa", lane=JobLane.PREFETCH)
+    assert started.wait(5)
+    # Interactive load of the city waits for the prefetch instead of fetching it again
+    controller.show_current_venues()
+    release.set()
+    process_events_until(qt_app, lambda: drawn)
+    assert [endpoint for endpoint in fake_api if endpoint.startswith("/sports-places?")] == [
+        "/sports-places?cityCodes=20"
+    ]